@@ -21,18 +21,48 @@ CREATE TABLE IF NOT EXISTS document_chunks (
     embedding vector(768),  -- text-embedding-004 usa 768 dimensiones
     metadata JSONB,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Full-text search (búsqueda híbrida): Postgres lo recalcula en cada INSERT/UPDATE
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('spanish', content)) STORED,
+    -- Keys de metadata promovidas a columnas (filtros frecuentes con B-tree)
+    category TEXT GENERATED ALWAYS AS (metadata->>'category') STORED,
+    procedure_code TEXT GENERATED ALWAYS AS (metadata->>'procedure_code') STORED,
+    doc_type TEXT GENERATED ALWAYS AS (metadata->>'type') STORED,
+    -- Opcional (VECTOR_PREFIX_DIM=256): VectorStore agrega el prefijo Matryoshka
+    --   embedding_p256 vector(256) GENERATED ALWAYS AS
+    --     (l2_normalize(subvector(embedding, 1, 256))::vector(256)) STORED
     UNIQUE(document_id, chunk_index)
 );
 
-CREATE INDEX IF NOT EXISTS idx_chunks_embedding
+-- HNSW no necesita datos para construirse (IVFFlat sí: ver VectorStore.rebuild_index)
+CREATE INDEX IF NOT EXISTS embedding_idx
 ON document_chunks
-USING ivfflat (embedding vector_cosine_ops)
-WITH (lists = 100);
+USING hnsw (embedding vector_cosine_ops)
+WITH (m = 16, ef_construction = 64);
 
+-- GIN sobre metadata: sirve filtros por contención (metadata @> '{"key": "valor"}')
 CREATE INDEX IF NOT EXISTS idx_chunks_metadata
 ON document_chunks
 USING gin (metadata);
 
+CREATE INDEX IF NOT EXISTS idx_chunks_category ON document_chunks (category);
+CREATE INDEX IF NOT EXISTS idx_chunks_procedure_code ON document_chunks (procedure_code);
+CREATE INDEX IF NOT EXISTS idx_chunks_doc_type ON document_chunks (doc_type);
+
+CREATE INDEX IF NOT EXISTS idx_chunks_content_tsv
+ON document_chunks
+USING gin (content_tsv);
+
+-- Manifest de ingesta incremental (un registro por archivo fuente)
+CREATE TABLE IF NOT EXISTS document_manifest (
+    path TEXT PRIMARY KEY,
+    document_id VARCHAR(255) NOT NULL,
+    size_bytes BIGINT NOT NULL,
+    mtime_ns BIGINT NOT NULL,
+    content_hash CHAR(64) NOT NULL,  -- sha256 del archivo
+    chunk_count INTEGER NOT NULL,
+    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ============================================================================
 -- DOMINIO AFP: Tablas principales
 -- ============================================================================
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Benchmark de almacenamiento compacto de vectores (full / halfvec / binary)
+
+Para cada modo de storage del VectorStore:
+1. Reconstruye el índice ANN (embedding_idx) con esa representación
+2. Mide el tamaño del índice en disco
+3. Mide recall@k contra la búsqueda exacta (sin índice) y la latencia
+
+Al terminar deja el índice como lo configuran VECTOR_STORAGE y VECTOR_PREFIX_DIM.
+
+ADVERTENCIA: reconstruye embedding_idx varias veces. Ejecutar en una base
+de desarrollo, no en producción.
+
+Uso:
+    python scripts/benchmark_vector_storage.py --queries 50 --k 10
+    python scripts/benchmark_vector_storage.py --storages halfvec binary --rerank-factor 20
+    python scripts/benchmark_vector_storage.py --prefix-dim 256  # Matryoshka (primera etapa de 256 dims)
+"""
+
+import asyncio
+import argparse
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Agregar src/ al path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Cargar variables de entorno desde la raíz del proyecto
+env_path = project_root / ".env"
+load_dotenv(dotenv_path=env_path, override=True)
+
+from src.rag.vector_based.vector_store import VectorStore
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def exact_top_k(store: VectorStore, query_embedding, k: int) -> list:
+    """Ground truth: top-k exacto forzando scan secuencial (sin índice ANN)"""
+    async with store.pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute("SET LOCAL enable_indexscan = off")
+            rows = await conn.fetch(
+                "SELECT id FROM document_chunks ORDER BY embedding <=> $1 LIMIT $2",
+                query_embedding,
+                k
+            )
+    return [row["id"] for row in rows]
+
+
+async def benchmark_storage(
+    storage: str,
+    queries: list,
+    truth: list,
+    k: int,
+    rerank_factor: int | None,
+    prefix_dim: int | None
+) -> dict:
+    """Reconstruye el índice con `storage` y mide tamaño, recall@k y latencia"""
+    store = VectorStore(storage=storage, rerank_factor=rerank_factor, prefix_dim=prefix_dim)
+    await store.connect()
+
+    try:
+        index_info = await store.rebuild_index()
+
+        async with store.pool.acquire() as conn:
+            index_bytes = await conn.fetchval(
+                "SELECT pg_relation_size($1::regclass)",
+                store.EMBEDDING_INDEX_NAME
+            )
+
+        recalls = []
+        latencies = []
+        for query_embedding, expected in zip(queries, truth):
+            start = time.perf_counter()
+            results = await store.similarity_search(query_embedding, k=k)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            found = {r["id"] for r in results}
+            recalls.append(len(found & set(expected)) / max(len(expected), 1))
+
+        return {
+            "storage": storage,
+            "rerank_factor": store.rerank_factor,
+            "params": index_info["params"],
+            "index_bytes": index_bytes,
+            "recall": statistics.mean(recalls),
+            "p50_ms": statistics.median(latencies),
+            "max_ms": max(latencies)
+        }
+    finally:
+        await store.close()
+
+
+async def main(
+    storages: list,
+    num_queries: int,
+    k: int,
+    rerank_factor: int | None,
+    prefix_dim: int | None = None
+):
+    """
+    Compara los modos de storage sobre los embeddings ya cargados.
+
+    Args:
+        storages: Modos a comparar ("full", "halfvec", "binary")
+        num_queries: Número de queries (embeddings tomados al azar de la tabla)
+        k: Top-k para recall@k
+        rerank_factor: Over-fetch para halfvec/binary (None = default del modo)
+        prefix_dim: Dimensiones del prefijo Matryoshka (None = vector completo)
+    """
+    logger.info("=" * 80)
+    logger.info("BENCHMARK DE STORAGE VECTORIAL")
+    logger.info("=" * 80)
+
+    base = VectorStore()
+    await base.connect()
+
+    try:
+        async with base.pool.acquire() as conn:
+            total = await conn.fetchval(
+                "SELECT COUNT(*) FROM document_chunks WHERE embedding IS NOT NULL"
+            )
+            table_bytes = await conn.fetchval(
+                "SELECT pg_total_relation_size('document_chunks')"
+            )
+            rows = await conn.fetch(
+                "SELECT embedding FROM document_chunks WHERE embedding IS NOT NULL "
+                "ORDER BY random() LIMIT $1",
+                num_queries
+            )
+
+        if not rows:
+            logger.error("❌ document_chunks está vacía: ejecutar scripts/ingest_documents.py primero")
+            return
+
+        queries = [row["embedding"] for row in rows]
+        logger.info(f"  • Vectores en la tabla: {total}")
+        logger.info(f"  • Tamaño total de document_chunks: {table_bytes / 1024 / 1024:.1f} MB")
+        logger.info(f"  • Queries: {len(queries)}, k = {k}")
+
+        logger.info("\nCalculando ground truth (búsqueda exacta)...")
+        truth = [await exact_top_k(base, q, k) for q in queries]
+    finally:
+        await base.close()
+
+    results = []
+    for storage in storages:
+        logger.info(f"\nStorage '{storage}': reconstruyendo índice...")
+        results.append(await benchmark_storage(storage, queries, truth, k, rerank_factor, prefix_dim))
+
+    # Sin prefijo, "full" es la referencia (con prefijo se compara contra 768 dims float32)
+    baseline = next((r["index_bytes"] for r in results if r["storage"] == "full"), None)
+    if prefix_dim and baseline:
+        baseline = baseline * VectorStore.DIMENSIONS / prefix_dim
+
+    logger.info("\n" + "=" * 80)
+    logger.info(f"{'storage':<10} {'rerank':>6} {'índice MB':>10} {'ahorro':>8} "
+                f"{'recall@' + str(k):>10} {'p50 ms':>8} {'max ms':>8}")
+    for r in results:
+        saved = f"{1 - r['index_bytes'] / baseline:.0%}" if baseline else "-"
+        logger.info(
+            f"{r['storage']:<10} {r['rerank_factor']:>6} {r['index_bytes'] / 1024 / 1024:>10.2f} "
+            f"{saved:>8} {r['recall']:>10.3f} {r['p50_ms']:>8.1f} {r['max_ms']:>8.1f}"
+        )
+    logger.info("=" * 80)
+
+    # Dejar el índice como lo configura la aplicación (VECTOR_STORAGE / VECTOR_PREFIX_DIM)
+    store = VectorStore()
+    if (storages[-1], prefix_dim) != (store.storage, store.prefix_dim):
+        logger.info(f"\nRestaurando índice (storage={store.storage}, prefix_dim={store.prefix_dim})...")
+        await store.connect()
+        await store.rebuild_index()
+        await store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark de storage compacto (halfvec / binary) con re-ranking"
+    )
+    parser.add_argument(
+        "--storages",
+        nargs="+",
+        choices=list(VectorStore.STORAGE_TYPES),
+        default=list(VectorStore.STORAGE_TYPES),
+        help="Modos a comparar (default: full halfvec binary)"
+    )
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=50,
+        help="Número de queries de prueba (default: 50)"
+    )
+    parser.add_argument(
+        "--k",
+        type=int,
+        default=10,
+        help="Top-k para recall@k (default: 10)"
+    )
+    parser.add_argument(
+        "--rerank-factor",
+        type=int,
+        default=None,
+        help="Candidatos por resultado antes del re-ranking (default: 2 halfvec, 10 binary)"
+    )
+    parser.add_argument(
+        "--prefix-dim",
+        type=int,
+        default=None,
+        help="Prefijo Matryoshka para la primera etapa (ej: 256; default: vector completo)"
+    )
+
+    args = parser.parse_args()
+
+    asyncio.run(main(
+        storages=args.storages,
+        num_queries=args.queries,
+        k=args.k,
+        rerank_factor=args.rerank_factor,
+        prefix_dim=args.prefix_dim
+    ))
@@ -45,12 +45,13 @@ async def demo_indexed_retrieval():
 
     # Verificar que existan índices
     indices_dir = Path("data/indices")
-    if not indices_dir.exists() or not list(indices_dir.glob("index-*.json")):
+    index_files = [f for f in indices_dir.glob("*.json") if not f.name.startswith("EXAMPLE-")]
+    if not index_files:
         print("❌ Error: No hay índices JSON en data/indices/")
         print("   Ejecuta primero: python scripts/generate_indices.py")
         return
 
-    print(f"✅ Índices encontrados: {len(list(indices_dir.glob('index-*.json')))}")
+    print(f"✅ Índices encontrados: {len(index_files)}")
     print()
 
     # Configurar componentes
@@ -7,11 +7,17 @@ Genera índices jerárquicos para acelerar el retrieval.
 
 Uso:
     python scripts/index_documents.py
-    python scripts/index_documents.py --reindex  # Forzar reindexación
+    python scripts/index_documents.py --reindex  # Re-indexar (incremental por sección)
+    python scripts/index_documents.py --concurrency 8 --parallel-docs 3
+
+Si se interrumpe, volver a ejecutar: los documentos indexados se omiten y
+los batches ya resumidos se retoman desde data/cache/index_checkpoints/.
 """
 
 import sys
+import argparse
 import asyncio
+import json
 import time
 from pathlib import Path
 from typing import List, Dict, Any
@@ -27,6 +33,7 @@ load_dotenv(dotenv_path=env_path, override=True)
 
 from src.rag.agent_based.indexer import AgentRAGIndexer
 from src.framework.model_provider import VertexAIProvider
+from src.rag.pdf_extraction import shutdown_pdf_extractor
 
 
 class Colors:
@@ -77,12 +84,38 @@ async def find_pdf_documents(base_path: Path) -> List[Path]:
     return sorted(pdf_files)
 
 
-async def index_documents(reindex: bool = False):
+def find_indexed_sources(indices_path: Path) -> set:
+    """Nombres de PDF (source_file) que ya tienen índice en data/indices/"""
+    sources = set()
+    for index_file in indices_path.glob("*.json"):
+        if index_file.name.startswith("EXAMPLE-"):
+            continue
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                sources.add(json.load(f).get("source_file"))
+        except Exception:
+            continue
+    return sources
+
+
+async def index_documents(
+    reindex: bool = False,
+    concurrency: int | None = None,
+    parallel_docs: int = 2
+):
     """
     Indexa todos los documentos PDF encontrados.
 
+    PEDAGOGÍA:
+    - parallel_docs documentos se indexan a la vez
+    - concurrency limita las llamadas al LLM en vuelo entre TODOS ellos
+    - Si la corrida se interrumpe, los documentos ya indexados se omiten y
+      los que quedaron a medias retoman desde su checkpoint de batches
+
     Args:
         reindex: Si True, regenera índices existentes
+        concurrency: Llamadas al LLM simultáneas (None = AGENT_INDEXER_CONCURRENCY)
+        parallel_docs: Documentos indexados en paralelo
     """
     start_time = time.time()
 
@@ -108,55 +141,62 @@ async def index_documents(reindex: bool = False):
     # Inicializar indexer
     print(f"{Colors.CYAN}Inicializando AgentRAGIndexer...{Colors.END}")
     model_provider = VertexAIProvider()
-    indexer = AgentRAGIndexer(model_provider=model_provider)
+    indexer = AgentRAGIndexer(model_provider=model_provider, max_concurrency=concurrency)
 
     # Contadores
     processed = 0
     generated = 0
+    unchanged = 0
     skipped = 0
     errors = 0
     error_details = []
 
-    # Procesar cada documento
-    for i, pdf_path in enumerate(pdf_files, 1):
+    indexed_sources = set() if reindex else find_indexed_sources(indices_path)
+    doc_semaphore = asyncio.Semaphore(max(1, parallel_docs))
+
+    async def index_one(pdf_path: Path):
+        nonlocal processed, generated, unchanged, skipped, errors
         doc_name = pdf_path.name
-        print_progress(i-1, len(pdf_files), doc_name, "Procesando")
 
-        try:
-            # Verificar si ya existe índice
-            index_file = indices_path / f"{pdf_path.stem}_index.json"
-
-            if index_file.exists() and not reindex:
-                print_progress(i, len(pdf_files), doc_name, "Ya indexado")
-                processed += 1
-                skipped += 1
-                time.sleep(0.1)  # Dar tiempo para ver el mensaje
-                continue
-
-            # Indexar documento
-            print_progress(i-1, len(pdf_files), doc_name, "Indexando")
-            index = await indexer.index_document(str(pdf_path), output_dir=str(indices_path))
-
-            if index:
-                processed += 1
-                generated += 1
-                print_progress(i, len(pdf_files), doc_name, "Completado")
-            else:
+        # Verificar si ya existe índice
+        if pdf_path.name in indexed_sources:
+            processed += 1
+            skipped += 1
+            print_progress(processed + errors, len(pdf_files), doc_name, "Ya indexado")
+            return
+
+        async with doc_semaphore:
+            try:
+                print_progress(processed + errors, len(pdf_files), doc_name, "Indexando")
+                index, status = await indexer.index_document(str(pdf_path), output_dir=str(indices_path))
+
+                if index and status == "unchanged":
+                    processed += 1
+                    unchanged += 1
+                    print_progress(processed + errors, len(pdf_files), doc_name, "Sin cambios")
+                elif index:
+                    processed += 1
+                    generated += 1
+                    print_progress(processed + errors, len(pdf_files), doc_name, "Completado")
+                else:
+                    errors += 1
+                    error_details.append(f"Error desconocido: {doc_name}")
+                    print_progress(processed + errors, len(pdf_files), doc_name, "Error")
+
+            except Exception as e:
                 errors += 1
-                error_details.append(f"Error desconocido: {doc_name}")
-                print_progress(i, len(pdf_files), doc_name, "Error")
-
-            time.sleep(0.1)  # Dar tiempo para ver el mensaje
+                error_details.append(f"{doc_name}: {str(e)[:60]}")
+                print_progress(processed + errors, len(pdf_files), doc_name, "Error")
 
-        except Exception as e:
-            errors += 1
-            error_details.append(f"{doc_name}: {str(e)[:60]}")
-            print_progress(i, len(pdf_files), doc_name, "Error")
-            time.sleep(0.1)
+    # Procesar documentos (hasta parallel_docs a la vez)
+    await asyncio.gather(*[index_one(pdf_path) for pdf_path in pdf_files])
 
     # Nueva línea después de la barra de progreso
     print("\n")
 
+    # Cerrar pool de procesos de extracción de PDFs
+    shutdown_pdf_extractor()
+
     # Tiempo total
     elapsed = time.time() - start_time
     minutes = int(elapsed // 60)
@@ -168,6 +208,7 @@ async def index_documents(reindex: bool = False):
     report_lines = [
         f"Documentos procesados: {Colors.GREEN}{processed}{Colors.END}",
         f"Índices generados: {Colors.GREEN}{generated}{Colors.END}",
+        f"Índices sin cambios (vigentes): {Colors.CYAN}{unchanged}{Colors.END}",
         f"Índices existentes (omitidos): {Colors.YELLOW}{skipped}{Colors.END}",
         f"Errores: {Colors.RED}{errors}{Colors.END}",
         f"Tiempo total: {Colors.CYAN}{minutes}m {seconds}s{Colors.END}"
@@ -189,13 +230,36 @@ async def index_documents(reindex: bool = False):
 def main():
     """Punto de entrada del script"""
     # Parsear argumentos
-    reindex = '--reindex' in sys.argv or '-r' in sys.argv
-
-    if reindex:
-        print(f"{Colors.YELLOW}Modo reindexación: Se regenerarán todos los índices{Colors.END}\n")
+    parser = argparse.ArgumentParser(description="Indexación masiva de PDFs para Agent RAG")
+    parser.add_argument(
+        "--reindex", "-r",
+        action="store_true",
+        help="Re-indexa también los documentos que ya tienen índice "
+             "(solo se re-resumen las secciones cuyo texto cambió)"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="Llamadas al LLM en paralelo (default: AGENT_INDEXER_CONCURRENCY o 4)"
+    )
+    parser.add_argument(
+        "--parallel-docs",
+        type=int,
+        default=2,
+        help="Documentos indexados en paralelo (default: 2)"
+    )
+    args = parser.parse_args()
+
+    if args.reindex:
+        print(f"{Colors.YELLOW}Modo reindexación: se re-resumirán solo las secciones cuyo texto cambió{Colors.END}\n")
 
     # Ejecutar indexación
-    asyncio.run(index_documents(reindex=reindex))
+    asyncio.run(index_documents(
+        reindex=args.reindex,
+        concurrency=args.concurrency,
+        parallel_docs=args.parallel_docs
+    ))
 
 
 if __name__ == "__main__":
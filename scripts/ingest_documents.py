@@ -6,15 +6,19 @@ Este script demuestra cómo usar el pipeline completo:
 1. Carga documentos (MD y PDF)
 2. Hace chunking con overlap
 3. Genera embeddings con Vertex AI
-4. Almacena en PostgreSQL con pgvector
+4. Almacena en PostgreSQL con pgvector (o en un índice NumPy local con --store local)
 
 Uso:
     python scripts/ingest_documents.py --path data/documentos --chunk-size 512 --overlap 50
+    python scripts/ingest_documents.py --full  # Ignora el manifest y re-procesa todo
+    python scripts/ingest_documents.py --store local  # Sin base de datos (data/vector_index)
+    python scripts/ingest_documents.py --no-dedup  # Embebe también chunks duplicados
 """
 
 import asyncio
 import argparse
 import logging
+import os
 import sys
 from pathlib import Path
 from dotenv import load_dotenv
@@ -29,7 +33,10 @@ load_dotenv(dotenv_path=env_path, override=True)
 
 from src.rag.vector_based.ingestion import DocumentIngestion
 from src.rag.vector_based.embeddings import EmbeddingGenerator
+from src.rag.vector_based.embedding_cache import EmbeddingCache
+from src.rag.pdf_extraction import shutdown_pdf_extractor
 from src.rag.vector_based.vector_store import VectorStore
+from src.rag.vector_based.local_vector_store import LocalVectorStore
 
 # Configurar logging
 logging.basicConfig(
@@ -43,16 +50,31 @@ async def main(
     path: str,
     chunk_size: int = 512,
     overlap: int = 50,
-    batch_size: int = 250
+    batch_size: int = 250,
+    cache_path: str | None = "data/cache/embeddings.sqlite",
+    max_concurrency: int = 4,
+    rebuild_index: bool = False,
+    full: bool = False,
+    store: str = "postgres",
+    deduplicate: bool = True,
+    near_duplicate_threshold: float | None = None
 ):
     """
     Pipeline completo de ingesta de documentos.
 
     Args:
         path: Directorio con documentos (MD y/o PDF)
-        chunk_size: Tamaño máximo del chunk en caracteres
-        overlap: Caracteres de superposición entre chunks
+        chunk_size: Tamaño máximo del chunk en tokens
+        overlap: Tokens de superposición entre chunks
         batch_size: Tamaño del batch para embeddings
+        cache_path: Archivo del caché de embeddings (None = sin caché)
+        max_concurrency: Batches de embeddings en vuelo simultáneamente
+        rebuild_index: Reconstruir el índice ANN al terminar la carga
+        full: Re-procesar todos los archivos (ignora el manifest incremental)
+        store: "postgres" (pgvector) o "local" (índice NumPy en disco)
+        deduplicate: Omitir chunks duplicados exactos y agrupar casi duplicados
+        near_duplicate_threshold: Jaccard mínimo para agrupar casi duplicados
+                                  (None = env INGEST_NEAR_DUPLICATE_THRESHOLD o 0.9)
     """
     logger.info("=" * 80)
     logger.info("INICIANDO PIPELINE DE INGESTA - VECTOR RAG")
@@ -62,16 +84,24 @@ async def main(
         # 1. Inicializar componentes
         logger.info("\n[1/5] Inicializando componentes...")
 
-        embedding_generator = EmbeddingGenerator()
+        embedding_cache = EmbeddingCache(cache_path) if cache_path else None
+        embedding_generator = EmbeddingGenerator(
+            cache=embedding_cache,
+            max_concurrency=max_concurrency
+        )
         logger.info("  ✓ EmbeddingGenerator inicializado")
+        if embedding_cache:
+            logger.info(f"  ✓ Caché de embeddings: {cache_path}")
 
-        vector_store = VectorStore()
+        vector_store = LocalVectorStore() if store == "local" else VectorStore()
         await vector_store.connect()
-        logger.info("  ✓ VectorStore conectado")
+        logger.info(f"  ✓ {type(vector_store).__name__} conectado")
 
         ingestion = DocumentIngestion(
             embedding_generator=embedding_generator,
-            vector_store=vector_store
+            vector_store=vector_store,
+            deduplicate=deduplicate,
+            near_duplicate_threshold=near_duplicate_threshold
         )
         logger.info("  ✓ DocumentIngestion inicializado")
 
@@ -81,19 +111,45 @@ async def main(
             path=path,
             chunk_size=chunk_size,
             overlap=overlap,
-            batch_size=batch_size
+            batch_size=batch_size,
+            full=full
         )
 
         # 3. Mostrar estadísticas
         logger.info("\n[3/5] Estadísticas del proceso:")
         logger.info(f"  • Documentos procesados: {stats['total_documents']}")
+        logger.info(f"  • Documentos sin cambios (omitidos): {stats['unchanged_documents']}")
+        logger.info(f"  • Documentos eliminados: {stats['removed_documents']}")
+        logger.info(f"  • Chunks obsoletos eliminados: {stats['stale_chunks_deleted']}")
         logger.info(f"  • Chunks generados: {stats['total_chunks']}")
         logger.info(f"  • Embeddings creados: {stats['total_embeddings']}")
-        logger.info(f"  • Chunk size: {stats['chunk_size']} caracteres")
-        logger.info(f"  • Overlap: {stats['overlap']} caracteres")
+        if deduplicate:
+            logger.info(
+                f"  • Duplicados exactos omitidos: {stats['duplicates_exact']} "
+                f"({stats['embeddings_saved']} embeddings ahorrados); "
+                f"casi duplicados agrupados: {stats['duplicates_near']}"
+            )
+        logger.info(f"  • Chunk size: {stats['chunk_size']} tokens")
+        logger.info(f"  • Overlap: {stats['overlap']} tokens")
+        logger.info(f"  • Escritura en DB: {stats['rows_per_second']:.0f} filas/s")
+        if stats["first_write_s"] is not None:
+            logger.info(f"  • Primeras filas en DB tras: {stats['first_write_s']:.1f}s")
+        logger.info(f"  • Tiempo total: {stats['elapsed_s']:.1f}s")
         logger.info(f"  • Status: {stats['status']}")
+        if embedding_cache:
+            logger.info(
+                f"  • Caché de embeddings: {embedding_cache.hits} hits, "
+                f"{embedding_cache.misses} misses (llamadas a la API)"
+            )
 
         # 4. Obtener estadísticas de la base de datos
+        if rebuild_index:
+            index_info = await vector_store.rebuild_index()
+            logger.info(
+                f"\n  ✓ Índice {index_info['index_type']} reconstruido "
+                f"con {index_info['params']}"
+            )
+
         logger.info("\n[4/5] Estadísticas de la base de datos:")
         db_stats = await vector_store.get_statistics()
         logger.info(f"  • Total chunks en DB: {db_stats['total_chunks']}")
@@ -104,6 +160,9 @@ async def main(
         # 5. Cleanup
         logger.info("\n[5/5] Cerrando conexiones...")
         await vector_store.close()
+        if embedding_cache:
+            embedding_cache.close()
+        shutdown_pdf_extractor()
         logger.info("  ✓ Conexiones cerradas")
 
         logger.info("\n" + "=" * 80)
@@ -129,13 +188,13 @@ if __name__ == "__main__":
         "--chunk-size",
         type=int,
         default=512,
-        help="Tamaño máximo del chunk en caracteres (default: 512)"
+        help="Tamaño máximo del chunk en tokens (default: 512)"
     )
     parser.add_argument(
         "--overlap",
         type=int,
         default=50,
-        help="Caracteres de superposición entre chunks (default: 50)"
+        help="Tokens de superposición entre chunks (default: 50)"
     )
     parser.add_argument(
         "--batch-size",
@@ -144,6 +203,59 @@ if __name__ == "__main__":
         help="Tamaño del batch para embeddings (default: 50, reducido para evitar límites de tokens)"
     )
 
+    parser.add_argument(
+        "--cache-path",
+        type=str,
+        default="data/cache/embeddings.sqlite",
+        help="Archivo SQLite del caché de embeddings (default: data/cache/embeddings.sqlite)"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Desactiva el caché de embeddings (re-embebe todos los chunks)"
+    )
+
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=4,
+        help="Batches de embeddings en paralelo (default: 4; cuota vía VERTEX_EMBEDDING_RPM, default 300/min)"
+    )
+
+    parser.add_argument(
+        "--rebuild-index",
+        action="store_true",
+        help="Reconstruye el índice ANN (HNSW/IVFFlat) tras la carga masiva"
+    )
+
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Reconstrucción completa: re-procesa todos los archivos ignorando el manifest"
+    )
+
+    parser.add_argument(
+        "--store",
+        choices=["postgres", "local"],
+        default=os.getenv("VECTOR_STORE_BACKEND", "postgres"),
+        help="Backend de vectores: postgres (pgvector) o local (NumPy, sin DB) "
+             "(default: env VECTOR_STORE_BACKEND o postgres)"
+    )
+
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="No eliminar chunks duplicados exactos ni agrupar casi duplicados (MinHash)"
+    )
+
+    parser.add_argument(
+        "--near-duplicate-threshold",
+        type=float,
+        default=None,
+        help="Jaccard estimado mínimo para agrupar casi duplicados; se conservan, "
+             "nunca se eliminan (default: env INGEST_NEAR_DUPLICATE_THRESHOLD o 0.9)"
+    )
+
     args = parser.parse_args()
 
     # Validar que el path existe
@@ -156,5 +268,12 @@ if __name__ == "__main__":
         path=args.path,
         chunk_size=args.chunk_size,
         overlap=args.overlap,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        cache_path=None if args.no_cache else args.cache_path,
+        max_concurrency=args.max_concurrency,
+        rebuild_index=args.rebuild_index,
+        full=args.full,
+        store=args.store,
+        deduplicate=not args.no_dedup,
+        near_duplicate_threshold=args.near_duplicate_threshold
     ))
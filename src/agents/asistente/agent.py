@@ -5,7 +5,7 @@ Prototipo 1: Combina retrieval (RAG) + generación de checklists
 Usa un agente clasificador para decisiones inteligentes
 """
 
-from typing import Dict, Any, Literal
+from typing import Dict, Any, List, Literal
 from src.framework.base_agent import BaseAgent, AgentResponse
 from src.framework.model_provider import ModelProvider
 from src.tools.checklist_tool import ChecklistTool
@@ -60,7 +60,8 @@ class AgenteAsistente(BaseAgent):
         self,
         query: str,
         context: Dict[str, Any] | None = None,
-        use_checklist: bool = True
+        use_checklist: bool = True,
+        query_embedding: List[float] | None = None
     ) -> AgentResponse:
         """
         Procesa una consulta del usuario.
@@ -74,6 +75,8 @@ class AgenteAsistente(BaseAgent):
         Args:
             query: Consulta del usuario
             context: Contexto adicional (opcional)
+            query_embedding: Embedding de la query si el caller ya lo calculó
+                             (Vector RAG lo reutiliza en vez de pedirlo de nuevo)
 
         Returns:
             AgentResponse con content y metadata
@@ -85,10 +88,14 @@ class AgenteAsistente(BaseAgent):
         )
 
         # 2. Buscar información relevante
-        retrieval_result = await retrieval_tool.execute(
-            query=query,
-            top_k=5 if not self.agentic_rag else 3
-        )
+        if self.agentic_rag:
+            retrieval_result = await retrieval_tool.execute(query=query, top_k=3)
+        else:
+            retrieval_result = await retrieval_tool.execute(
+                query=query,
+                top_k=5,
+                query_embedding=query_embedding
+            )
 
         chunks = retrieval_result["chunks"]
 
@@ -29,8 +29,8 @@ LLM_CONFIG = {
 RETRIEVAL_CONFIG = {
     "vector_rag": {
         "top_k": 5,
-        "chunk_size": 512,
-        "overlap": 50
+        "chunk_size": 512,  # tokens
+        "overlap": 50  # tokens
     },
     "agent_rag": {
         "top_k": 3,  # Menos porque es más lento
@@ -312,6 +312,10 @@ async def shutdown_event():
     await asistente.vector_store.close()
     logger.info("api_shutdown", message="VectorStore cerrado correctamente")
 
+    # Cerrar pool de procesos de extracción de PDFs
+    from src.rag.pdf_extraction import shutdown_pdf_extractor
+    shutdown_pdf_extractor()
+
 
 # ============================================================================
 # Punto de entrada para desarrollo
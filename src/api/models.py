@@ -232,6 +232,13 @@ class ChatResponse(BaseModel):
         default=0,
         description="Número de chunks de documentos usados para la respuesta"
     )
+    cache_hit: bool = Field(
+        default=False,
+        description=(
+            "True si la respuesta vino del caché semántico "
+            "(una pregunta equivalente ya fue respondida)"
+        )
+    )
     timestamp: datetime = Field(
         default_factory=datetime.utcnow,
         description="Timestamp UTC de cuando se generó la respuesta"
@@ -35,9 +35,12 @@ load_dotenv(dotenv_path=dotenv_path, override=True)
 import os
 print(f"[DEBUG] VERTEX_AI_PROJECT cargado: {os.getenv('VERTEX_AI_PROJECT')}")
 
+import asyncio
+import logging
 import time
 import uuid
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Tuple
 from fastapi import APIRouter, HTTPException, status
 from pathlib import Path
 
@@ -48,6 +51,7 @@ from src.api.models import (
     Checklist,
     ChecklistStep
 )
+from src.api.semantic_cache import SemanticAnswerCache, fingerprint_paths
 from src.agents.asistente.agent import AgenteAsistente
 from src.agents.asistente.intent_classifier import IntentClassifierAgent
 from src.framework.model_provider import VertexAIProvider
@@ -56,11 +60,15 @@ from src.tools.retrieval_agent_tool import RetrievalAgentTool
 from src.tools.checklist_tool import ChecklistTool
 from src.rag.vector_based.retrieval import VectorRetrieval
 from src.rag.vector_based.vector_store import VectorStore
+from src.rag.vector_based.local_vector_store import LocalVectorStore
 from src.rag.vector_based.embeddings import EmbeddingGenerator
+from src.rag.vector_based.embedding_batcher import EmbeddingBatcher
 from src.rag.agent_based.retrieval import AgentRetrieval
 from src.rag.agent_based.document_reader import DocumentReader
 from src.rag.agent_based.chunk_evaluator import ChunkEvaluator
 
+logger = logging.getLogger(__name__)
+
 
 # ============================================================================
 # Router Setup
@@ -85,11 +93,18 @@ router = APIRouter(
 model_provider = VertexAIProvider()
 
 # Vector RAG components
-vector_store = VectorStore()
+# VECTOR_STORE_BACKEND=local → índice NumPy en proceso (dev, CI, sin Postgres)
+if os.getenv("VECTOR_STORE_BACKEND", "postgres").lower() == "local":
+    vector_store = LocalVectorStore()
+else:
+    vector_store = VectorStore()
 embedding_generator = EmbeddingGenerator()  # Usa config de env vars (VERTEX_AI_PROJECT)
+# Agrupa los embeddings de queries concurrentes en una sola llamada a Vertex AI
+query_batcher = EmbeddingBatcher(embedding_generator=embedding_generator)
 vector_retrieval = VectorRetrieval(
     vector_store=vector_store,
-    embedding_generator=embedding_generator
+    embedding_generator=embedding_generator,
+    query_batcher=query_batcher
 )
 retrieval_vector_tool = RetrievalVectorTool(vector_retrieval=vector_retrieval)
 
@@ -110,6 +125,20 @@ intent_classifier = IntentClassifierAgent(model_provider=model_provider)
 
 # Main agent (se inicializará con agentic_rag según request)
 
+# Caché semántico de respuestas (ANSWER_CACHE_ENABLED=false para desactivar)
+answer_cache = (
+    SemanticAnswerCache()
+    if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() != "false"
+    else None
+)
+
+# Directorios que usa Agent RAG (su versión invalida el caché de ese modo)
+AGENT_RAG_PATHS = ("data/documentos", "data/indices")
+
+# La versión del corpus se consulta como máximo cada N segundos
+CORPUS_VERSION_TTL_SECONDS = 5.0
+_corpus_versions: Dict[bool, Tuple[float, str]] = {}
+
 
 # ============================================================================
 # Helper Functions
@@ -142,6 +171,29 @@ def _generate_document_url(metadata: Dict[str, Any]) -> str:
     return f"{base_url}/{source_file}#page={page}"
 
 
+async def _get_corpus_version(use_agentic_rag: bool) -> str:
+    """
+    Versión del corpus que usa cada estrategia RAG.
+
+    PEDAGOGÍA:
+    - Vector RAG: manifest de ingesta del vector store
+    - Agent RAG: archivos de documentos e índices JSON
+    - Se memoriza unos segundos: no agrega una query/stat por request
+    """
+    now = time.monotonic()
+    cached = _corpus_versions.get(use_agentic_rag)
+    if cached and now - cached[0] < CORPUS_VERSION_TTL_SECONDS:
+        return cached[1]
+
+    if use_agentic_rag:
+        version = await asyncio.to_thread(fingerprint_paths, *AGENT_RAG_PATHS)
+    else:
+        version = await vector_store.get_corpus_version()
+
+    _corpus_versions[use_agentic_rag] = (now, version)
+    return version
+
+
 def _calculate_confidence(citations: list) -> float:
     """
     Calcula score de confianza basado en los scores de las citas.
@@ -226,6 +278,9 @@ async def chat_asistente(request: ChatRequest) -> ChatResponse:
     - Enlaces clickeables a PDFs
 
     FLUJO:
+    0. Caché semántico: si ya se respondió una pregunta equivalente
+       (misma sesión, mismo modo RAG y misma versión del corpus), se
+       retorna esa respuesta
     1. Inicializar agente con estrategia RAG elegida
     2. Ejecutar agente con query del usuario
     3. Transformar AgentResponse a formato API enriquecido
@@ -267,12 +322,39 @@ async def chat_asistente(request: ChatRequest) -> ChatResponse:
                 }
             ],
             "confidence_score": 0.92,
-            "processing_time_ms": 1234
+            "processing_time_ms": 1234,
+            "cache_hit": false
         }
     """
     start_time = time.time()
 
     try:
+        # 0. Caché semántico (si hay miss, Vector RAG reutiliza el mismo
+        #    embedding). En Agent RAG es una llamada extra a la API de
+        #    embeddings por request.
+        #    Fail-open: si falla el embedding o la versión del corpus, se
+        #    responde sin caché en vez de devolver 500.
+        #    Scope = (modo RAG, sesión): el agente recibe session_id como
+        #    contexto, una respuesta no se comparte entre sesiones
+        query_embedding, corpus_version = None, None
+        cache_scope = (request.use_agentic_rag, request.session_id)
+        if answer_cache:
+            try:
+                query_embedding = await query_batcher.embed(request.query)
+                corpus_version = await _get_corpus_version(request.use_agentic_rag)
+                cached = answer_cache.get(query_embedding, cache_scope, corpus_version)
+            except Exception:
+                logger.warning("Caché de respuestas no disponible, se continúa sin caché", exc_info=True)
+                query_embedding, cached = None, None
+
+            if cached is not None:
+                return cached.model_copy(update={
+                    "message_id": str(uuid.uuid4()),
+                    "processing_time_ms": int((time.time() - start_time) * 1000),
+                    "timestamp": datetime.utcnow(),
+                    "cache_hit": True
+                })
+
         # 1. Inicializar agente con estrategia RAG elegida
         agente = AgenteAsistente(
             model_provider=model_provider,
@@ -285,7 +367,8 @@ async def chat_asistente(request: ChatRequest) -> ChatResponse:
         # 2. Ejecutar agente
         agent_response = await agente.run(
             query=request.query,
-            context={"session_id": request.session_id}
+            context={"session_id": request.session_id},
+            query_embedding=query_embedding
         )
 
         # 3. Transformar chunks a citations con URLs
@@ -311,7 +394,7 @@ async def chat_asistente(request: ChatRequest) -> ChatResponse:
         confidence_score = _calculate_confidence(citations)
 
         # 6. Construir respuesta
-        return ChatResponse(
+        response = ChatResponse(
             message_id=str(uuid.uuid4()),
             role="assistant",
             content=agent_response.content,
@@ -323,6 +406,15 @@ async def chat_asistente(request: ChatRequest) -> ChatResponse:
             chunks_used=agent_response.metadata.get("chunks_used", 0)
         )
 
+        # 7. Guardar en caché (no se cachean respuestas sin información)
+        if query_embedding is not None and not agent_response.metadata.get("error"):
+            try:
+                answer_cache.put(query_embedding, cache_scope, corpus_version, response)
+            except Exception:
+                logger.warning("No se pudo guardar la respuesta en caché", exc_info=True)
+
+        return response
+
     except Exception as e:
         # DEBUGGING: Imprimir traceback completo
         import traceback
@@ -0,0 +1,213 @@
+"""
+Caché semántico de respuestas para /asistente/chat
+
+El tráfico del contact center es muy repetitivo: "¿cómo me jubilo
+anticipadamente?" llega en 50 redacciones distintas. Cada una pasa por
+retrieval, clasificación de intención, checklist y una generación de
+3000 tokens. Este caché responde en milisegundos si ya se contestó una
+pregunta con el mismo significado.
+
+PEDAGOGÍA:
+- Clave = embedding de la query (no el texto): paráfrasis también pegan
+- Hit = similitud coseno >= threshold con una pregunta reciente
+- Scope = (lo que el caller pase, versión del corpus): una respuesta de
+  Vector RAG no se sirve a Agent RAG, ni una respuesta vieja tras re-ingestar
+- El caché NO sabe qué contexto usa el agente: todo lo que cambie la
+  respuesta además de la query (modo RAG, sesión...) debe ir en el scope
+- TTL (respuestas vencen) + LRU (memoria acotada)
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+import numpy as np
+
+
+@dataclass
+class _CacheEntry:
+    scope: Hashable
+    corpus_version: str
+    vector: np.ndarray
+    value: Any
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Caché en memoria de respuestas indexado por similitud de embeddings.
+
+    PEDAGOGÍA:
+    - Vectores normalizados → coseno = producto punto
+    - Lookup = UNA multiplicación matriz-vector sobre las entradas del scope
+      (pocas miles como máximo → < 1 ms)
+    - OrderedDict mantiene el orden LRU: move_to_end en cada hit,
+      popitem(last=False) para desalojar
+
+    SCOPE EN /asistente/chat:
+    - (use_agentic_rag, session_id): el agente recibe la sesión como
+      contexto, así que una respuesta solo se reutiliza DENTRO de la misma
+      sesión (paráfrasis y reintentos del mismo usuario), nunca entre
+      usuarios. Compartir respuestas entre sesiones solo sería correcto
+      para requests sin contexto de sesión
+    """
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        ttl_seconds: float | None = None,
+        threshold: float | None = None
+    ):
+        """
+        Args:
+            max_entries: Máximo de respuestas guardadas
+                         (usa env var ANSWER_CACHE_MAX_ENTRIES, default 1000)
+            ttl_seconds: Vida de una respuesta (usa env var ANSWER_CACHE_TTL_SECONDS, default 3600)
+            threshold: Similitud coseno mínima para un hit
+                       (usa env var ANSWER_CACHE_THRESHOLD, default 0.95)
+        """
+        self.max_entries = max_entries or int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+        self.threshold = threshold or float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+        self._entries: OrderedDict[int, _CacheEntry] = OrderedDict()
+        self._next_id = 0
+
+        # Matriz de vectores por (scope, versión); se reconstruye tras cambios
+        self._matrices: Dict[Tuple[Hashable, str], Tuple[List[int], np.ndarray]] = {}
+
+        # Estadísticas
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+    def get(
+        self,
+        query_embedding: Sequence[float],
+        scope: Hashable,
+        corpus_version: str
+    ) -> Any | None:
+        """
+        Busca una respuesta para una pregunta con el mismo significado.
+
+        Args:
+            query_embedding: Embedding de la query
+            scope: Todo lo que, además de la query, determina la respuesta
+                   (ej: (use_agentic_rag, session_id))
+            corpus_version: Versión de los documentos usados para responder
+
+        Returns:
+            El valor guardado, o None si no hay hit
+        """
+        self._evict_expired()
+
+        ids, matrix = self._scope_matrix((scope, corpus_version))
+        if not ids:
+            self.misses += 1
+            return None
+
+        scores = matrix @ self._normalize(query_embedding)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        entry_id = ids[best]
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        return self._entries[entry_id].value
+
+    def put(
+        self,
+        query_embedding: Sequence[float],
+        scope: Hashable,
+        corpus_version: str,
+        value: Any
+    ):
+        """
+        Guarda una respuesta.
+
+        Entradas del mismo scope con otra versión del corpus nunca volverán
+        a pegar: se descartan acá para liberar memoria.
+        """
+        stale = [
+            entry_id for entry_id, entry in self._entries.items()
+            if entry.scope == scope and entry.corpus_version != corpus_version
+        ]
+        for entry_id in stale:
+            self._remove(entry_id)
+
+        self._entries[self._next_id] = _CacheEntry(
+            scope=scope,
+            corpus_version=corpus_version,
+            vector=self._normalize(query_embedding),
+            value=value,
+            created_at=time.monotonic()
+        )
+        self._next_id += 1
+        self._matrices.pop((scope, corpus_version), None)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        """Vacía el caché"""
+        self._entries.clear()
+        self._matrices.clear()
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        self._matrices.pop((entry.scope, entry.corpus_version), None)
+
+    def _evict_expired(self):
+        """Elimina las entradas con más de ttl_seconds"""
+        now = time.monotonic()
+        expired = [
+            entry_id for entry_id, entry in self._entries.items()
+            if now - entry.created_at > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def _scope_matrix(self, key: Tuple[Hashable, str]) -> Tuple[List[int], np.ndarray]:
+        cached = self._matrices.get(key)
+        if cached is None:
+            ids = [
+                entry_id for entry_id, entry in self._entries.items()
+                if (entry.scope, entry.corpus_version) == key
+            ]
+            matrix = (
+                np.stack([self._entries[entry_id].vector for entry_id in ids])
+                if ids else np.empty((0, 0), dtype=np.float32)
+            )
+            cached = self._matrices[key] = (ids, matrix)
+        return cached
+
+
+def fingerprint_paths(*paths: str) -> str:
+    """
+    Versión barata de un conjunto de directorios: cantidad de archivos y mtime más reciente.
+
+    Sirve para detectar cambios en documentos e índices de Agent RAG
+    (que no pasan por el manifest del vector store).
+    """
+    files, latest = 0, 0
+    for path in paths:
+        root = Path(path)
+        if not root.exists():
+            continue
+        for file_path in root.rglob("*"):
+            if file_path.is_file():
+                files += 1
+                latest = max(latest, file_path.stat().st_mtime_ns)
+    return f"{files}:{latest}"
@@ -11,10 +11,16 @@ PEDAGOGÍA:
 - Fácil de extender para nuevos formatos
 """
 
+import asyncio
+import os
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 import re
 
+from src.rag.pdf_extraction import PDFExtractor, get_pdf_extractor
+from .page_store import PageTextStore, get_page_store
+
 
 class DocumentReader:
     """
@@ -30,11 +36,60 @@ class DocumentReader:
     - Fácil agregar PDFs sin romper nada
     - Metadata se infiere del path y nombre si no hay headers
     - Extensible: agregar nuevo formato = agregar método _read_xxx()
+
+    CACHÉ:
+    - Documentos parseados se guardan en memoria por (path, mtime, size)
+    - Cada llamada solo hace stat de los archivos y re-lee los que cambiaron
+    - corpus_version sube cada vez que un archivo aparece, cambia o desaparece
     """
 
     # Formatos soportados
     SUPPORTED_EXTENSIONS = {'.md', '.txt', '.pdf', '.docx'}
 
+    def __init__(
+        self,
+        pdf_extractor: PDFExtractor | None = None,
+        max_cache_bytes: int | None = None,
+        page_store: PageTextStore | None = None
+    ):
+        """
+        Args:
+            pdf_extractor: Extractor de PDFs con pool de procesos
+                           (default: el compartido del proceso)
+            max_cache_bytes: Tope de memoria del caché de documentos
+                             (usa env var DOCUMENT_CACHE_MAX_BYTES; None/0 = sin tope).
+                             Con tope, los menos usados se desalojan (LRU) y se
+                             vuelven a leer de disco cuando se necesiten.
+            page_store: Almacén de texto por página para read_pdf_pages
+                        (default: el compartido del proceso, creado al primer uso)
+        """
+        self.pdf_extractor = pdf_extractor or get_pdf_extractor()
+        self._page_store = page_store
+        self.max_cache_bytes = (
+            max_cache_bytes or int(os.getenv("DOCUMENT_CACHE_MAX_BYTES", "0")) or None
+        )
+
+        # path → {"document" (None si vacío), "bytes"}, en orden LRU
+        self._cache: OrderedDict[str, Dict[str, Any]] = OrderedDict()
+        self._cache_bytes = 0
+
+        # path → (mtime_ns, size) de todo archivo visto (sobrevive al desalojo)
+        self._known: Dict[str, tuple] = {}
+
+        # Versión del corpus leído (para cachés derivados, ej: índice BM25)
+        self.corpus_version = 0
+
+        # Estadísticas
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def page_store(self) -> PageTextStore:
+        """Almacén de texto por página (se abre al primer uso)"""
+        if self._page_store is None:
+            self._page_store = get_page_store()
+        return self._page_store
+
     async def read_all_documents(self, path: str = "data/documentos") -> List[Dict[str, Any]]:
         """
         Carga todos los documentos del directorio (multi-formato).
@@ -48,6 +103,7 @@ class DocumentReader:
         - Soporta .md, .pdf, .txt, .docx automáticamente
         - Metadata se extrae del contenido O se infiere del path
         - Fallbacks robustos: si no hay headers, usa nombre de archivo
+        - Solo se parsean archivos nuevos o modificados (ver caché)
 
         Args:
             path: Ruta al directorio de documentos
@@ -59,42 +115,101 @@ class DocumentReader:
         if not docs_path.exists():
             raise FileNotFoundError(f"Directorio no existe: {path}")
 
+        # Solo stat: barato comparado con parsear PDFs/DOCX
+        files = await asyncio.to_thread(self._scan_files, docs_path)
+
         documents = []
+        for file_path, key, stat in files:
+            signature = (stat.st_mtime_ns, stat.st_size)
+            changed = self._known.get(key) != signature
+            entry = None if changed else self._cache.get(key)
+
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                document = entry["document"]
+            else:
+                try:
+                    document = await self._parse_document(file_path)
+                except Exception as e:
+                    # Log error pero continuar con otros archivos
+                    print(f"⚠️  Error leyendo {file_path.name}: {e}")
+                    continue
+                self.cache_misses += 1
+                if changed:
+                    self._known[key] = signature
+                    self.corpus_version += 1
+                self._cache_put(key, document)
+
+            if document:
+                # Copia superficial: el caller no modifica el caché
+                documents.append({**document, "metadata": dict(document["metadata"])})
+
+        self._forget_missing(docs_path, {key for _, key, _ in files})
+        return documents
 
-        # Recorrer todos los archivos soportados
+    def _scan_files(self, docs_path: Path) -> List[tuple]:
+        """Lista (path, key, stat) de los archivos soportados"""
+        files = []
         for file_path in docs_path.rglob("*"):
-            if file_path.suffix.lower() not in self.SUPPORTED_EXTENSIONS:
+            if file_path.suffix.lower() not in self.SUPPORTED_EXTENSIONS or not file_path.is_file():
                 continue
+            files.append((file_path, str(file_path.resolve()), file_path.stat()))
+        return files
 
-            try:
-                # Leer contenido según formato
-                content = self._read_file(file_path)
-
-                if not content or not content.strip():
-                    continue  # Skip archivos vacíos
+    async def _parse_document(self, file_path: Path) -> Dict[str, Any] | None:
+        """Lee y extrae metadata de un archivo (None si está vacío)"""
+        # Leer contenido según formato (sin bloquear el event loop)
+        content = await self._read_file_async(file_path)
 
-                # Extraer metadata con fallbacks inteligentes
-                metadata = self._extract_metadata_robust(content, file_path)
+        if not content or not content.strip():
+            return None  # Skip archivos vacíos
 
-                # Generar ID único (prioridad: procedure_code > nombre archivo)
-                doc_id = metadata.get("procedure_code") or file_path.stem
+        # Extraer metadata con fallbacks inteligentes
+        metadata = self._extract_metadata_robust(content, file_path)
 
-                documents.append({
-                    "id": doc_id,
-                    "content": content,  # Documento COMPLETO (no chunks)
-                    "metadata": metadata
-                })
+        # Generar ID único (prioridad: procedure_code > nombre archivo)
+        doc_id = metadata.get("procedure_code") or file_path.stem
 
-            except Exception as e:
-                # Log error pero continuar con otros archivos
-                print(f"⚠️  Error leyendo {file_path.name}: {e}")
-                continue
+        return {
+            "id": doc_id,
+            "content": content,  # Documento COMPLETO (no chunks)
+            "metadata": metadata
+        }
 
-        return documents
+    def _cache_put(self, key: str, document: Dict[str, Any] | None):
+        """Guarda un documento parseado y aplica el tope de memoria (LRU)"""
+        self._cache_drop(key)
+
+        size = len(document["content"].encode("utf-8")) if document else 0
+        self._cache[key] = {"document": document, "bytes": size}
+        self._cache_bytes += size
+
+        # Desalojar los menos usados (nunca el recién leído)
+        while self.max_cache_bytes and self._cache_bytes > self.max_cache_bytes and len(self._cache) > 1:
+            self._cache_drop(next(iter(self._cache)))
+
+    def _cache_drop(self, key: str):
+        entry = self._cache.pop(key, None)
+        if entry:
+            self._cache_bytes -= entry["bytes"]
+
+    def _forget_missing(self, docs_path: Path, seen: set):
+        """Olvida archivos de este directorio que ya no existen"""
+        root = docs_path.resolve()
+        missing = [
+            key for key in self._known
+            if key not in seen and Path(key).is_relative_to(root)
+        ]
+        for key in missing:
+            del self._known[key]
+            self._cache_drop(key)
+        if missing:
+            self.corpus_version += 1
 
     def _read_file(self, file_path: Path) -> str:
         """
-        Lee archivo según su extensión.
+        Lee archivo según su extensión (formatos sin PDF, ver _read_file_async).
 
         PEDAGOGÍA:
         - Abstrae la lectura por tipo de archivo
@@ -104,50 +219,29 @@ class DocumentReader:
 
         if ext == '.md' or ext == '.txt':
             return self._read_text(file_path)
-        elif ext == '.pdf':
-            return self._read_pdf(file_path)
         elif ext == '.docx':
             return self._read_docx(file_path)
         else:
             # Fallback: intentar leer como texto
             return self._read_text(file_path)
 
-    def _read_text(self, file_path: Path) -> str:
-        """Lee archivos de texto plano (.md, .txt)"""
-        return file_path.read_text(encoding="utf-8")
-
-    def _read_pdf(self, file_path: Path) -> str:
+    async def _read_file_async(self, file_path: Path) -> str:
         """
-        Lee archivos PDF y extrae texto.
+        Lee un archivo de cualquier formato soportado sin bloquear el event loop.
 
         PEDAGOGÍA:
-        - Usa PyMuPDF (fitz) para extracción robusta de texto
-        - Mantiene estructura de páginas
-        - Rápido y eficiente en memoria
-
-        NOTE: Requiere: pip install PyMuPDF
+        - PDFs → pool de procesos (usa todos los cores, no bloquea la API)
+        - Otros formatos → thread (I/O de disco fuera del event loop)
         """
-        try:
-            import fitz
-        except ImportError:
-            raise ImportError(
-                "PyMuPDF no está instalado. "
-                "Ejecuta: pip install PyMuPDF"
-            )
+        if file_path.suffix.lower() == '.pdf':
+            return await self.pdf_extractor.extract_text(file_path)
+        return await asyncio.to_thread(self._read_file, file_path)
 
-        text_parts = []
-        doc = fitz.open(file_path)
-
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            page_text = page.get_text()
-            if page_text and page_text.strip():
-                text_parts.append(f"--- Página {page_num + 1} ---\n{page_text}")
-
-        doc.close()
-        return "\n\n".join(text_parts)
+    def _read_text(self, file_path: Path) -> str:
+        """Lee archivos de texto plano (.md, .txt)"""
+        return file_path.read_text(encoding="utf-8")
 
-    def read_pdf_pages(self, file_path: Path, page_start: int, page_end: int) -> str:
+    async def read_pdf_pages(self, file_path: Path, page_start: int, page_end: int) -> str:
         """
         Lee solo páginas específicas de un PDF.
 
@@ -155,6 +249,11 @@ class DocumentReader:
         - Extracción eficiente: solo lee páginas necesarias
         - Más rápido que leer documento completo
         - Reduce tokens enviados al LLM
+        - PageTextStore: si el PDF ya se extrajo (al indexar o en una lectura
+          anterior), es una consulta SQLite por clave, sin abrir el PDF
+        - Si no está, se extrae en el pool de procesos de PDFExtractor
+          (fitz nunca corre en el event loop)
+        - Un rango fuera del documento lanza ValueError (índice desactualizado)
 
         Args:
             file_path: Ruta al archivo PDF
@@ -166,39 +265,53 @@ class DocumentReader:
 
         Example:
             # Leer páginas 5-8 de un PDF
-            text = reader.read_pdf_pages(Path("doc.pdf"), 5, 8)
+            text = await reader.read_pdf_pages(Path("doc.pdf"), 5, 8)
         """
-        try:
-            import fitz
-        except ImportError:
-            raise ImportError(
-                "PyMuPDF no está instalado. "
-                "Ejecuta: pip install PyMuPDF"
-            )
+        store = self.page_store
+        pages = await asyncio.to_thread(store.get_pages, file_path, page_start, page_end)
+
+        if pages is None:
+            # Primera lectura: extraer TODAS las páginas y guardarlas
+            total_pages, all_pages = await self.pdf_extractor.extract_pages_with_total(file_path)
+            await asyncio.to_thread(store.put_pages, file_path, all_pages, total_pages)
+            # get_pages valida el rango contra el total real de páginas
+            pages = await asyncio.to_thread(store.get_pages, file_path, page_start, page_end)
+
+        return PDFExtractor.format_pages(pages)
+
+    async def read_section_cached(
+        self,
+        file_path: Path,
+        section: Dict[str, Any],
+        extract_section: Callable[[str, Dict[str, Any]], str]
+    ) -> str:
+        """
+        Lee una sección de un documento sin páginas (Markdown, TXT, DOCX...).
 
-        doc = fitz.open(file_path)
-        total_pages = len(doc)
+        PEDAGOGÍA:
+        - PageTextStore guarda el texto de la sección (clave: hash del
+          archivo + section_id + título): solo la primera lectura abre y
+          recorre el archivo completo
+        - Cómo ubicar la sección dentro del texto lo decide el caller
 
-        # Validar rangos
-        if page_start < 1 or page_end > total_pages:
-            doc.close()
-            raise ValueError(
-                f"Rango de páginas inválido: {page_start}-{page_end} "
-                f"(documento tiene {total_pages} páginas)"
-            )
+        Args:
+            file_path: Ruta al documento
+            section: Entrada de la sección en el índice (section_id, title...)
+            extract_section: Función (texto completo, sección) → texto de la sección
 
-        text_parts = []
+        Returns:
+            Texto de la sección
+        """
+        store = self.page_store
+        section_key = store.section_key(section)
+        text = await asyncio.to_thread(store.get_section, file_path, section_key)
 
-        # Convertir a 0-indexed para fitz
-        for page_num in range(page_start - 1, page_end):
-            page = doc[page_num]
-            page_text = page.get_text()
-            if page_text and page_text.strip():
-                # Incluir número de página para contexto
-                text_parts.append(f"--- Página {page_num + 1} ---\n{page_text}")
+        if text is None:
+            content = await self._read_file_async(file_path)
+            text = extract_section(content, section)
+            await asyncio.to_thread(store.put_section, file_path, section_key, text)
 
-        doc.close()
-        return "\n\n".join(text_parts)
+        return text
 
     def _read_docx(self, file_path: Path) -> str:
         """
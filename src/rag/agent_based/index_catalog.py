@@ -0,0 +1,226 @@
+"""
+Catálogo compilado de índices para Agent RAG
+
+retrieve_with_index necesita TODOS los índices en cada query (Fase 1).
+Abrir y parsear N archivos JSON por request escala con el corpus y con el
+tráfico; este catálogo los compila una vez y los sirve desde memoria.
+
+PEDAGOGÍA:
+- Un solo archivo SQLite (stdlib) con todas las entradas de documentos y
+  secciones → un proceso nuevo no re-parsea los JSON que no cambiaron
+- En memoria: dicts por document_id y (document_id, section_id) → O(1)
+- Hot reload: en cada acceso se compara la firma (mtime_ns, tamaño) de
+  cada *.json con la última cargada; si alguna cambió, se re-sincronizan
+  solo los archivos modificados
+- Firma por archivo (no el mtime del directorio): editar un JSON "en sitio"
+  no cambia el directorio, pero sí el mtime del archivo → también se detecta
+- refresh() es BLOQUEANTE (glob, SQLite, json.load): desde código async
+  llamarlo con asyncio.to_thread para no frenar el event loop
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+# Archivos de ejemplo/documentación que no son índices reales
+EXAMPLE_PREFIX = "EXAMPLE-"
+
+
+class IndexCatalog:
+    """
+    Catálogo de índices JSON de un directorio, con recarga en caliente.
+
+    PEDAGOGÍA:
+    - Tabla catalog_files: firma (mtime, tamaño) de cada JSON compilado
+    - Tabla documents: el índice completo (con secciones) por archivo
+    - Varios directorios pueden compartir el archivo SQLite (clave = directorio)
+    """
+
+    def __init__(
+        self,
+        indices_dir: str = "data/indices",
+        cache_path: str | None = None
+    ):
+        """
+        Args:
+            indices_dir: Directorio con los índices JSON
+            cache_path: Archivo SQLite del catálogo
+                        (usa env var AGENT_INDEX_CATALOG_PATH, default data/cache/index_catalog.sqlite)
+        """
+        self.indices_dir = Path(indices_dir)
+        self.cache_path = Path(
+            cache_path or os.getenv("AGENT_INDEX_CATALOG_PATH", "data/cache/index_catalog.sqlite")
+        )
+
+        self._directory_key = str(self.indices_dir.resolve())
+        self._signatures: Optional[Dict[str, Tuple[int, int]]] = None
+        self._documents: Dict[str, Dict[str, Any]] = {}
+        self._sections: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        # Un solo thread sincroniza a la vez (los demás esperan y reutilizan)
+        self._lock = threading.Lock()
+
+        # Estadísticas
+        self.reloads = 0
+        self.files_parsed = 0
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._documents)
+
+    def refresh(self) -> bool:
+        """
+        Re-sincroniza el catálogo si algún JSON cambió, apareció o se borró.
+
+        Bloqueante: desde código async usar asyncio.to_thread(catalog.refresh).
+
+        Returns:
+            True si se recargó
+        """
+        with self._lock:
+            if not self.indices_dir.is_dir():
+                self._signatures = None
+                self._documents, self._sections = {}, {}
+                return False
+
+            signatures = self._scan()
+            if signatures == self._signatures:
+                return False
+
+            # Se guardan las firmas leídas ANTES de sincronizar: si un archivo
+            # cambia durante la sincronización, el próximo acceso lo detecta
+            self._sync(signatures)
+            self._signatures = signatures
+            self.reloads += 1
+            return True
+
+    def documents(self) -> Mapping[str, Dict[str, Any]]:
+        """
+        Todos los índices disponibles.
+
+        Returns:
+            Vista de solo lectura {document_id: index_data}
+            (los index_data son compartidos: no modificarlos)
+        """
+        self.refresh()
+        return MappingProxyType(self._documents)
+
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Índice de un documento, o None si no existe"""
+        self.refresh()
+        return self._documents.get(document_id)
+
+    def get_section(self, document_id: str, section_id: str) -> Optional[Dict[str, Any]]:
+        """Entrada de una sección de un documento, o None si no existe"""
+        self.refresh()
+        return self._sections.get((document_id, str(section_id)))
+
+    def _connect(self) -> sqlite3.Connection:
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.cache_path))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_files (
+                directory TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (directory, file_name)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                directory TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (directory, file_name)
+            )
+        """)
+        return conn
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        """Firma (mtime_ns, tamaño) de cada índice JSON del directorio"""
+        signatures = {}
+        for file_path in self.indices_dir.glob("*.json"):
+            if file_path.name.startswith(EXAMPLE_PREFIX):
+                continue
+            try:
+                stat = file_path.stat()
+            except FileNotFoundError:
+                continue  # Borrado entre el glob y el stat
+            signatures[file_path.name] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def _sync(self, signatures: Dict[str, Tuple[int, int]]):
+        """Compila los JSON nuevos o modificados y recarga el catálogo en memoria"""
+        conn = self._connect()
+        try:
+            with conn:
+                stored = {
+                    name: (mtime_ns, size)
+                    for name, mtime_ns, size in conn.execute(
+                        "SELECT file_name, mtime_ns, size FROM catalog_files WHERE directory = ?",
+                        (self._directory_key,)
+                    )
+                }
+
+                for name in stored.keys() - signatures.keys():
+                    self._delete_file(conn, name)
+
+                for name, signature in signatures.items():
+                    if stored.get(name) != signature:
+                        self._compile_file(conn, name, signature)
+
+            rows = conn.execute(
+                "SELECT file_name, document_id, data FROM documents "
+                "WHERE directory = ? ORDER BY file_name",
+                (self._directory_key,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        documents: Dict[str, Dict[str, Any]] = {}
+        sections: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for file_name, doc_id, data in rows:
+            if doc_id in documents:
+                print(f"⚠️  document_id duplicado {doc_id} en {file_name}: se usa este archivo")
+            index_data = json.loads(data)
+            documents[doc_id] = index_data
+            for section in index_data.get("sections", []):
+                sections[(doc_id, str(section.get("section_id")))] = section
+
+        self._documents, self._sections = documents, sections
+
+    def _compile_file(self, conn: sqlite3.Connection, name: str, signature: Tuple[int, int]):
+        """Parsea un JSON y lo guarda en el catálogo (un archivo inválido queda registrado sin documento)"""
+        self._delete_file(conn, name)
+        conn.execute(
+            "INSERT INTO catalog_files (directory, file_name, mtime_ns, size) VALUES (?, ?, ?, ?)",
+            (self._directory_key, name, *signature)
+        )
+
+        try:
+            with open(self.indices_dir / name, "r", encoding="utf-8") as f:
+                index_data = json.load(f)
+        except Exception as e:
+            print(f"⚠️  Error cargando índice {name}: {e}")
+            return
+
+        self.files_parsed += 1
+        doc_id = index_data.get("document_id", Path(name).stem)
+        conn.execute(
+            "INSERT INTO documents (directory, file_name, document_id, data) VALUES (?, ?, ?, ?)",
+            (self._directory_key, name, doc_id, json.dumps(index_data, ensure_ascii=False))
+        )
+
+    def _delete_file(self, conn: sqlite3.Connection, name: str):
+        for table in ("catalog_files", "documents"):
+            conn.execute(
+                f"DELETE FROM {table} WHERE directory = ? AND file_name = ?",
+                (self._directory_key, name)
+            )
@@ -17,12 +17,63 @@ PEDAGOGÍA:
 - LLM resume batches de 5 páginas → más eficiente
 """
 
+import asyncio
+import hashlib
 import json
+import os
 import re
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from src.rag.pdf_extraction import PDFExtractor, get_pdf_extractor
+from .page_store import PageTextStore, get_page_store
+
+
+class BatchCheckpoint:
+    """
+    Resúmenes de batch ya generados para un PDF, persistidos en disco.
+
+    PEDAGOGÍA:
+    - Cada resumen se escribe apenas llega (tmp + os.replace: nunca queda
+      un JSON a medias) → si el proceso muere, la re-ejecución retoma
+    - Válido solo para el mismo contenido (hash del PDF) y batch_size
+    - Se borra cuando el índice del documento se guarda
+    """
+
+    def __init__(self, path: Path, file_hash: str, batch_size: int):
+        self.path = path
+        self.file_hash = file_hash
+        self.batch_size = batch_size
+        self.summaries: Dict[str, str] = {}
+
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if (data.get("file_hash"), data.get("batch_size")) == (file_hash, batch_size):
+                    self.summaries = data.get("summaries", {})
+            except Exception as e:
+                print(f"   ⚠️  Checkpoint ilegible, se ignora: {e}")
+
+    def get(self, batch_key: str) -> Optional[str]:
+        return self.summaries.get(batch_key)
+
+    def put(self, batch_key: str, summary: str):
+        self.summaries[batch_key] = summary
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "file_hash": self.file_hash,
+                "batch_size": self.batch_size,
+                "summaries": self.summaries
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+
 
 class AgentRAGIndexer:
     """
@@ -41,22 +92,53 @@ class AgentRAGIndexer:
     - Resúmenes estructurados facilitan búsqueda posterior
     - Metadata se extrae automáticamente
     - Keywords por sección para búsqueda rápida
+
+    CONCURRENCIA Y CHECKPOINTS:
+    - Los batches de un documento se resumen en paralelo (asyncio.gather)
+    - Un semáforo compartido limita las llamadas al LLM en vuelo, también
+      cuando se indexan varios documentos a la vez con la misma instancia
+    - Cada resumen terminado se guarda en un checkpoint por PDF
     """
 
-    def __init__(self, model_provider):
+    def __init__(
+        self,
+        model_provider,
+        pdf_extractor: PDFExtractor | None = None,
+        page_store: PageTextStore | None = None,
+        max_concurrency: int | None = None,
+        checkpoint_dir: str | None = None
+    ):
         """
         Args:
             model_provider: Instancia de ModelProvider (ej: VertexAIProvider)
                            Necesitamos LLM para resumir contenido
+            pdf_extractor: Extractor de PDFs con pool de procesos
+                           (default: el compartido del proceso)
+            page_store: Almacén de texto por página que usa la Fase 3 de
+                        retrieve_with_index (default: el compartido del proceso)
+            max_concurrency: Llamadas al LLM en vuelo simultáneamente
+                             (usa env var AGENT_INDEXER_CONCURRENCY, default 4)
+            checkpoint_dir: Directorio de checkpoints de resúmenes por PDF
+                            (usa env var AGENT_INDEXER_CHECKPOINT_DIR,
+                            default data/cache/index_checkpoints)
         """
         self.model_provider = model_provider
+        self.pdf_extractor = pdf_extractor or get_pdf_extractor()
+        self.page_store = page_store or get_page_store()
+        self.max_concurrency = max(1, max_concurrency or int(
+            os.getenv("AGENT_INDEXER_CONCURRENCY", "4")
+        ))
+        self.checkpoint_dir = Path(
+            checkpoint_dir or os.getenv("AGENT_INDEXER_CHECKPOINT_DIR", "data/cache/index_checkpoints")
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
 
     async def index_document(
         self,
         pdf_path: str,
         output_dir: str = "data/indices",
         batch_size: int = 5
-    ) -> Dict[str, Any]:
+    ) -> Tuple[Dict[str, Any], str]:
         """
         Procesa un PDF completo y genera su índice.
 
@@ -68,19 +150,27 @@ class AgentRAGIndexer:
         5. Crea índice JSON
         6. Guarda en disco
 
+        RE-INDEXACIÓN INCREMENTAL:
+        - Cada sección guarda source_hash (sha256 del texto de sus páginas)
+        - Si ya existe un índice del documento, las secciones con el mismo
+          source_hash reutilizan su resumen y keywords (sin LLM)
+        - El resumen global solo se regenera si alguna sección cambió
+        - Costo LLM de una actualización: O(páginas cambiadas), no O(páginas)
+
         Args:
             pdf_path: Ruta al archivo PDF
             output_dir: Directorio donde guardar índices
             batch_size: Páginas por batch (default: 5)
 
         Returns:
-            Dict con el índice generado
+            Tupla (índice, status): status = "generated" si se escribió un
+            índice nuevo, "unchanged" si el existente sigue vigente
 
         Example:
             >>> indexer = AgentRAGIndexer(model_provider)
-            >>> index = await indexer.index_document("data/documentos/jubilacion/proc-jub-001.pdf")
-            >>> print(index["document_id"])
-            'PROC-JUB-001'
+            >>> index, status = await indexer.index_document("data/documentos/jubilacion/proc-jub-001.pdf")
+            >>> print(index["document_id"], status)
+            'PROC-JUB-001' 'generated'
         """
         print(f"\n📄 Indexando: {pdf_path}")
 
@@ -90,7 +180,7 @@ class AgentRAGIndexer:
 
         try:
             # 1. Leer PDF completo
-            pages = self._read_pdf_pages(pdf_path_obj)
+            pages = await self._read_pdf_pages(pdf_path_obj)
             if not pages:
                 raise ValueError(f"No se pudo extraer texto del PDF: {pdf_path}")
 
@@ -100,14 +190,62 @@ class AgentRAGIndexer:
             batches = self._create_batches(pages, batch_size)
             print(f"   ✓ Creados {len(batches)} batches de {batch_size} páginas")
 
-            # 3. Resumir cada batch
-            sections = []
-            for i, batch in enumerate(batches, 1):
-                print(f"   📝 Resumiendo batch {i}/{len(batches)}...")
-                summary = await self._summarize_batch(batch)
+            # Metadata primero: el document_id ubica el índice anterior
+            metadata = self._extract_metadata_from_content(pages, pdf_path_obj)
+            previous = self._load_previous_index(metadata, output_dir)
+            previous_sections = {
+                section["source_hash"]: section
+                for section in (previous or {}).get("sections", [])
+                if section.get("source_hash")
+            }
+            source_hashes = [self._batch_source_hash(batch) for batch in batches]
+            reused = sum(1 for h in source_hashes if h in previous_sections)
+            if reused:
+                print(f"   ↻ Índice anterior: {reused}/{len(batches)} secciones sin cambios")
+
+            # 3. Resumir EN PARALELO solo los batches nuevos o modificados
+            # (retomando del checkpoint si existe)
+            file_hash = await asyncio.to_thread(self.page_store.file_hash, pdf_path_obj)
+            # Clave = hash del contenido: dos PDFs con el mismo nombre en
+            # carpetas distintas (indexados en paralelo) no se pisan
+            checkpoint = BatchCheckpoint(
+                self.checkpoint_dir / f"{file_hash}.json",
+                file_hash,
+                batch_size
+            )
+            if checkpoint.summaries:
+                print(f"   ↻ Checkpoint: {len(checkpoint.summaries)}/{len(batches)} batches ya resumidos")
+
+            pending = [
+                (batch, source_hash) for batch, source_hash in zip(batches, source_hashes)
+                if source_hash not in previous_sections
+            ]
+            if pending:
+                print(f"   📝 Resumiendo {len(pending)} batches (hasta {self.max_concurrency} en paralelo)...")
+            summaries = await asyncio.gather(*[
+                self._summarize_batch(batch, checkpoint)
+                for batch, _ in pending
+            ])
+            new_summaries = {
+                source_hash: summary
+                for (_, source_hash), summary in zip(pending, summaries)
+            }
 
-                # Generar keywords del resumen
-                keywords = self._extract_keywords(summary)
+            sections = []
+            for i, (batch, source_hash) in enumerate(zip(batches, source_hashes), 1):
+                if source_hash in previous_sections:
+                    summary = previous_sections[source_hash]["summary"]
+                    keywords = previous_sections[source_hash].get("keywords", [])
+                else:
+                    summary = new_summaries[source_hash]
+                    # Generar keywords del resumen
+                    keywords = self._extract_keywords(summary)
+
+                    # El checkpoint solo guarda resúmenes del LLM: un resumen
+                    # básico (fallback) queda sin hash para reintentarse
+                    batch_key = f"{batch[0]['page_num']}-{batch[-1]['page_num']}"
+                    if checkpoint.get(batch_key) != summary:
+                        source_hash = None
 
                 sections.append({
                     "section_id": str(i),
@@ -115,17 +253,27 @@ class AgentRAGIndexer:
                     "pages": [page["page_num"] for page in batch],
                     "page_range": f"{batch[0]['page_num']}-{batch[-1]['page_num']}",
                     "summary": summary,
-                    "keywords": keywords
+                    "keywords": keywords,
+                    "source_hash": source_hash
                 })
 
             print(f"   ✓ {len(sections)} secciones resumidas")
 
+            # ¿Cambió alguna sección respecto del índice anterior?
+            unchanged = previous is not None and previous.get("summary") and [
+                (s.get("source_hash"), s.get("summary")) for s in previous.get("sections", [])
+            ] == [(s["source_hash"], s["summary"]) for s in sections]
+
+            if unchanged:
+                checkpoint.discard()
+                print("   ✅ Sin cambios: el índice existente sigue vigente")
+                return previous, "unchanged"
+
             # 4. Generar resumen global
             print("   📝 Generando resumen global del documento...")
             global_summary = await self._summarize_document(sections)
 
-            # 5. Extraer metadata del PDF
-            metadata = self._extract_metadata_from_content(pages, pdf_path_obj)
+            # 5. Metadata del PDF (extraída al inicio)
 
             # 6. Crear índice estructurado
             document = {
@@ -136,49 +284,73 @@ class AgentRAGIndexer:
 
             # 7. Guardar índice
             output_path = self._save_index(index, output_dir)
+            checkpoint.discard()
             print(f"   ✅ Índice guardado: {output_path}")
 
-            return index
+            return index, "generated"
 
         except Exception as e:
             print(f"   ❌ Error indexando {pdf_path}: {e}")
             raise
 
-    def _read_pdf_pages(self, pdf_path: Path) -> List[Dict[str, Any]]:
+    async def _read_pdf_pages(self, pdf_path: Path) -> List[Dict[str, Any]]:
         """
-        Lee PDF página por página con PyMuPDF (fitz).
+        Lee PDF página por página con PyMuPDF (fitz) en un pool de procesos.
 
         PEDAGOGÍA:
         - PyMuPDF es rápido y eficiente
         - Mantiene estructura de páginas
-        - Extrae texto limpio
+        - Las páginas se reparten entre cores sin bloquear el event loop
+        - El texto crudo queda en el PageTextStore: en las queries, la Fase 3
+          lee las páginas de ahí sin volver a abrir el PDF
 
         Returns:
             Lista de páginas: [{"page_num": 1, "text": "..."}, ...]
         """
-        try:
-            import fitz
-        except ImportError:
-            raise ImportError(
-                "PyMuPDF no está instalado. "
-                "Ejecuta: pip install pymupdf"
-            )
+        total_pages, pages = await self.pdf_extractor.extract_pages_with_total(pdf_path)
+        await asyncio.to_thread(self.page_store.put_pages, pdf_path, pages, total_pages)
+        return [
+            {
+                "page_num": page["page_num"],  # 1-indexed for consistency
+                "text": page["text"].strip()
+            }
+            for page in pages
+        ]
+
+    @staticmethod
+    def _batch_source_hash(batch: List[Dict[str, Any]]) -> str:
+        """sha256 del texto de las páginas de un batch (con sus números de página)"""
+        pages_text = "\n\n".join(
+            f"=== Página {p['page_num']} ===\n{p['text']}"
+            for p in batch
+        )
+        return hashlib.sha256(pages_text.encode("utf-8")).hexdigest()
+
+    def _load_previous_index(
+        self,
+        metadata: Dict[str, Any],
+        output_dir: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Índice anterior del documento, si existe y corresponde al mismo PDF.
+
+        Returns:
+            El índice guardado, o None
+        """
+        index_path = Path(output_dir) / f"{metadata.get('procedure_code', 'UNKNOWN')}.json"
+        if not index_path.exists():
+            return None
 
-        pages = []
-        doc = fitz.open(pdf_path)
         try:
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                if text and text.strip():
-                    pages.append({
-                        "page_num": page_num + 1,  # 1-indexed for consistency
-                        "text": text.strip()
-                    })
-        finally:
-            doc.close()
-
-        return pages
+            with open(index_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        except Exception as e:
+            print(f"   ⚠️  Índice anterior ilegible, se regenera completo: {e}")
+            return None
+
+        if previous.get("source_file") != metadata.get("source_file"):
+            return None
+        return previous
 
     def _create_batches(
         self,
@@ -206,7 +378,11 @@ class AgentRAGIndexer:
             batches.append(batch)
         return batches
 
-    async def _summarize_batch(self, batch: List[Dict[str, Any]]) -> str:
+    async def _summarize_batch(
+        self,
+        batch: List[Dict[str, Any]],
+        checkpoint: Optional[BatchCheckpoint] = None
+    ) -> str:
         """
         Resume un batch de páginas con LLM.
 
@@ -215,13 +391,22 @@ class AgentRAGIndexer:
         - Temperatura baja (0.3) para consistencia
         - Max tokens suficiente para resumen detallado
         - Estructura clara: tema + puntos clave + requisitos
+        - Con checkpoint: si el batch ya se resumió, no se llama al LLM; los
+          resúmenes básicos (LLM falló) NO se guardan, se reintentan
 
         Args:
             batch: Lista de páginas del batch
+            checkpoint: Checkpoint del documento (opcional)
 
         Returns:
             Resumen del batch (max 150 palabras)
         """
+        batch_key = f"{batch[0]['page_num']}-{batch[-1]['page_num']}"
+        if checkpoint is not None:
+            cached = checkpoint.get(batch_key)
+            if cached is not None:
+                return cached
+
         # Concatenar texto de páginas
         pages_text = "\n\n".join([
             f"=== Página {p['page_num']} ===\n{p['text']}"
@@ -245,12 +430,16 @@ PÁGINAS:
 RESUMEN:"""
 
         try:
-            summary = await self.model_provider.generate(
-                prompt=prompt,
-                temperature=0.3,  # Baja para consistencia
-                max_tokens=4000   # Modelo soporta 1M tokens de contexto
-            )
-            return summary.strip()
+            async with self._semaphore:
+                summary = await self.model_provider.generate(
+                    prompt=prompt,
+                    temperature=0.3,  # Baja para consistencia
+                    max_tokens=4000   # Modelo soporta 1M tokens de contexto
+                )
+            summary = summary.strip()
+            if checkpoint is not None:
+                checkpoint.put(batch_key, summary)
+            return summary
         except Exception as e:
             # Fallback: usar primeras 200 palabras del batch
             print(f"   ⚠️  LLM falló, usando resumen básico: {e}")
@@ -295,11 +484,12 @@ RESÚMENES DE SECCIONES:
 RESUMEN GLOBAL:"""
 
         try:
-            summary = await self.model_provider.generate(
-                prompt=prompt,
-                temperature=0.3,
-                max_tokens=4000  # Modelo soporta 1M tokens de contexto
-            )
+            async with self._semaphore:
+                summary = await self.model_provider.generate(
+                    prompt=prompt,
+                    temperature=0.3,
+                    max_tokens=4000  # Modelo soporta 1M tokens de contexto
+                )
             return summary.strip()
         except Exception as e:
             # Fallback: usar primer resumen de sección
@@ -438,9 +628,12 @@ RESUMEN GLOBAL:"""
         filename = f"{index['document_id']}.json"
         file_path = output_path / filename
 
-        # Guardar con formato bonito (indent=2)
-        with open(file_path, "w", encoding="utf-8") as f:
+        # Guardar con formato bonito (indent=2) en un temporal y reemplazar
+        # de forma atómica: un lector (IndexCatalog) nunca ve un JSON a medias
+        tmp_path = file_path.with_name(f".{filename}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(index, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, file_path)
 
         return str(file_path)
 
@@ -563,7 +756,7 @@ async def test_indexer():
     # 4. Indexar documento
     print("\n4️⃣  Indexando documento...")
     try:
-        index = await indexer.index_document(pdf_path)
+        index, _ = await indexer.index_document(pdf_path)
     except Exception as e:
         print(f"   ❌ Error indexando: {e}")
         import traceback
@@ -0,0 +1,246 @@
+"""
+Almacén persistente del texto de cada página para Agent RAG
+
+La Fase 3 de retrieve_with_index lee secciones por páginas. Sin este
+almacén, cada query re-abre el PDF con fitz y re-extrae el texto (y cada
+sección Markdown re-lee y re-escanea el archivo completo).
+
+PEDAGOGÍA:
+- El texto se extrae UNA vez (al indexar, o en la primera lectura) y se
+  guarda en SQLite keyed por (hash del archivo, página)
+- Clave por contenido: si el PDF cambia, cambia el hash → nunca se sirve
+  texto viejo; si se mueve o renombra, el texto se reutiliza
+- Hashear un PDF en cada query sería caro: la tabla file_paths recuerda
+  (mtime, tamaño) → hash y solo se re-hashea si el archivo cambió
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class PageTextStore:
+    """
+    Texto de páginas de PDF y de secciones Markdown, keyed por hash del archivo.
+
+    PEDAGOGÍA:
+    - Tabla pages: (file_hash, page_num) → texto; leer un rango de páginas
+      es una consulta por clave primaria (sin parsear el PDF)
+    - Tabla pdf_files: PDFs completos con su total REAL de páginas (las
+      páginas vacías no se guardan: "no hay fila" no distingue vacía de no
+      extraída, y el total valida el rango pedido)
+    - Tabla sections: secciones Markdown ya extraídas por section_id (+ título)
+    - Una conexión compartida entre threads, protegida por un lock
+    """
+
+    def __init__(self, path: str | None = None):
+        """
+        Args:
+            path: Archivo SQLite del almacén
+                  (usa env var AGENT_PAGE_STORE_PATH, default data/cache/page_text.sqlite)
+        """
+        self.path = Path(path or os.getenv("AGENT_PAGE_STORE_PATH", "data/cache/page_text.sqlite"))
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_paths (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                file_hash TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pdf_files (
+                file_hash TEXT PRIMARY KEY,
+                total_pages INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                file_hash TEXT NOT NULL,
+                page_num INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (file_hash, page_num)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS sections (
+                file_hash TEXT NOT NULL,
+                section_key TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (file_hash, section_key)
+            )
+        """)
+        self._conn.commit()
+
+    def file_hash(self, file_path: Path | str) -> str:
+        """
+        sha256 del contenido del archivo (re-hashea solo si cambió mtime o tamaño).
+
+        Args:
+            file_path: Ruta al archivo
+
+        Returns:
+            Hash hexadecimal
+        """
+        path = Path(file_path).resolve()
+        stat = path.stat()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size, file_hash FROM file_paths WHERE path = ?",
+                (str(path),)
+            ).fetchone()
+        if row and (row[0], row[1]) == (stat.st_mtime_ns, stat.st_size):
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        file_hash = digest.hexdigest()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_paths (path, mtime_ns, size, file_hash) VALUES (?, ?, ?, ?)",
+                (str(path), stat.st_mtime_ns, stat.st_size, file_hash)
+            )
+            self._conn.commit()
+        return file_hash
+
+    def put_pages(
+        self,
+        file_path: Path | str,
+        pages: List[Dict[str, Any]],
+        total_pages: int
+    ):
+        """
+        Guarda el texto de TODAS las páginas de un PDF.
+
+        Args:
+            file_path: Ruta al PDF
+            pages: Páginas no vacías [{"page_num": 1, "text": "..."}, ...]
+                   (formato de PDFExtractor.extract_pages)
+            total_pages: Total de páginas del PDF (incluidas las vacías)
+        """
+        file_hash = self.file_hash(file_path)
+
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM pages WHERE file_hash = ?", (file_hash,))
+                self._conn.executemany(
+                    "INSERT INTO pages (file_hash, page_num, text) VALUES (?, ?, ?)",
+                    [(file_hash, page["page_num"], page["text"]) for page in pages]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO pdf_files (file_hash, total_pages) VALUES (?, ?)",
+                    (file_hash, total_pages)
+                )
+
+    def get_pages(
+        self,
+        file_path: Path | str,
+        page_start: int,
+        page_end: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Lee un rango de páginas ya extraídas.
+
+        Args:
+            file_path: Ruta al PDF
+            page_start: Página inicial (1-indexed)
+            page_end: Página final (1-indexed, inclusiva)
+
+        Returns:
+            Páginas no vacías del rango, o None si el PDF no está en el almacén
+
+        Raises:
+            ValueError: Si el rango excede las páginas del PDF
+        """
+        file_hash = self.file_hash(file_path)
+
+        with self._lock:
+            stored = self._conn.execute(
+                "SELECT total_pages FROM pdf_files WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+            if stored is None:
+                self.misses += 1
+                return None
+
+            total_pages = stored[0]
+            if page_start < 1 or page_end > total_pages:
+                raise ValueError(
+                    f"Rango de páginas inválido: {page_start}-{page_end} "
+                    f"(documento tiene {total_pages} páginas)"
+                )
+
+            rows = self._conn.execute(
+                "SELECT page_num, text FROM pages "
+                "WHERE file_hash = ? AND page_num BETWEEN ? AND ? ORDER BY page_num",
+                (file_hash, page_start, page_end)
+            ).fetchall()
+
+        self.hits += 1
+        return [{"page_num": page_num, "text": text} for page_num, text in rows]
+
+    @staticmethod
+    def section_key(section: Dict[str, Any]) -> str:
+        """
+        Clave de una sección del índice: section_id + título.
+
+        El section_id distingue secciones con el mismo título; el título
+        invalida el texto si un re-índice cambia qué sección es cuál.
+        """
+        return f"{section.get('section_id')}\x1f{section.get('title', '')}"
+
+    def get_section(self, file_path: Path | str, section_key: str) -> Optional[str]:
+        """Texto de una sección Markdown ya extraída (clave de section_key), o None"""
+        file_hash = self.file_hash(file_path)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM sections WHERE file_hash = ? AND section_key = ?",
+                (file_hash, section_key)
+            ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put_section(self, file_path: Path | str, section_key: str, text: str):
+        """Guarda el texto de una sección Markdown"""
+        file_hash = self.file_hash(file_path)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sections (file_hash, section_key, text) VALUES (?, ?, ?)",
+                (file_hash, section_key, text)
+            )
+            self._conn.commit()
+
+    def close(self):
+        """Cierra la conexión SQLite"""
+        self._conn.close()
+
+
+# Instancia compartida por proceso (indexer y DocumentReader usan el mismo archivo)
+_default_store: PageTextStore | None = None
+
+
+def get_page_store() -> PageTextStore:
+    """Retorna el PageTextStore compartido del proceso"""
+    global _default_store
+    if _default_store is None:
+        _default_store = PageTextStore()
+    return _default_store
@@ -11,10 +11,14 @@ VERSION 2.0: Retrieval con índices JSON
 
 import asyncio
 import json
+import os
+import random
 import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Mapping, Optional, Tuple
+from src.rag.lexical import BM25Index
 from .document_reader import DocumentReader
+from .index_catalog import IndexCatalog
 from .chunk_evaluator import ChunkEvaluator
 
 
@@ -34,20 +38,69 @@ class AgentRetrieval:
     - Pocos documentos (<100)
     - Necesitas explicabilidad
     - No quieres infraestructura de vectores
+
+    PRE-FILTRO LÉXICO:
+    - Juzgar TODO el corpus con el LLM escala linealmente en costo y rate limit
+    - BM25 (barato, en memoria) elige max_candidates documentos; solo esos
+      van al LLM
+    - Recall del pre-filtro: en una muestra de queries (shadow_sample_rate)
+      se juzga también el resto en segundo plano y se mide cuántos del
+      top-k "real" habían pasado el filtro
     """
 
     def __init__(
         self,
         document_reader: DocumentReader,
-        chunk_evaluator: ChunkEvaluator
+        chunk_evaluator: ChunkEvaluator,
+        max_candidates: int | None = None,
+        shadow_sample_rate: float | None = None,
+        section_concurrency: int | None = None
     ):
         """
         Args:
             document_reader: Lector de documentos
             chunk_evaluator: Evaluador con LLM
+            max_candidates: Documentos que pasan al LLM
+                            (usa env var AGENT_RAG_MAX_CANDIDATES, default 10; 0 = todos)
+            shadow_sample_rate: Fracción de queries en que se mide el recall del
+                                pre-filtro juzgando todo el corpus en segundo plano
+                                (usa env var AGENT_RAG_SHADOW_SAMPLE_RATE, default 0)
+            section_concurrency: Documentos cuya Fase 2 (LLM elige secciones) corre
+                                 a la vez en retrieve_with_index
+                                 (usa env var AGENT_RAG_SECTION_CONCURRENCY, default 4)
         """
         self.document_reader = document_reader
         self.chunk_evaluator = chunk_evaluator
+        self.max_candidates = (
+            max_candidates if max_candidates is not None
+            else int(os.getenv("AGENT_RAG_MAX_CANDIDATES", "10"))
+        )
+        self.shadow_sample_rate = (
+            shadow_sample_rate if shadow_sample_rate is not None
+            else float(os.getenv("AGENT_RAG_SHADOW_SAMPLE_RATE", "0"))
+        )
+        self.section_concurrency = max(1, section_concurrency or int(
+            os.getenv("AGENT_RAG_SECTION_CONCURRENCY", "4")
+        ))
+        self._section_semaphore = asyncio.Semaphore(self.section_concurrency)
+
+        # Índice BM25 por directorio, válido para una versión del corpus
+        self._lexical_indices: Dict[str, Tuple[int, BM25Index]] = {}
+        self._shadow_tasks: set = set()
+
+        # Catálogo compilado de índices JSON por directorio (retrieve_with_index)
+        self._index_catalogs: Dict[str, IndexCatalog] = {}
+
+        # Nombre de archivo → ruta, por directorio de documentos (índices con source_file)
+        self._document_paths: Dict[str, Dict[str, Path]] = {}
+
+        self.prefilter_stats = {
+            "queries": 0,
+            "documents_evaluated": 0,
+            "documents_skipped": 0,
+            "shadow_samples": 0,
+            "shadow_recall_sum": 0.0
+        }
 
     async def retrieve(
         self,
@@ -66,6 +119,7 @@ class AgentRetrieval:
           4. Retornar top-k
 
         OPTIMIZACIÓN:
+        - Pre-filtro BM25: solo max_candidates documentos llegan al LLM
         - Evaluaciones en paralelo (asyncio.gather)
         - Sin paralelo, sería muy lento (N llamadas secuenciales al LLM)
 
@@ -77,31 +131,22 @@ class AgentRetrieval:
         Returns:
             Dict con chunks y reasoning del LLM
         """
-        # 1. Leer todos los documentos
+        # 1. Leer todos los documentos (caché en memoria del reader)
         documents = await self.document_reader.read_all_documents(documents_path)
 
-        # 2. Evaluar relevancia de cada documento EN PARALELO
-        # Esto reduce latencia de N*time a ~time
-        evaluation_tasks = [
-            self.chunk_evaluator.evaluate_relevance(query, doc)
-            for doc in documents
-        ]
-        evaluations = await asyncio.gather(*evaluation_tasks)
+        # 2. Pre-filtro léxico: solo los candidatos se juzgan con el LLM
+        candidates, rest = self._prefilter(query, documents, documents_path)
 
-        # 3. Combinar documentos con evaluaciones
-        scored_docs = []
-        for doc, evaluation in zip(documents, evaluations):
-            scored_docs.append({
-                "content": doc["content"],
-                "metadata": doc["metadata"],
-                "score": evaluation["relevance_score"],
-                "reasoning": evaluation["reasoning"],
-                "relevant_sections": evaluation["relevant_sections"]
-            })
+        # 3. Evaluar relevancia de cada candidato EN PARALELO
+        # Esto reduce latencia de N*time a ~time
+        scored_docs = await self._evaluate(query, candidates)
 
         # 4. Rankear por score descendente
         scored_docs.sort(key=lambda x: x["score"], reverse=True)
 
+        if rest and random.random() < self.shadow_sample_rate:
+            self._start_shadow_evaluation(query, k, scored_docs, rest)
+
         # 5. Tomar top-k
         top_docs = scored_docs[:k]
 
@@ -120,9 +165,131 @@ class AgentRetrieval:
 
         return {
             "chunks": formatted_chunks,
-            "method": "agent_rag"  # Identificador del método
+            "method": "agent_rag",  # Identificador del método
+            "candidates_evaluated": len(candidates),
+            "total_documents": len(documents)
         }
 
+    async def _evaluate(self, query: str, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Juzga documentos con el LLM en paralelo"""
+        evaluations = await asyncio.gather(*[
+            self.chunk_evaluator.evaluate_relevance(query, doc)
+            for doc in documents
+        ])
+
+        return [
+            {
+                "content": doc["content"],
+                "metadata": doc["metadata"],
+                "score": evaluation["relevance_score"],
+                "reasoning": evaluation["reasoning"],
+                "relevant_sections": evaluation["relevant_sections"]
+            }
+            for doc, evaluation in zip(documents, evaluations)
+        ]
+
+    def _lexical_index(self, documents: List[Dict[str, Any]], documents_path: str) -> BM25Index:
+        """
+        Índice BM25 del corpus, reconstruido solo si cambió la versión del reader.
+
+        Se indexa el contenido junto con nombre, código y categoría del procedimiento.
+        """
+        version = self.document_reader.corpus_version
+        cached = self._lexical_indices.get(documents_path)
+        if cached and cached[0] == version and len(cached[1]) == len(documents):
+            return cached[1]
+
+        index = BM25Index([
+            " ".join([
+                doc["metadata"].get("procedure_name", ""),
+                doc["metadata"].get("procedure_code", ""),
+                doc["metadata"].get("category", ""),
+                doc["content"]
+            ])
+            for doc in documents
+        ])
+        self._lexical_indices[documents_path] = (version, index)
+        return index
+
+    def _prefilter(
+        self,
+        query: str,
+        documents: List[Dict[str, Any]],
+        documents_path: str
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Elige los documentos que pasan al LLM.
+
+        PEDAGOGÍA:
+        - Top max_candidates por BM25
+        - Si menos documentos que eso comparten términos con la query, se
+          completan con el resto (en orden del corpus): nunca se juzga menos
+          de lo configurado
+
+        Returns:
+            (candidatos, descartados)
+        """
+        self.prefilter_stats["queries"] += 1
+
+        if not self.max_candidates or len(documents) <= self.max_candidates:
+            self.prefilter_stats["documents_evaluated"] += len(documents)
+            return documents, []
+
+        ranked = [doc_id for doc_id, _ in self._lexical_index(documents, documents_path).search(query)]
+        chosen = ranked[:self.max_candidates]
+        if len(chosen) < self.max_candidates:
+            matched = set(chosen)
+            chosen += [i for i in range(len(documents)) if i not in matched][:self.max_candidates - len(chosen)]
+
+        selected = set(chosen)
+        candidates = [documents[i] for i in chosen]
+        rest = [doc for i, doc in enumerate(documents) if i not in selected]
+
+        self.prefilter_stats["documents_evaluated"] += len(candidates)
+        self.prefilter_stats["documents_skipped"] += len(rest)
+        return candidates, rest
+
+    def _start_shadow_evaluation(
+        self,
+        query: str,
+        k: int,
+        scored_candidates: List[Dict[str, Any]],
+        rest: List[Dict[str, Any]]
+    ):
+        """
+        Mide el recall del pre-filtro sin agregar latencia a la respuesta.
+
+        Juzga en segundo plano los documentos descartados y compara el
+        top-k completo con los candidatos que sí pasaron el filtro.
+        """
+        async def shadow():
+            try:
+                scored_rest = await self._evaluate(query, rest)
+            except Exception as e:
+                print(f"⚠️  Error en evaluación shadow del pre-filtro: {e}")
+                return
+
+            ranking = sorted(
+                [(doc["score"], True) for doc in scored_candidates]
+                + [(doc["score"], False) for doc in scored_rest],
+                key=lambda item: item[0],
+                reverse=True
+            )
+            relevant = [from_candidates for score, from_candidates in ranking[:k] if score > 0]
+            if relevant:
+                self.prefilter_stats["shadow_samples"] += 1
+                self.prefilter_stats["shadow_recall_sum"] += sum(relevant) / len(relevant)
+
+        task = asyncio.create_task(shadow())
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    @property
+    def prefilter_recall(self) -> float | None:
+        """Recall@k promedio del pre-filtro en las queries muestreadas (None si no hay muestras)"""
+        samples = self.prefilter_stats["shadow_samples"]
+        return self.prefilter_stats["shadow_recall_sum"] / samples if samples else None
+
     def _format_citation(self, metadata: Dict[str, Any], score: float) -> str:
         """
         Formatea cita distinguible de Vector RAG.
@@ -141,7 +308,7 @@ class AgentRetrieval:
     # VERSION 2.0: RETRIEVAL CON ÍNDICES JSON (3 FASES)
     # ========================================================================
 
-    def _load_all_indices(self, indices_dir: str = "data/indices") -> Dict[str, Dict]:
+    def _load_all_indices(self, indices_dir: str = "data/indices") -> Mapping[str, Dict]:
         """
         Carga todos los índices JSON disponibles.
 
@@ -149,12 +316,14 @@ class AgentRetrieval:
         - Los índices son archivos JSON pequeños (resúmenes de documentos)
         - El LLM puede leer TODOS los índices rápidamente
         - Decide qué documentos son relevantes sin leer contenido completo
+        - Se sirven desde un IndexCatalog compilado (uno por directorio):
+          no se re-parsean los JSON en cada query
 
         Args:
-            indices_dir: Directorio con archivos index-*.json
+            indices_dir: Directorio con archivos *.json (se ignoran EXAMPLE-*)
 
         Returns:
-            Dict {document_id: index_data}
+            Vista de solo lectura {document_id: index_data}
         """
         indices_path = Path(indices_dir)
 
@@ -163,24 +332,16 @@ class AgentRetrieval:
             print("💡 Fallback: Se usará el método de retrieval sin índices")
             return {}
 
-        indices = {}
+        catalog = self._index_catalogs.get(indices_dir)
+        if catalog is None:
+            catalog = self._index_catalogs[indices_dir] = IndexCatalog(indices_dir)
 
-        for index_file in indices_path.glob("index-*.json"):
-            try:
-                with open(index_file, 'r', encoding='utf-8') as f:
-                    index_data = json.load(f)
-                    doc_id = index_data.get("document_id", index_file.stem)
-                    indices[doc_id] = index_data
-            except Exception as e:
-                print(f"⚠️  Error cargando índice {index_file.name}: {e}")
-                continue
-
-        return indices
+        return catalog.documents()
 
     async def _filter_relevant_documents(
         self,
         query: str,
-        indices: Dict[str, Dict]
+        indices: Mapping[str, Dict]
     ) -> List[Dict[str, Any]]:
         """
         FASE 1: LLM decide qué documentos son relevantes leyendo índices.
@@ -355,10 +516,85 @@ Si no estás seguro, es mejor incluir una sección de más que omitirla.
             # Fallback: retornar todas las secciones
             return [s["section_id"] for s in sections]
 
-    def _load_section_content(
+    async def _select_and_load_sections(
+        self,
+        query: str,
+        doc: Dict[str, Any],
+        documents_path: str = "data/documentos"
+    ) -> List[Dict[str, Any]]:
+        """
+        FASE 2 + FASE 3 para UN documento: elige secciones y carga su contenido.
+
+        PEDAGOGÍA:
+        - Se lanza una corrutina por documento relevante → la Fase 2 tarda
+          max(latencia LLM) en vez de la suma
+        - El semáforo limita las llamadas al LLM en vuelo (rate limit)
+        - La carga de contenido empieza apenas llegan los section_ids de este
+          documento, sin esperar a los demás (PDFs en el pool de procesos,
+          SQLite y disco en threads: nada bloquea el event loop)
+
+        Args:
+            query: Consulta del usuario
+            doc: Documento relevante de la Fase 1 (document_id, index)
+            documents_path: Directorio con documentos originales
+
+        Returns:
+            Lista de secciones con contenido (vacía si no hay secciones)
+        """
+        async with self._section_semaphore:
+            section_ids = await self._filter_relevant_sections(query, doc["index"])
+
+        if not section_ids:
+            return []
+
+        print(f"   {doc['document_id']}: secciones {', '.join(section_ids)}")
+
+        # FASE 3: Cargar contenido de secciones
+        return await self._load_section_content(doc["index"], section_ids, documents_path)
+
+    def _resolve_document_path(
+        self,
+        document_index: Dict[str, Any],
+        documents_path: str = "data/documentos"
+    ) -> Optional[Path]:
+        """
+        Ubica el documento original de un índice.
+
+        PEDAGOGÍA:
+        - Los índices del indexer guardan source_file (solo el nombre), no la
+          ruta: se busca por nombre en documents_path (con subcarpetas)
+        - El mapa nombre → ruta se arma una vez por directorio y se rehace
+          solo si un nombre no aparece (documento agregado o movido)
+
+        Args:
+            document_index: Índice del documento ("path" o "source_file")
+            documents_path: Directorio con documentos originales
+
+        Returns:
+            Path al documento, o None si no se encuentra
+        """
+        if document_index.get("path"):
+            return Path(document_index["path"])
+
+        source_file = document_index.get("source_file")
+        if not source_file:
+            return None
+
+        paths = self._document_paths.get(documents_path)
+        if paths is None or source_file not in paths:
+            paths = self._document_paths[documents_path] = {
+                file_path.name: file_path
+                for file_path in sorted(Path(documents_path).rglob("*"))
+                if file_path.is_file()
+            }
+
+        return paths.get(source_file)
+
+    async def _load_section_content(
         self,
         document_index: Dict[str, Any],
-        section_ids: List[str]
+        section_ids: List[str],
+        documents_path: str = "data/documentos"
     ) -> List[Dict[str, Any]]:
         """
         FASE 3: Carga contenido SOLO de las secciones relevantes por PÁGINAS.
@@ -367,18 +603,25 @@ Si no estás seguro, es mejor incluir una sección de más que omitirla.
         - Para PDFs: Lee SOLO las páginas especificadas (eficiente)
         - Para Markdown: Lee documento completo y extrae por títulos
         - Mucho más rápido y preciso que leer documento completo
+        - El texto sale del PageTextStore (páginas de PDF y secciones
+          Markdown ya extraídas): no se parsea el archivo en cada query
 
         Args:
             document_index: Índice del documento
             section_ids: IDs de secciones a cargar
+            documents_path: Directorio con documentos originales
 
         Returns:
             Lista de secciones con contenido completo
         """
-        doc_path = Path(document_index.get("path", ""))
-
-        if not doc_path.exists():
-            print(f"⚠️  Documento no existe: {doc_path}")
+        # rglob del directorio si el nombre no está en el mapa → thread
+        doc_path = await asyncio.to_thread(
+            self._resolve_document_path, document_index, documents_path
+        )
+
+        if doc_path is None or not doc_path.exists():
+            source = document_index.get("path") or document_index.get("source_file")
+            print(f"⚠️  Documento no existe: {source}")
             return []
 
         # Extraer secciones relevantes
@@ -414,17 +657,17 @@ Si no estás seguro, es mejor incluir una sección de más que omitirla.
 
                 # NUEVO: Para PDFs, leer solo páginas específicas
                 if is_pdf and page_start and page_end:
-                    section_content = self.document_reader.read_pdf_pages(
+                    section_content = await self.document_reader.read_pdf_pages(
                         doc_path,
                         page_start,
                         page_end
                     )
                 else:
                     # Fallback para Markdown o secciones sin páginas
-                    content = self.document_reader._read_file(doc_path)
-                    section_content = self._extract_section_from_content(
-                        content,
-                        section
+                    section_content = await self.document_reader.read_section_cached(
+                        doc_path,
+                        section,
+                        self._extract_section_from_content
                     )
 
                 sections_content.append({
@@ -638,7 +881,8 @@ Respuesta:"""
 
         # FASE 1: Cargar índices y filtrar documentos relevantes
         print(f"\n📚 FASE 1: Filtrando documentos relevantes...")
-        indices = self._load_all_indices(indices_dir)
+        # Catálogo bloqueante (stat, y en recarga glob/SQLite/JSON) → thread
+        indices = await asyncio.to_thread(self._load_all_indices, indices_dir)
 
         if not indices:
             print("⚠️  No hay índices disponibles. Usando método sin índices.")
@@ -658,20 +902,16 @@ Respuesta:"""
 
         print(f"   ✅ Documentos relevantes: {[d['document_id'] for d in relevant_docs]}")
 
-        # FASE 2: Para cada documento, filtrar secciones relevantes
+        # FASE 2: Para cada documento, filtrar secciones relevantes EN PARALELO
+        # (y cargar su contenido apenas llegan sus section_ids)
         print(f"\n📄 FASE 2: Filtrando secciones relevantes...")
-        all_sections = []
-
-        for doc in relevant_docs:
-            doc_index = doc["index"]
-            section_ids = await self._filter_relevant_sections(query, doc_index)
-
-            if section_ids:
-                print(f"   {doc['document_id']}: secciones {', '.join(section_ids)}")
+        per_document = await asyncio.gather(*[
+            self._select_and_load_sections(query, doc, documents_path)
+            for doc in relevant_docs
+        ])
 
-                # FASE 3: Cargar contenido de secciones
-                sections_content = self._load_section_content(doc_index, section_ids)
-                all_sections.extend(sections_content)
+        # gather preserva el orden: secciones en el orden de relevant_docs
+        all_sections = [section for sections in per_document for section in sections]
 
         print(f"   ✅ Total secciones a leer: {len(all_sections)}")
 
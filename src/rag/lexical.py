@@ -0,0 +1,118 @@
+"""
+Búsqueda léxica BM25 en memoria
+
+Compartida por el LocalVectorStore (búsqueda híbrida sin Postgres) y por
+Agent RAG (pre-filtro barato antes de llamar al LLM).
+
+PEDAGOGÍA:
+- Los embeddings capturan SIGNIFICADO, pero fallan con términos exactos:
+  códigos de procedimiento (PROC-JUB-002), RUTs, artículos de ley
+- BM25 = ranking clásico de buscadores: premia términos raros (IDF) que
+  aparecen varias veces (TF), normalizando por largo del documento
+"""
+
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import List, Dict, Tuple
+
+# Palabras muy frecuentes en español que no aportan al ranking
+SPANISH_STOPWORDS = frozenset("""
+a al algo como con cual cuando de del desde donde el ella ellas ellos en entre
+era es esa ese eso esta este esto fue ha hay la las le les lo los mas me mi
+muy no nos o para pero por que se si sin sobre son su sus tambien te tiene un
+una uno unos unas y ya yo
+""".split())
+
+# Palabras alfanuméricas, incluyendo compuestas con guion (PROC-JUB-002, 12345678-9)
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def strip_accents(text: str) -> str:
+    """"Jubilación" → "Jubilacion" (las queries suelen venir sin tildes)"""
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in normalized if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Normaliza y divide un texto en términos.
+
+    - Minúsculas y sin tildes
+    - Sin stopwords
+    - Palabras compuestas se indexan completas Y por partes:
+      "PROC-JUB-002" → ["proc-jub-002", "proc", "jub", "002"]
+    """
+    terms = []
+    for word in _TOKEN_PATTERN.findall(strip_accents(text.lower())):
+        if word in SPANISH_STOPWORDS:
+            continue
+        terms.append(word)
+        if "-" in word:
+            terms.extend(part for part in word.split("-") if part not in SPANISH_STOPWORDS)
+    return terms
+
+
+class BM25Index:
+    """
+    Índice invertido con ranking BM25 (Okapi).
+
+    PEDAGOGÍA:
+    - Índice invertido: término → {documento: frecuencia}
+    - Solo se puntúan documentos que contienen algún término de la query
+    - k1 controla la saturación de TF, b la normalización por largo
+    """
+
+    def __init__(self, documents: List[str], k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            documents: Textos a indexar (el id de cada uno es su posición)
+            k1: Saturación de frecuencia de término
+            b: Peso de la normalización por largo del documento
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_lengths: List[int] = []
+
+        for doc_id, text in enumerate(documents):
+            terms = tokenize(text)
+            self.doc_lengths.append(len(terms))
+            for term, freq in Counter(terms).items():
+                self.postings[term][doc_id] = freq
+
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _idf(self, term: str) -> float:
+        n = len(self.doc_lengths)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_n: int | None = None) -> List[Tuple[int, float]]:
+        """
+        Rankea documentos para una query.
+
+        Args:
+            query: Texto de la consulta
+            top_n: Máximo de resultados (None = todos los que matchean)
+
+        Returns:
+            Lista de (doc_id, score) ordenada por score descendente
+        """
+        scores: Dict[int, float] = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for doc_id, freq in postings.items():
+                norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1)
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + self.k1 * norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked[:top_n] if top_n is not None else ranked
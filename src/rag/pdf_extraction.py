@@ -0,0 +1,191 @@
+"""
+Extracción de texto de PDFs en un pool de procesos
+
+Compartido por Vector RAG (ingesta) y Agent RAG (lectura e indexación).
+
+PEDAGOGÍA:
+- PyMuPDF (fitz) es síncrono y usa CPU: llamarlo dentro de una función
+  async bloquea el event loop (la API deja de atender requests)
+- ProcessPoolExecutor reparte páginas/archivos entre todos los cores
+- El event loop solo espera el resultado (await), sin bloquearse
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+
+def _extract_page_range(
+    pdf_path: str,
+    start: int,
+    stop: int | None
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Extrae el texto de un rango de páginas (se ejecuta en un proceso worker).
+
+    Args:
+        pdf_path: Ruta al PDF
+        start: Primera página (0-indexed)
+        stop: Página final exclusiva (0-indexed, None = hasta el final)
+
+    Returns:
+        (total de páginas del PDF, [{"page_num": 1-indexed, "text": ...}, ...])
+    """
+    import fitz  # PyMuPDF
+
+    doc = fitz.open(pdf_path)
+    try:
+        total_pages = len(doc)
+        stop = total_pages if stop is None else min(stop, total_pages)
+
+        pages = []
+        for page_num in range(start, stop):
+            text = doc[page_num].get_text()
+            if text and text.strip():
+                pages.append({"page_num": page_num + 1, "text": text})
+
+        return total_pages, pages
+    finally:
+        doc.close()
+
+
+class PDFExtractor:
+    """
+    Servicio de extracción de PDFs respaldado por un ProcessPoolExecutor.
+
+    PEDAGOGÍA:
+    - PDFs chicos: un task por archivo
+    - PDFs grandes: se dividen en rangos de pages_per_task páginas
+      que se procesan en paralelo en distintos cores
+    - Contexto "spawn": seguro aunque el proceso padre tenga threads
+      (uvicorn, clientes gRPC de Vertex AI)
+    """
+
+    def __init__(self, max_workers: int | None = None, pages_per_task: int = 8):
+        """
+        Args:
+            max_workers: Procesos del pool (default: número de CPUs)
+            pages_per_task: Páginas por task al dividir PDFs grandes
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Crea el pool de forma lazy (solo si se llega a usar)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def extract_pages(
+        self,
+        pdf_path: Path | str,
+        page_start: int = 1,
+        page_end: int | None = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Extrae el texto de un PDF, página por página.
+
+        Args:
+            pdf_path: Ruta al PDF
+            page_start: Página inicial (1-indexed)
+            page_end: Página final (1-indexed, inclusiva; None = última)
+
+        Returns:
+            Lista de páginas no vacías: [{"page_num": 1, "text": "..."}, ...]
+        """
+        _, pages = await self.extract_pages_with_total(pdf_path, page_start, page_end)
+        return pages
+
+    async def extract_pages_with_total(
+        self,
+        pdf_path: Path | str,
+        page_start: int = 1,
+        page_end: int | None = None
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        Como extract_pages, pero también retorna el total de páginas del PDF
+        (las páginas vacías no aparecen en la lista).
+
+        Returns:
+            (total de páginas, páginas no vacías)
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        path = str(pdf_path)
+
+        start = page_start - 1
+        first_stop = start + self.pages_per_task
+        if page_end is not None:
+            first_stop = min(first_stop, page_end)
+
+        # El primer rango también nos dice cuántas páginas tiene el PDF
+        total_pages, pages = await loop.run_in_executor(
+            executor, _extract_page_range, path, start, first_stop
+        )
+
+        last = total_pages if page_end is None else min(page_end, total_pages)
+        remaining = [
+            (range_start, min(range_start + self.pages_per_task, last))
+            for range_start in range(first_stop, last, self.pages_per_task)
+        ]
+
+        if remaining:
+            results = await asyncio.gather(*[
+                loop.run_in_executor(executor, _extract_page_range, path, a, b)
+                for a, b in remaining
+            ])
+            for _, range_pages in results:
+                pages.extend(range_pages)
+
+        return total_pages, pages
+
+    async def extract_text(self, pdf_path: Path | str) -> str:
+        """
+        Extrae el texto completo con marcadores de página.
+
+        Returns:
+            Texto con formato "--- Página N ---" por página
+        """
+        pages = await self.extract_pages(pdf_path)
+        return self.format_pages(pages)
+
+    @staticmethod
+    def format_pages(pages: List[Dict[str, Any]]) -> str:
+        """Une páginas con el marcador "--- Página N ---" usado en todo el repo"""
+        return "\n\n".join(
+            f"--- Página {page['page_num']} ---\n{page['text']}"
+            for page in pages
+        )
+
+    def shutdown(self):
+        """Cierra el pool de procesos"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Instancia compartida por proceso (ingesta, DocumentReader, indexer, API)
+_default_extractor: PDFExtractor | None = None
+
+
+def get_pdf_extractor() -> PDFExtractor:
+    """Retorna el PDFExtractor compartido del proceso"""
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = PDFExtractor()
+    return _default_extractor
+
+
+def shutdown_pdf_extractor():
+    """Cierra el pool compartido (llamar al apagar la API o al final de scripts)"""
+    global _default_extractor
+    if _default_extractor is not None:
+        _default_extractor.shutdown()
+        _default_extractor = None
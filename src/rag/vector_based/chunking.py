@@ -0,0 +1,257 @@
+"""
+Chunking consciente de estructura y de tokens para Vector RAG
+
+Reemplaza el corte por caracteres: respeta headings Markdown, los
+marcadores "--- Página N ---" de los PDFs y mide el tamaño en tokens.
+
+PEDAGOGÍA:
+- Cortar cada 512 caracteres parte palabras y títulos por la mitad
+- Los LLMs y los modelos de embeddings cuentan TOKENS, no caracteres
+- Cada chunk sabe de qué páginas y de qué sección viene → citas precisas
+"""
+
+import logging
+import re
+from typing import List, Dict, Any
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Marcador de página que generan los extractores de PDF del repo
+PAGE_MARKER = re.compile(r"^---\s*Página\s+(\d+)\s*---$")
+
+# Heading Markdown: "## Requisitos"
+MARKDOWN_HEADING = re.compile(r"^#{1,6}\s+(.+?)\s*#*$")
+
+# Código de procedimiento/documento ("PROC-JUB-001"): en MAYÚSCULAS pero no es heading
+DOCUMENT_CODE = re.compile(r"\b[A-ZÁÉÍÓÚÑ]{2,}(?:-[A-Z0-9]+)+\b")
+
+# Fin de oración (para dividir párrafos demasiado largos)
+SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+class StructuredChunker:
+    """
+    Divide documentos en chunks por bloques (párrafos, headings, páginas).
+
+    PEDAGOGÍA:
+    - Un heading SIEMPRE inicia un chunk nuevo (secciones no se mezclan)
+    - Párrafos se agrupan hasta max_tokens (chunks más densos)
+    - Párrafos enormes se dividen por oraciones, y en último caso por tokens
+    - Overlap = últimas oraciones/párrafos completos del chunk anterior
+      (hasta overlap_tokens), nunca media palabra
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 512,
+        overlap_tokens: int = 50,
+        encoding_name: str = "cl100k_base"
+    ):
+        """
+        Args:
+            max_tokens: Tamaño máximo del chunk en tokens
+            overlap_tokens: Tokens máximos compartidos con el chunk anterior
+            encoding_name: Encoding de tiktoken para contar tokens
+        """
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+        try:
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            # Sin acceso a internet tiktoken no puede descargar el encoding
+            logger.warning(f"tiktoken no disponible ({e}), usando conteo aproximado")
+            self.encoding = None
+
+    def count_tokens(self, text: str) -> int:
+        """Cuenta tokens (aprox. 4 caracteres por token si no hay tiktoken)"""
+        if self.encoding is None:
+            return max(1, len(text) // 4)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def chunk(self, content: str) -> List[Dict[str, Any]]:
+        """
+        Divide el contenido en chunks con procedencia.
+
+        Args:
+            content: Texto del documento (Markdown o PDF con marcadores de página)
+
+        Returns:
+            Lista de dicts con content, page_start, page_end,
+            section_title y token_count
+        """
+        chunks: List[Dict[str, Any]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = 0
+
+        def close_chunk():
+            nonlocal current, current_tokens
+            if any(not block["heading"] for block in current):
+                chunks.append(self._build_chunk(current))
+            current, current_tokens = [], 0
+
+        for block in self._split_blocks(content):
+            if block["heading"]:
+                close_chunk()
+
+            if current and current_tokens + block["tokens"] > self.max_tokens:
+                previous = current
+                close_chunk()
+                # El overlap nunca empuja el chunk por encima de max_tokens
+                current = self._overlap_tail(previous, self.max_tokens - block["tokens"])
+                current_tokens = sum(b["tokens"] for b in current)
+
+            current.append(block)
+            current_tokens += block["tokens"]
+
+        close_chunk()
+        return chunks
+
+    def _split_blocks(self, content: str) -> List[Dict[str, Any]]:
+        """
+        Recorre el texto línea por línea y arma bloques.
+
+        Bloque = párrafo (o heading) con su página y sección.
+        """
+        blocks: List[Dict[str, Any]] = []
+        page = 1
+        section = None
+        paragraph: List[str] = []
+
+        def flush():
+            text = "\n".join(paragraph).strip()
+            paragraph.clear()
+            if text:
+                blocks.extend(self._fit_block(text, page, section, len(blocks)))
+
+        for line in content.split("\n"):
+            stripped = line.strip()
+
+            page_match = PAGE_MARKER.match(stripped)
+            if page_match:
+                flush()
+                page = int(page_match.group(1))
+                continue
+
+            title = self._heading_title(stripped)
+            if title:
+                flush()
+                section = title
+                blocks.append({
+                    "text": stripped,
+                    "page": page,
+                    "section": section,
+                    "tokens": self.count_tokens(stripped),
+                    "heading": True,
+                    "paragraph": len(blocks)
+                })
+                continue
+
+            if not stripped:
+                flush()
+            else:
+                paragraph.append(line.rstrip())
+
+        flush()
+        return blocks
+
+    @staticmethod
+    def _heading_title(line: str) -> str | None:
+        """
+        Detecta headings.
+
+        - Markdown: "## REQUISITOS" → "REQUISITOS"
+        - PDF: línea corta en MAYÚSCULAS ("REQUISITOS DEL AFILIADO"), salvo
+          que contenga un código ("PROC-JUB-001", "CÓDIGO: PROC-JUB-001")
+        """
+        match = MARKDOWN_HEADING.match(line)
+        if match:
+            return match.group(1).replace("**", "").strip()
+
+        letters = [c for c in line if c.isalpha()]
+        if (
+            4 <= len(letters)
+            and len(line) <= 80
+            and all(c.isupper() for c in letters)
+            and not DOCUMENT_CODE.search(line)
+        ):
+            return line.strip(" :")
+
+        return None
+
+    def _fit_block(
+        self,
+        text: str,
+        page: int,
+        section: str | None,
+        paragraph: int
+    ) -> List[Dict[str, Any]]:
+        """Divide un párrafo mayor a max_tokens en oraciones o ventanas de tokens"""
+        tokens = self.count_tokens(text)
+        if tokens <= self.max_tokens:
+            return [{"text": text, "page": page, "section": section,
+                     "tokens": tokens, "heading": False, "paragraph": paragraph}]
+
+        pieces: List[str] = []
+        for sentence in SENTENCE_END.split(text):
+            if self.count_tokens(sentence) <= self.max_tokens:
+                pieces.append(sentence)
+            else:
+                pieces.extend(self._split_by_tokens(sentence))
+
+        return [
+            {"text": piece, "page": page, "section": section,
+             "tokens": self.count_tokens(piece), "heading": False, "paragraph": paragraph}
+            for piece in pieces if piece.strip()
+        ]
+
+    def _split_by_tokens(self, text: str) -> List[str]:
+        """Último recurso: ventanas de max_tokens tokens"""
+        if self.encoding is None:
+            size = self.max_tokens * 4
+            return [text[i:i + size] for i in range(0, len(text), size)]
+
+        token_ids = self.encoding.encode(text, disallowed_special=())
+        return [
+            self.encoding.decode(token_ids[i:i + self.max_tokens])
+            for i in range(0, len(token_ids), self.max_tokens)
+        ]
+
+    def _overlap_tail(self, blocks: List[Dict[str, Any]], budget: int) -> List[Dict[str, Any]]:
+        """
+        Últimos bloques completos que caben en overlap_tokens.
+
+        Args:
+            blocks: Bloques del chunk anterior
+            budget: Tokens libres en el chunk siguiente (max_tokens - bloque entrante)
+        """
+        limit = min(self.overlap_tokens, budget)
+        tail: List[Dict[str, Any]] = []
+        total = 0
+        for block in reversed(blocks):
+            if block["heading"] or total + block["tokens"] > limit:
+                break
+            tail.insert(0, block)
+            total += block["tokens"]
+        return tail
+
+    @staticmethod
+    def _build_chunk(blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Une bloques en un chunk con su procedencia"""
+        body = [b for b in blocks if not b["heading"]]
+
+        # Oraciones del mismo párrafo se unen con espacio; párrafos con línea en blanco
+        content = blocks[0]["text"]
+        for previous, block in zip(blocks, blocks[1:]):
+            separator = " " if block["paragraph"] == previous["paragraph"] else "\n\n"
+            content += separator + block["text"]
+
+        return {
+            "content": content,
+            "page_start": min(b["page"] for b in body),
+            "page_end": max(b["page"] for b in body),
+            "section_title": body[-1]["section"],
+            "token_count": sum(b["tokens"] for b in blocks)
+        }
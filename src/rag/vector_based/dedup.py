@@ -0,0 +1,188 @@
+"""
+Deduplicación de chunks en la ingesta (hash exacto + MinHash/LSH)
+
+Los PDFs de procedimientos repiten texto: encabezados, pies legales,
+listas de requisitos idénticas entre PROC-JUB-001 y PROC-JUB-002.
+Cada copia cuesta un embedding y además ocupa lugares del top-k.
+
+PEDAGOGÍA:
+- Duplicado exacto: mismo texto normalizado → mismo sha256
+- Casi duplicado: MinHash estima la similitud de Jaccard entre los
+  conjuntos de shingles (secuencias de 5 palabras) de dos chunks
+- LSH (Locality Sensitive Hashing): divide la firma en bandas; solo se
+  comparan chunks que coinciden en alguna banda → no es O(N²)
+- Solo los duplicados EXACTOS se eliminan. Un casi duplicado puede
+  diferir justo en lo importante (un código, un monto, un plazo): se
+  conserva y se agrupa con su canónico
+"""
+
+import hashlib
+import re
+from typing import List, Dict, Tuple, Hashable
+
+import numpy as np
+
+from src.rag.lexical import strip_accents
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Primo de Mersenne 2^31 - 1: (a * x + b) mod p con a, x < 2^31 cabe en uint64
+_MERSENNE_PRIME = (1 << 31) - 1
+
+
+class ChunkDeduplicator:
+    """
+    Detecta chunks duplicados o casi duplicados.
+
+    PEDAGOGÍA:
+    - Cada chunk nuevo se compara contra los ya vistos (canónicos): los de
+      esta ingesta y los ya almacenados (ver add_canonical)
+    - Duplicado exacto → el chunk NO se embebe; el canónico guarda una
+      referencia a la fuente duplicada
+    - Casi duplicado → se retorna el canónico para agruparlos, pero el
+      chunk se conserva
+    - num_perm = bands * rows; con 16 bandas de 4 filas, dos chunks con
+      Jaccard 0.9 caen en la misma banda con probabilidad > 99.9%
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 42
+    ):
+        """
+        Args:
+            threshold: Jaccard estimado mínimo para considerar casi duplicado
+            num_perm: Permutaciones (largo de la firma MinHash)
+            bands: Bandas LSH (num_perm debe ser múltiplo)
+            shingle_size: Palabras por shingle
+            seed: Semilla de las permutaciones (firmas reproducibles)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        if not 0.0 < threshold <= 1.0:
+            raise ValueError(f"threshold debe estar entre 0 y 1: {threshold}")
+
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+        # Solo claves y firmas (no el chunk): la memoria no guarda embeddings
+        self._exact: Dict[str, Hashable] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._signatures: List[np.ndarray] = []
+        self._canonicals: List[Hashable] = []
+
+        # Estadísticas
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    @property
+    def embeddings_saved(self) -> int:
+        """Embeddings que no se calcularon gracias a la deduplicación (solo exactos)"""
+        return self.exact_duplicates
+
+    @staticmethod
+    def _words(text: str) -> List[str]:
+        return _WORD_PATTERN.findall(strip_accents(text.lower()))
+
+    def _signature(self, words: List[str]) -> np.ndarray:
+        """Firma MinHash: mínimo de cada permutación sobre los hashes de shingles"""
+        n = self.shingle_size
+        shingles = {
+            " ".join(words[i:i + n])
+            for i in range(max(1, len(words) - n + 1))
+        }
+        hashes = np.array(
+            [
+                int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                % _MERSENNE_PRIME
+                for s in shingles
+            ],
+            dtype=np.uint64
+        )
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def find_duplicate(self, content: str, key: Hashable) -> Tuple[Hashable, bool] | None:
+        """
+        Busca un canónico para el texto; si no hay, lo registra como canónico.
+
+        Args:
+            content: Texto del chunk
+            key: Identificador del chunk (ej: (document_id, chunk_index))
+
+        Returns:
+            (clave del canónico, es_exacto) si es duplicado, None si es nuevo.
+            Un casi duplicado también queda registrado como exacto: sus copias
+            literales se eliminan contra él
+        """
+        words = self._words(content)
+        exact_key = self._exact_key(words)
+
+        canonical = self._exact.get(exact_key)
+        if canonical is not None:
+            self.exact_duplicates += 1
+            return canonical, True
+
+        signature = self._signature(words)
+        band_keys = self._band_keys(signature)
+
+        candidates = {i for band_key in band_keys for i in self._buckets.get(band_key, ())}
+        for i in sorted(candidates):
+            similarity = float(np.mean(self._signatures[i] == signature))
+            if similarity >= self.threshold:
+                self.near_duplicates += 1
+                self._exact[exact_key] = key
+                return self._canonicals[i], False
+
+        self._register(key, exact_key, signature, band_keys)
+        return None
+
+    def add_canonical(self, content: str, key: Hashable):
+        """
+        Registra un chunk ya almacenado como canónico (sin contarlo).
+
+        Permite detectar duplicados ENTRE corridas incrementales: los chunks
+        nuevos se comparan también con los que ya están en el vector store.
+        """
+        words = self._words(content)
+        exact_key = self._exact_key(words)
+        if exact_key in self._exact:
+            return
+
+        signature = self._signature(words)
+        self._register(key, exact_key, signature, self._band_keys(signature))
+
+    @staticmethod
+    def _exact_key(words: List[str]) -> str:
+        return hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest()
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _register(
+        self,
+        key: Hashable,
+        exact_key: str,
+        signature: np.ndarray,
+        band_keys: List[Tuple[int, bytes]]
+    ):
+        """Agrega un canónico a la tabla exacta y a los buckets LSH"""
+        index = len(self._canonicals)
+        self._canonicals.append(key)
+        self._signatures.append(signature)
+        self._exact[exact_key] = key
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, []).append(index)
@@ -0,0 +1,125 @@
+"""
+Micro-batching de embeddings de queries entre requests concurrentes
+
+Bajo carga, cada request del chat pide el embedding de UNA query.
+Este módulo agrupa esas peticiones durante unos milisegundos y las
+envía a Vertex AI en una sola llamada.
+"""
+
+import asyncio
+import logging
+from typing import List, Tuple
+
+from .embeddings import EmbeddingGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Coalescer asíncrono de embeddings de un solo texto.
+
+    PEDAGOGÍA:
+    - Cada caller hace `await batcher.embed(query)` como si fuera individual
+    - Internamente se acumulan las queries hasta max_wait_ms o max_batch_size
+    - Una sola llamada get_embeddings para todo el grupo
+    - Cada caller recibe SU vector (futures de asyncio)
+
+    TRADE-OFF:
+    - Se agrega hasta max_wait_ms de latencia en baja carga
+    - A alto QPS: muchas menos RPCs y mejor p99
+    """
+
+    def __init__(
+        self,
+        embedding_generator: EmbeddingGenerator,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        Args:
+            embedding_generator: Generador de embeddings subyacente
+            max_batch_size: Máximo de textos por llamada a la API
+            max_wait_ms: Tiempo máximo que una query espera a otras
+        """
+        self.embedding_generator = embedding_generator
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._inflight: set = set()
+
+        # Estadísticas
+        self.requests = 0
+        self.batches_sent = 0
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Obtiene el embedding de un texto, agrupándolo con otros concurrentes.
+
+        Args:
+            text: Texto individual (ej: query del usuario)
+
+        Returns:
+            Vector de 768 dimensiones
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Envía el grupo pendiente como un solo batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        # Guardamos referencia a la task para que no sea recolectada
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        """Llama a la API y reparte cada vector a su caller"""
+        self.batches_sent += 1
+        texts = [text for text, _ in batch]
+
+        try:
+            vectors = await self.embedding_generator.generate_embeddings(
+                texts,
+                batch_size=self.max_batch_size
+            )
+        except Exception as e:
+            logger.error(f"Error en batch de {len(texts)} queries: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # zip corta en la lista más corta: sin este chequeo, una respuesta con
+        # menos vectores dejaría a los últimos callers esperando para siempre
+        if len(vectors) != len(batch):
+            logger.error(f"La API devolvió {len(vectors)} vectores para {len(batch)} queries")
+
+        for i, (_, future) in enumerate(batch):
+            # El caller pudo haber cancelado (ej: timeout del request)
+            if future.done():
+                continue
+            if i < len(vectors):
+                future.set_result(vectors[i])
+            else:
+                future.set_exception(RuntimeError(
+                    f"Sin embedding para la query {i + 1} de {len(batch)}"
+                ))
@@ -0,0 +1,183 @@
+"""
+Caché persistente de embeddings direccionado por contenido
+
+Evita re-enviar a Vertex AI chunks que ya fueron embebidos en corridas
+anteriores de la ingesta.
+
+PEDAGOGÍA:
+- Clave = (modelo, sha256 del texto) → mismo texto, mismo vector
+- Persistencia en SQLite (stdlib, un solo archivo, sin servidor)
+- Tamaño acotado: se eliminan las entradas menos usadas recientemente (LRU)
+- Los métodos son bloqueantes (SQLite): desde código async llamarlos con
+  asyncio.to_thread, como hace EmbeddingGenerator
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Caché en disco de embeddings keyed por (model_name, sha256(texto)).
+
+    PEDAGOGÍA:
+    - Si el corpus no cambia, re-ingestar no hace ninguna llamada remota
+    - Los vectores se guardan como float64 binario: el vector devuelto
+      desde caché es idéntico al que devolvió la API
+    - max_entries limita el tamaño (768 dims * 8 bytes ≈ 6 KB por entrada)
+    - La cantidad de filas se lleva en memoria: put_many no hace COUNT(*)
+      (solo se cuenta de verdad cuando la estimación supera el tope)
+    - Una conexión compartida entre threads, protegida por un lock
+    """
+
+    # SQLite limita el número de parámetros por sentencia
+    _MAX_SQL_PARAMS = 500
+
+    def __init__(
+        self,
+        path: str = "data/cache/embeddings.sqlite",
+        max_entries: int = 200_000
+    ):
+        """
+        Args:
+            path: Ruta al archivo SQLite del caché
+            max_entries: Máximo de embeddings almacenados antes de evictar
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model_name TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model_name, text_hash)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access "
+            "ON embeddings (last_access)"
+        )
+        self._conn.commit()
+
+        # Filas en la tabla (estimación: otro proceso puede estar escribiendo)
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Hash sha256 del texto (clave de contenido)"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Busca varios embeddings en el caché.
+
+        Args:
+            model_name: Modelo de embeddings
+            hashes: Hashes sha256 de los textos
+
+        Returns:
+            Dict {hash: vector} solo con los hits
+        """
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+
+        with self._lock:
+            for i in range(0, len(unique), self._MAX_SQL_PARAMS):
+                group = unique[i:i + self._MAX_SQL_PARAMS]
+                placeholders = ",".join("?" * len(group))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model_name = ? AND text_hash IN ({placeholders})",
+                    [model_name, *group]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("d", blob).tolist()
+
+            # Actualizar last_access de los hits (para LRU)
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? "
+                    "WHERE model_name = ? AND text_hash = ?",
+                    [(now, model_name, h) for h in found]
+                )
+                self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model_name: str, items: Dict[str, List[float]]):
+        """
+        Guarda embeddings y aplica eviction si se supera max_entries.
+
+        Args:
+            model_name: Modelo de embeddings
+            items: Dict {hash: vector}
+        """
+        if not items:
+            return
+
+        now = time.time()
+        rows = [
+            (model_name, text_hash, array("d", vector).tobytes(), now)
+            for text_hash, vector in items.items()
+        ]
+
+        with self._lock:
+            # INSERT OR IGNORE: rowcount = filas realmente nuevas
+            inserted = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model_name, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            ).rowcount
+            if inserted < len(rows):
+                # Algunas ya existían: refrescar vector y last_access
+                self._conn.executemany(
+                    "UPDATE embeddings SET vector = ?, last_access = ? "
+                    "WHERE model_name = ? AND text_hash = ?",
+                    [(blob, ts, model, text_hash) for model, text_hash, blob, ts in rows]
+                )
+            self._conn.commit()
+
+            self._count += inserted
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Elimina las entradas menos usadas recientemente si hay exceso (con el lock tomado)"""
+        # Conteo real: la estimación puede desviarse si otro proceso escribe
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = self._count - self.max_entries
+        if excess <= 0:
+            return
+
+        self._conn.execute("""
+            DELETE FROM embeddings WHERE rowid IN (
+                SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?
+            )
+        """, (excess,))
+        self._conn.commit()
+        self._count -= excess
+        logger.info(f"EmbeddingCache: {excess} entradas evictadas (LRU)")
+
+    def close(self):
+        """Cierra la conexión SQLite"""
+        with self._lock:
+            self._conn.close()
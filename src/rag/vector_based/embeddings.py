@@ -6,12 +6,62 @@ donde convertimos texto a vectores de 768 dimensiones.
 """
 
 import os
-from typing import List
+import time
+from typing import List, Dict
 import asyncio
 from tenacity import retry, stop_after_attempt, wait_exponential
 from google.cloud import aiplatform
 from vertexai.language_models import TextEmbeddingModel
 
+from .embedding_cache import EmbeddingCache
+
+
+class TokenBucket:
+    """
+    Rate limiter asíncrono tipo token bucket.
+
+    PEDAGOGÍA:
+    - Cada request a la API consume 1 token
+    - Los tokens se recargan a ritmo constante (requests_per_minute / 60 por segundo)
+    - capacity = ráfaga máxima permitida antes de tener que esperar
+    """
+
+    def __init__(self, requests_per_minute: float, capacity: int = 1):
+        """
+        Args:
+            requests_per_minute: Cuota de requests por minuto
+            capacity: Tamaño máximo de ráfaga
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Espera hasta que haya un token disponible y lo consume"""
+        # El lock hace que los que esperan sean atendidos en orden (FIFO)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Cuota por defecto de requests/minuto a la API de embeddings. Conservadora
+# respecto de la cuota estándar de Vertex AI: sin límite, una ingesta con
+# varios batches en vuelo llega a 429 en segundos
+DEFAULT_REQUESTS_PER_MINUTE = 300
+
 
 class EmbeddingGenerator:
     """
@@ -27,17 +77,37 @@ class EmbeddingGenerator:
         self,
         project_id: str | None = None,
         location: str = "us-central1",
-        model_name: str = "text-embedding-004"
+        model_name: str = "text-embedding-004",
+        cache: EmbeddingCache | None = None,
+        max_concurrency: int = 4,
+        requests_per_minute: int | None = None
     ):
         """
         Args:
             project_id: ID del proyecto GCP (usa env var si es None)
             location: Región de Vertex AI
             model_name: Modelo de embeddings (text-embedding-004 recomendado)
+            cache: Caché persistente de embeddings (opcional). Si existe,
+                   solo los textos no cacheados se envían a la API.
+            max_concurrency: Máximo de batches en vuelo simultáneamente
+            requests_per_minute: Cuota de requests/minuto de Vertex AI
+                   (usa env var VERTEX_EMBEDDING_RPM si es None, default
+                   DEFAULT_REQUESTS_PER_MINUTE; 0 = sin límite)
         """
         self.project_id = project_id or os.getenv("VERTEX_AI_PROJECT")
         self.location = location
         self.model_name = model_name
+        self.cache = cache
+        self.max_concurrency = max(1, max_concurrency)
+
+        rpm = (
+            requests_per_minute if requests_per_minute is not None
+            else int(os.getenv("VERTEX_EMBEDDING_RPM", str(DEFAULT_REQUESTS_PER_MINUTE)))
+        )
+        self.rate_limiter = (
+            TokenBucket(rpm, capacity=self.max_concurrency) if rpm else None
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
 
         if not self.project_id:
             raise ValueError("VERTEX_AI_PROJECT env var requerida")
@@ -46,10 +116,6 @@ class EmbeddingGenerator:
         aiplatform.init(project=self.project_id, location=self.location)
         self.model = TextEmbeddingModel.from_pretrained(self.model_name)
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10)
-    )
     async def generate_embeddings(
         self,
         texts: List[str],
@@ -61,37 +127,96 @@ class EmbeddingGenerator:
         PEDAGOGÍA:
         - Batch processing = más eficiente que uno por uno
         - Límite 250 textos/batch según documentación Vertex AI
-        - Retries automáticos para manejar fallos transitorios
+        - Con caché: solo los textos nuevos (cache misses) van a la API
+        - Textos repetidos en la misma lista se embeben una sola vez
 
         Args:
             texts: Lista de textos para embeddings
             batch_size: Máximo textos por batch (default 250)
 
         Returns:
-            Lista de vectores (cada uno de 768 dimensiones)
+            Lista de vectores (cada uno de 768 dimensiones), en el orden de texts
         """
         if not texts:
             return []
 
-        all_embeddings = []
+        if not self.cache:
+            return await self._embed_texts(texts, batch_size)
+
+        # 1. Buscar en caché por hash de contenido (SQLite → thread, no bloquea el loop)
+        hashes = [EmbeddingCache.text_hash(text) for text in texts]
+        vectors: Dict[str, List[float]] = await asyncio.to_thread(
+            self.cache.get_many, self.model_name, hashes
+        )
+
+        # 2. Embeber solo los misses (deduplicados)
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
 
-        # Procesar en batches
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
+        if missing:
+            new_vectors = await self._embed_texts(list(missing.values()), batch_size)
+            fresh = dict(zip(missing.keys(), new_vectors))
+            await asyncio.to_thread(self.cache.put_many, self.model_name, fresh)
+            vectors.update(fresh)
+
+        # 3. Reconstruir en el orden original
+        return [vectors[text_hash] for text_hash in hashes]
+
+    async def _embed_texts(
+        self,
+        texts: List[str],
+        batch_size: int
+    ) -> List[List[float]]:
+        """
+        Llama a Vertex AI por batches (sin caché), con concurrencia acotada.
+
+        PEDAGOGÍA:
+        - Hasta max_concurrency batches en vuelo a la vez
+          → latencia total ≈ (batches / concurrencia) * latencia por batch
+        - asyncio.gather preserva el orden: resultados en el orden de entrada
+        - Si un batch falla, solo ese batch se reintenta
+        """
+        batches = [
+            texts[i:i + batch_size]
+            for i in range(0, len(texts), batch_size)
+        ]
+
+        results = await asyncio.gather(*[
+            self._embed_batch(batch) for batch in batches
+        ])
+
+        return [vector for batch_vectors in results for vector in batch_vectors]
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10)
+    )
+    async def _embed_batch(self, batch: List[str]) -> List[List[float]]:
+        """
+        Embebe un único batch en Vertex AI.
+
+        PEDAGOGÍA:
+        - Retries automáticos por batch para manejar fallos transitorios
+        - Cada intento toma el semáforo y un token del rate limiter DENTRO
+          del intento: durante el backoff entre reintentos el lugar queda
+          libre para otros batches
+        """
+        async with self._semaphore:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
 
             # Llamada síncrona al modelo (Vertex AI no soporta async aún)
             # Usamos run_in_executor para no bloquear el event loop
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             embeddings = await loop.run_in_executor(
                 None,
                 lambda: self.model.get_embeddings(batch)
             )
 
-            # Extraer valores de embeddings
-            batch_vectors = [emb.values for emb in embeddings]
-            all_embeddings.extend(batch_vectors)
-
-        return all_embeddings
+        # Extraer valores de embeddings
+        return [emb.values for emb in embeddings]
 
     async def generate_embedding(self, text: str) -> List[float]:
         """
@@ -1,18 +1,34 @@
 """
 Ingesta y procesamiento de documentos Markdown y PDF para Vector RAG
 
-Este módulo carga documentos, los divide en chunks con overlap,
-genera embeddings y los almacena en el vector store.
+Este módulo carga documentos, los divide en chunks por tokens respetando
+páginas y secciones, genera embeddings y los almacena en el vector store.
 """
 
+import asyncio
+import hashlib
 import logging
+import os
+import time
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, AsyncIterator
 import fitz  # PyMuPDF
 
+from src.rag.pdf_extraction import PDFExtractor, get_pdf_extractor
+from .chunking import StructuredChunker
+from .dedup import ChunkDeduplicator
+
 logger = logging.getLogger(__name__)
 
 
+class _StageError:
+    """Envuelve una excepción de una etapa para re-lanzarla en el consumidor"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
 class DocumentIngestion:
     """
     Carga y procesa documentos Markdown y PDF.
@@ -26,15 +42,31 @@ class DocumentIngestion:
     def __init__(
         self,
         embedding_generator=None,
-        vector_store=None
+        vector_store=None,
+        pdf_extractor: PDFExtractor | None = None,
+        deduplicate: bool = True,
+        near_duplicate_threshold: float | None = None
     ):
         """
         Args:
             embedding_generator: Instancia de EmbeddingGenerator (opcional)
             vector_store: Instancia de VectorStore (opcional)
+            pdf_extractor: Extractor de PDFs con pool de procesos
+                           (default: el compartido del proceso)
+            deduplicate: Si True, chunks duplicados exactos no se embeben ni
+                         almacenan y los casi duplicados se agrupan con su
+                         canónico (ver ChunkDeduplicator)
+            near_duplicate_threshold: Jaccard estimado mínimo para agrupar casi
+                                      duplicados (usa env var INGEST_NEAR_DUPLICATE_THRESHOLD,
+                                      default 0.9)
         """
         self.embedding_generator = embedding_generator
         self.vector_store = vector_store
+        self.pdf_extractor = pdf_extractor or get_pdf_extractor()
+        self.deduplicate = deduplicate
+        self.near_duplicate_threshold = near_duplicate_threshold or float(
+            os.getenv("INGEST_NEAR_DUPLICATE_THRESHOLD", "0.9")
+        )
 
     async def load_documents(self, path: str) -> List[Dict[str, Any]]:
         """
@@ -43,7 +75,7 @@ class DocumentIngestion:
         PEDAGOGÍA:
         - Soporta MD y PDF con el mismo método
         - MD se lee como texto plano
-        - PDF se extrae con PyMuPDF (fitz)
+        - PDF se extrae con PyMuPDF (fitz) en un pool de procesos
 
         Args:
             path: Ruta al directorio de documentos
@@ -51,46 +83,176 @@ class DocumentIngestion:
         Returns:
             Lista de dicts con content y metadata
         """
+        documents = []
+
+        for file_path in self._discover_files(path):
+            doc = await self._load_file(file_path)
+            if doc:
+                documents.append(doc)
+
+        logger.info(f"Total documentos cargados: {len(documents)}")
+        return documents
+
+    def _discover_files(self, path: str) -> List[Path]:
+        """
+        Lista los archivos .md y .pdf de un directorio (recursivo).
+
+        Args:
+            path: Ruta al directorio de documentos
+
+        Returns:
+            Lista ordenada de paths
+        """
         docs_path = Path(path)
         if not docs_path.exists():
             raise FileNotFoundError(f"Directorio no existe: {path}")
 
-        documents = []
+        files = list(docs_path.rglob("*.md")) + list(docs_path.rglob("*.pdf"))
+        return sorted(files)
 
-        # Recorrer todos los .md recursivamente
-        for md_file in docs_path.rglob("*.md"):
-            try:
-                content = md_file.read_text(encoding="utf-8")
+    async def _load_file(self, file_path: Path) -> Dict[str, Any] | None:
+        """
+        Carga un archivo MD o PDF con su metadata sin bloquear el event loop.
 
-                # Extraer metadata del archivo
-                metadata = self._extract_metadata(content, md_file)
+        Returns:
+            Dict con content y metadata, o None si hubo error
+        """
+        try:
+            if file_path.suffix.lower() == ".pdf":
+                content = await self.pdf_extractor.extract_text(file_path)
+                metadata = await asyncio.to_thread(self._extract_pdf_metadata, file_path)
+                logger.info(f"Cargado PDF: {file_path.name}")
+            else:
+                content = await asyncio.to_thread(file_path.read_text, encoding="utf-8")
+                metadata = self._extract_metadata(content, file_path)
+                logger.info(f"Cargado MD: {file_path.name}")
+
+            return {
+                "content": content,
+                "metadata": metadata
+            }
+        except Exception as e:
+            logger.error(f"Error cargando {file_path}: {e}")
+            return None
+
+    @staticmethod
+    def _file_hash(file_path: Path) -> str:
+        """sha256 del contenido del archivo"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _plan_incremental(
+        self,
+        path: str,
+        manifest: Dict[str, Dict[str, Any]],
+        full: bool = False
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Compara el disco con el manifest y decide qué procesar.
 
-                documents.append({
-                    "content": content,
-                    "metadata": metadata
+        PEDAGOGÍA:
+        - Primero se compara size + mtime (solo un stat, sin leer el archivo)
+        - Si cambiaron, se compara el hash: un `touch` no re-embebe nada
+        - Archivos del manifest que ya no existen → sus chunks se eliminan
+
+        Args:
+            path: Directorio de documentos
+            manifest: Manifest actual {path: entry}
+            full: Si True, todos los archivos se re-procesan
+
+        Returns:
+            (cambiados, sin_cambios_a_refrescar, eliminados)
+            - cambiados: entradas nuevas del manifest a procesar (con "file")
+            - sin_cambios_a_refrescar: entradas con hash igual pero mtime nuevo
+            - eliminados: entradas del manifest sin archivo en disco
+        """
+        root = Path(path).resolve()
+        changed, refreshed = [], []
+        seen = set()
+
+        for file_path in self._discover_files(path):
+            key = str(file_path.resolve())
+            seen.add(key)
+            stat = file_path.stat()
+            previous = manifest.get(key)
+
+            if (
+                not full and previous
+                and previous["size_bytes"] == stat.st_size
+                and previous["mtime_ns"] == stat.st_mtime_ns
+            ):
+                continue
+
+            entry = self._manifest_entry(file_path, previous)
+
+            if not full and previous and previous["content_hash"] == entry["content_hash"]:
+                refreshed.append({
+                    **entry,
+                    "document_id": previous["document_id"],
+                    "chunk_count": previous["chunk_count"]
                 })
-                logger.info(f"Cargado MD: {md_file.name}")
-            except Exception as e:
-                logger.error(f"Error cargando MD {md_file}: {e}")
+            else:
+                changed.append(entry)
 
-        # Recorrer todos los .pdf recursivamente
-        for pdf_file in docs_path.rglob("*.pdf"):
-            try:
-                content = self._extract_pdf_text(pdf_file)
+        removed = [
+            entry for key, entry in manifest.items()
+            if key not in seen and Path(key).is_relative_to(root)
+        ]
 
-                # Extraer metadata del PDF
-                metadata = self._extract_pdf_metadata(pdf_file)
+        return changed, refreshed, removed
 
-                documents.append({
-                    "content": content,
-                    "metadata": metadata
-                })
-                logger.info(f"Cargado PDF: {pdf_file.name}")
-            except Exception as e:
-                logger.error(f"Error cargando PDF {pdf_file}: {e}")
+    def _manifest_entry(self, file_path: Path, previous: Dict[str, Any] | None) -> Dict[str, Any]:
+        """Entrada de manifest (sin document_id ni chunk_count) para un archivo"""
+        stat = file_path.stat()
+        return {
+            "path": str(file_path.resolve()),
+            "file": file_path,
+            "size_bytes": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "content_hash": self._file_hash(file_path),
+            "previous": previous
+        }
 
-        logger.info(f"Total documentos cargados: {len(documents)}")
-        return documents
+    async def _plan_duplicate_sources(
+        self,
+        manifest: Dict[str, Dict[str, Any]],
+        changed: List[Dict[str, Any]],
+        removed: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Archivos sin cambios que igual deben re-procesarse.
+
+        PEDAGOGÍA:
+        - Un duplicado no tiene fila propia: vive como referencia en el chunk
+          canónico de OTRO documento
+        - Si ese documento se re-ingesta o se elimina, la referencia se pierde
+          → el archivo duplicado se vuelve a procesar (y así en cadena)
+
+        Returns:
+            Entradas de manifest a agregar a los cambiados
+        """
+        queued = {e["path"] for e in changed}
+        frontier = [e["previous"]["document_id"] for e in changed if e.get("previous")]
+        frontier += [e["document_id"] for e in removed]
+        extra = []
+
+        while frontier:
+            paths = await self.vector_store.get_duplicate_source_paths(frontier)
+            frontier = []
+            for key in paths:
+                file_path = Path(key)
+                if key in queued or not file_path.exists():
+                    continue
+                queued.add(key)
+                entry = self._manifest_entry(file_path, manifest.get(key))
+                extra.append(entry)
+                if entry["previous"]:
+                    frontier.append(entry["previous"]["document_id"])
+
+        return extra
 
     def chunk_document(
         self,
@@ -99,49 +261,43 @@ class DocumentIngestion:
         overlap: int = 50
     ) -> List[Dict[str, Any]]:
         """
-        Divide un documento en chunks con overlap.
+        Divide un documento en chunks respetando su estructura.
 
         PEDAGOGÍA:
-        - chunk_size = longitud máxima del chunk (en caracteres)
-        - overlap = cuántos caracteres compartir entre chunks
-        - ¿Por qué overlap? Para preservar contexto entre chunks
-          Ejemplo: "...edad mínima 65 años" → siguiente chunk empieza en "65 años..."
+        - chunk_size = longitud máxima del chunk (en TOKENS, no caracteres)
+        - overlap = tokens máximos compartidos entre chunks, siempre
+          oraciones/párrafos completos (nunca media palabra)
+        - Los headings inician chunks nuevos: una sección no se mezcla con otra
+        - Cada chunk guarda page_start/page_end y section_title → citas precisas
+          Ejemplo: "Requisitos (págs. 3-4)" en lugar de "página 1"
 
         Args:
             doc: Documento con content y metadata
-            chunk_size: Tamaño máximo del chunk
-            overlap: Caracteres de superposición
+            chunk_size: Tamaño máximo del chunk en tokens
+            overlap: Tokens de superposición
 
         Returns:
             Lista de chunks con content y metadata
         """
-        content = doc["content"]
         metadata = doc["metadata"]
+        chunker = StructuredChunker(max_tokens=chunk_size, overlap_tokens=overlap)
 
         chunks = []
-        start = 0
-
-        while start < len(content):
-            # Calcular fin del chunk
-            end = start + chunk_size
-
-            # Extraer chunk
-            chunk_text = content[start:end]
-
-            # Crear chunk con metadata heredada
+        for piece in chunker.chunk(doc["content"]):
+            # Crear chunk con metadata heredada + procedencia
             chunks.append({
-                "content": chunk_text.strip(),
+                "content": piece["content"],
                 "metadata": {
                     **metadata,
                     "chunk_index": len(chunks),
-                    "start_char": start,
-                    "end_char": min(end, len(content))
+                    "page": piece["page_start"],
+                    "page_start": piece["page_start"],
+                    "page_end": piece["page_end"],
+                    "section_title": piece["section_title"],
+                    "token_count": piece["token_count"]
                 }
             })
 
-            # Avanzar con overlap
-            start += chunk_size - overlap
-
         return chunks
 
     async def ingest_and_embed(
@@ -149,25 +305,34 @@ class DocumentIngestion:
         path: str,
         chunk_size: int = 512,
         overlap: int = 50,
-        batch_size: int = 250
+        batch_size: int = 250,
+        full: bool = False,
+        queue_size: int = 4
     ) -> Dict[str, Any]:
         """
-        Pipeline completo de ingesta:
-        1. Carga documentos (MD y PDF)
-        2. Hace chunking con overlap
-        3. Genera embeddings
-        4. Almacena en vector store
+        Pipeline completo de ingesta (incremental y en streaming):
+        1. Compara archivos con el manifest (size, mtime, hash)
+        2. Extrae solo documentos nuevos o modificados (MD y PDF)
+        3. Hace chunking con overlap
+        4. Genera embeddings por batches
+        5. Almacena en vector store y elimina chunks obsoletos
 
         PEDAGOGÍA:
         - Este es el método "todo-en-uno" del pipeline RAG
         - Los participantes llaman solo este método para ingestar
-        - Internamente coordina load → chunk → embed → store
+        - Cada etapa es un async generator; entre etapas hay colas acotadas:
+          * Las etapas trabajan en paralelo (se solapan)
+          * Si una etapa se atrasa, las anteriores esperan (backpressure)
+          * La memoria no crece con el tamaño del corpus
+          * Las primeras filas llegan a Postgres en segundos
 
         Args:
             path: Directorio con documentos
-            chunk_size: Tamaño máximo del chunk
-            overlap: Caracteres de superposición
+            chunk_size: Tamaño máximo del chunk en tokens
+            overlap: Tokens de superposición
             batch_size: Tamaño del batch para embeddings
+            full: Si True, re-procesa todos los archivos ignorando el manifest
+            queue_size: Capacidad de cada cola entre etapas
 
         Returns:
             Dict con estadísticas del proceso
@@ -177,84 +342,428 @@ class DocumentIngestion:
         if not self.vector_store:
             raise ValueError("VectorStore requerido para ingest_and_embed()")
 
-        logger.info(f"Iniciando ingesta desde: {path}")
-
-        # 1. Cargar documentos
-        documents = await self.load_documents(path)
-        logger.info(f"Documentos cargados: {len(documents)}")
-
-        # 2. Hacer chunking
-        all_chunks = []
-        for doc in documents:
-            chunks = self.chunk_document(doc, chunk_size, overlap)
-            all_chunks.extend(chunks)
-        logger.info(f"Chunks generados: {len(all_chunks)}")
+        logger.info(f"Iniciando ingesta desde: {path} (modo {'completo' if full else 'incremental'})")
+        start = time.perf_counter()
+
+        # 1. Comparar disco vs manifest
+        manifest = await self.vector_store.get_manifest()
+        changed, refreshed, removed = self._plan_incremental(path, manifest, full)
+
+        # Duplicados que apuntaban a documentos que se van a re-escribir
+        dependents = await self._plan_duplicate_sources(manifest, changed, removed)
+        if dependents:
+            logger.info(f"Re-procesando {len(dependents)} archivos con duplicados en documentos modificados")
+            changed.extend(dependents)
+            requeued = {e["path"] for e in dependents}
+            refreshed = [e for e in refreshed if e["path"] not in requeued]
+
+        touched = {e["path"] for e in changed} | {e["path"] for e in removed}
+        unchanged = sum(1 for key in manifest if key not in touched)
+        logger.info(
+            f"Archivos: {len(changed)} nuevos/modificados, "
+            f"{len(removed)} eliminados, {unchanged} sin cambios"
+        )
+
+        # 2-5. Pipeline en streaming: extracción → chunking → embeddings → upsert
+        stats = {
+            "documents": 0,
+            "chunks": 0,
+            "embeddings": 0,
+            "rows": 0,
+            "stale_chunks": 0,
+            "upsert_seconds": 0.0,
+            "first_write_s": None
+        }
+        deduplicator = None
+        if self.deduplicate:
+            deduplicator = ChunkDeduplicator(threshold=self.near_duplicate_threshold)
+            await self._seed_deduplicator(deduplicator, changed, removed)
+
+        documents = self._buffered(self._iter_documents(changed), queue_size)
+        chunk_groups = self._buffered(
+            self._iter_chunk_groups(documents, chunk_size, overlap, stats, deduplicator),
+            queue_size
+        )
+        embedded = self._buffered(
+            self._iter_embedded_batches(chunk_groups, batch_size, stats),
+            queue_size
+        )
 
-        # 3. Generar embeddings
-        texts = [chunk["content"] for chunk in all_chunks]
         try:
-            embeddings = await self.embedding_generator.generate_embeddings(
-                texts,
-                batch_size=batch_size
-            )
-            logger.info(f"Embeddings generados: {len(embeddings)}")
+            async for chunks, completed in embedded:
+                await self._write_batch(chunks, completed, stats, start)
         except Exception as e:
-            logger.error(f"Error generando embeddings: {e}")
+            logger.error(f"Error en el pipeline de ingesta: {e}")
             raise
 
-        # 4. Asociar embeddings a chunks
-        for chunk, embedding in zip(all_chunks, embeddings):
-            chunk["embedding"] = embedding
-
-        # 5. Almacenar en vector store
-        try:
-            await self.vector_store.upsert_chunks(all_chunks)
-            logger.info(f"Chunks almacenados en vector store: {len(all_chunks)}")
-        except Exception as e:
-            logger.error(f"Error almacenando en vector store: {e}")
-            raise
+        # 6. Archivos eliminados del disco y archivos solo "tocados"
+        stats["stale_chunks"] += await self._collect_garbage([], removed)
+        await self.vector_store.remove_chunk_sources([e["path"] for e in removed])
+        await self.vector_store.delete_manifest([e["path"] for e in removed])
+        await self.vector_store.upsert_manifest(refreshed)
+
+        logger.info(f"Documentos procesados: {stats['documents']}")
+        logger.info(f"Chunks almacenados: {stats['rows']}")
+        logger.info(f"Chunks obsoletos eliminados: {stats['stale_chunks']}")
+        if deduplicator:
+            logger.info(
+                f"Duplicados omitidos: {deduplicator.exact_duplicates} exactos; "
+                f"casi duplicados agrupados: {deduplicator.near_duplicates}"
+            )
 
-        # 6. Retornar estadísticas
+        # 7. Retornar estadísticas
+        rows_per_second = (
+            stats["rows"] / stats["upsert_seconds"] if stats["upsert_seconds"] > 0 else 0.0
+        )
         return {
-            "total_documents": len(documents),
-            "total_chunks": len(all_chunks),
-            "total_embeddings": len(embeddings),
+            "total_documents": stats["documents"],
+            "total_chunks": stats["chunks"],
+            "total_embeddings": stats["embeddings"],
+            "unchanged_documents": unchanged,
+            "removed_documents": len(removed),
+            "stale_chunks_deleted": stats["stale_chunks"],
+            "duplicates_exact": deduplicator.exact_duplicates if deduplicator else 0,
+            "duplicates_near": deduplicator.near_duplicates if deduplicator else 0,
+            "embeddings_saved": deduplicator.embeddings_saved if deduplicator else 0,
             "chunk_size": chunk_size,
             "overlap": overlap,
+            "rows_per_second": rows_per_second,
+            "first_write_s": stats["first_write_s"],
+            "elapsed_s": time.perf_counter() - start,
             "status": "success"
         }
 
-    def _extract_pdf_text(self, pdf_path: Path) -> str:
+    # ------------------------------------------------------------------
+    # Etapas del pipeline en streaming
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    async def _buffered(source: AsyncIterator[Any], maxsize: int) -> AsyncIterator[Any]:
         """
-        Extrae texto de un PDF usando PyMuPDF.
+        Ejecuta un async generator en su propia task, con cola acotada.
 
         PEDAGOGÍA:
-        - PyMuPDF (fitz) es más rápido y confiable que pdfplumber
-        - Extrae texto página por página
-        - Preserva estructura básica del texto
+        - El productor avanza mientras el consumidor procesa (solapamiento)
+        - queue.put() bloquea si la cola está llena (backpressure)
+        - Los errores del productor se re-lanzan en el consumidor
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        done = object()
 
-        Args:
-            pdf_path: Ruta al archivo PDF
+        async def pump():
+            try:
+                async for item in source:
+                    await queue.put(item)
+                await queue.put(done)
+            except Exception as e:
+                await queue.put(_StageError(e))
 
-        Returns:
-            Texto completo del PDF
+        task = asyncio.create_task(pump())
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, _StageError):
+                    raise item.error
+                yield item
+        finally:
+            task.cancel()
+
+    async def _iter_documents(
+        self,
+        entries: List[Dict[str, Any]]
+    ) -> AsyncIterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
         """
+        Etapa 1: extrae el contenido de cada archivo modificado.
+
+        PEDAGOGÍA:
+        - Ventana de N archivos en extracción simultánea (N = procesos del pool)
+        - Se emiten en el orden original aunque terminen en otro orden
+        """
+        window = max(1, self.pdf_extractor.max_workers)
+        pending_entries = iter(entries)
+        inflight = deque()
+
+        def schedule_next():
+            entry = next(pending_entries, None)
+            if entry is not None:
+                inflight.append((entry, asyncio.create_task(self._load_file(entry["file"]))))
+
+        for _ in range(window):
+            schedule_next()
+
         try:
-            doc = fitz.open(pdf_path)
-            text_parts = []
+            while inflight:
+                entry, task = inflight.popleft()
+                doc = await task
+                schedule_next()
+                if doc:
+                    # Path absoluto (el del manifest): permite borrar por archivo en el GC
+                    doc["metadata"]["path"] = entry["path"]
+                    yield entry, doc
+        finally:
+            for _, task in inflight:
+                task.cancel()
+
+    async def _seed_deduplicator(
+        self,
+        deduplicator: ChunkDeduplicator,
+        changed: List[Dict[str, Any]],
+        removed: List[Dict[str, Any]]
+    ):
+        """
+        Registra los chunks ya almacenados como canónicos.
 
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                text = page.get_text()
-                if text.strip():
-                    text_parts.append(f"--- Página {page_num + 1} ---\n{text}")
+        PEDAGOGÍA:
+        - En una ingesta incremental solo se procesan los archivos cambiados:
+          sin sembrar, un chunk nuevo idéntico a uno de un archivo SIN cambios
+          nunca se detectaría como duplicado
+        - Se excluyen los chunks de archivos que se re-escriben o eliminan
+          en esta corrida (dejarán de existir)
+        """
+        if not changed:
+            return
 
-            doc.close()
-            return "\n\n".join(text_parts)
+        excluded = [e["path"] for e in changed] + [e["path"] for e in removed]
+        stored = await self.vector_store.get_chunk_texts(excluded)
 
-        except Exception as e:
-            logger.error(f"Error extrayendo texto de PDF {pdf_path}: {e}")
-            raise
+        def seed():
+            for row in stored:
+                deduplicator.add_canonical(row["content"], (row["document_id"], row["chunk_index"]))
+
+        # MinHash de cada chunk usa CPU: fuera del event loop
+        await asyncio.to_thread(seed)
+        logger.info(f"Deduplicación: {len(stored)} chunks almacenados como canónicos")
+
+    async def _iter_chunk_groups(
+        self,
+        documents: AsyncIterator[Tuple[Dict[str, Any], Dict[str, Any]]],
+        chunk_size: int,
+        overlap: int,
+        stats: Dict[str, Any],
+        deduplicator: ChunkDeduplicator | None = None
+    ) -> AsyncIterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+        """
+        Etapa 2: divide cada documento en chunks y descarta duplicados exactos.
+
+        PEDAGOGÍA:
+        - chunk_count sigue contando TODOS los chunks (los índices no cambian);
+          los lugares de los duplicados quedan vacíos
+        - Cada duplicado se anota en la entrada como referencia al canónico,
+          que se escribe en la metadata cuando el documento se completa
+        - Los casi duplicados se conservan con metadata["near_duplicate_of"]
+        """
+        async for entry, doc in documents:
+            # Tokenizar usa CPU: fuera del event loop
+            chunks = await asyncio.to_thread(self.chunk_document, doc, chunk_size, overlap)
+            entry["document_id"] = self.vector_store.document_id_for(doc["metadata"])
+            entry["chunk_count"] = len(chunks)
+            stats["documents"] += 1
+            stats["chunks"] += len(chunks)
+
+            if deduplicator:
+                chunks = await asyncio.to_thread(self._drop_duplicates, entry, chunks, deduplicator)
+
+            yield entry, chunks
+
+    def _drop_duplicates(
+        self,
+        entry: Dict[str, Any],
+        chunks: List[Dict[str, Any]],
+        deduplicator: ChunkDeduplicator
+    ) -> List[Dict[str, Any]]:
+        """Quita los duplicados exactos (anotados en entry) y agrupa los casi duplicados"""
+        kept = []
+        entry["duplicates"] = []
+
+        for chunk in chunks:
+            metadata = chunk["metadata"]
+            match = deduplicator.find_duplicate(
+                chunk["content"],
+                (entry["document_id"], metadata["chunk_index"])
+            )
+            if match is None:
+                kept.append(chunk)
+                continue
+
+            canonical_key, exact = match
+            if not exact:
+                # Puede diferir en un código, monto o plazo: se conserva
+                metadata["near_duplicate_of"] = {
+                    "document_id": canonical_key[0],
+                    "chunk_index": canonical_key[1]
+                }
+                kept.append(chunk)
+                continue
+
+            entry["duplicates"].append((canonical_key, {
+                "document_id": entry["document_id"],
+                "chunk_index": metadata["chunk_index"],
+                "source": metadata.get("source"),
+                "path": entry["path"],
+                "page_start": metadata.get("page_start"),
+                "page_end": metadata.get("page_end")
+            }))
+
+        return kept
+
+    async def _iter_embedded_batches(
+        self,
+        chunk_groups: AsyncIterator[Tuple[Dict[str, Any], List[Dict[str, Any]]]],
+        batch_size: int,
+        stats: Dict[str, Any]
+    ) -> AsyncIterator[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """
+        Etapa 3: agrupa chunks (de uno o varios documentos) y genera embeddings.
+
+        PEDAGOGÍA:
+        - Cada grupo = batch_size * max_concurrency chunks, para que el
+          EmbeddingGenerator pueda tener varios batches en vuelo
+        - Junto con los chunks se emiten los documentos COMPLETADOS
+          (todos sus chunks ya embebidos) → el manifest solo se actualiza
+          cuando el documento entero está escrito
+
+        Yields:
+            (chunks con embedding, entradas de manifest completadas)
+        """
+        group_size = batch_size * getattr(self.embedding_generator, "max_concurrency", 1)
+        pending: List[Dict[str, Any]] = []
+        waiting: List[List[Any]] = []  # [[entry, chunks aún sin embeber], ...]
+
+        async for entry, chunks in chunk_groups:
+            pending.extend(chunks)
+            waiting.append([entry, len(chunks)])
+
+            while len(pending) >= group_size:
+                group, pending = pending[:group_size], pending[group_size:]
+                yield await self._embed_group(group, waiting, batch_size, stats)
+
+        if pending or waiting:
+            yield await self._embed_group(pending, waiting, batch_size, stats)
+
+    async def _embed_group(
+        self,
+        group: List[Dict[str, Any]],
+        waiting: List[List[Any]],
+        batch_size: int,
+        stats: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Embebe un grupo de chunks y calcula qué documentos quedan completos"""
+        if group:
+            embeddings = await self.embedding_generator.generate_embeddings(
+                [chunk["content"] for chunk in group],
+                batch_size=batch_size
+            )
+            for chunk, embedding in zip(group, embeddings):
+                chunk["embedding"] = embedding
+            stats["embeddings"] += len(embeddings)
+
+        completed = []
+        remaining = len(group)
+        while waiting and waiting[0][1] <= remaining:
+            entry, count = waiting.pop(0)
+            remaining -= count
+            completed.append(entry)
+        if waiting:
+            waiting[0][1] -= remaining
+
+        return group, completed
+
+    async def _write_batch(
+        self,
+        chunks: List[Dict[str, Any]],
+        completed: List[Dict[str, Any]],
+        stats: Dict[str, Any],
+        start: float
+    ):
+        """Etapa 4: upsert de chunks + GC y manifest de documentos completos"""
+        if chunks:
+            upsert_stats = await self.vector_store.upsert_chunks(chunks)
+            stats["rows"] += upsert_stats["rows"]
+            stats["upsert_seconds"] += upsert_stats["elapsed_s"]
+
+            if stats["first_write_s"] is None:
+                stats["first_write_s"] = time.perf_counter() - start
+                logger.info(
+                    f"Primeras {upsert_stats['rows']} filas en vector store "
+                    f"tras {stats['first_write_s']:.1f}s"
+                )
+
+        if completed:
+            await self._link_duplicates(completed)
+            stats["stale_chunks"] += await self._collect_garbage(completed, [])
+            await self.vector_store.upsert_manifest(completed)
+
+    async def _link_duplicates(self, completed: List[Dict[str, Any]]):
+        """
+        Reemplaza las referencias de estos documentos en los chunks canónicos.
+
+        PEDAGOGÍA:
+        - El canónico siempre es de un documento anterior (o del mismo),
+          así que ya está escrito cuando el duplicado se completa
+        """
+        await self.vector_store.remove_chunk_sources([e["path"] for e in completed])
+
+        sources: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+        for entry in completed:
+            for canonical_key, ref in entry.get("duplicates", []):
+                sources.setdefault(canonical_key, []).append(ref)
+
+        await self.vector_store.add_chunk_sources(sources)
+
+    async def _collect_garbage(
+        self,
+        processed: List[Dict[str, Any]],
+        removed: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Elimina chunks que ya no corresponden a ningún archivo.
+
+        PEDAGOGÍA:
+        - Upsert por (document_id, chunk_index) NO borra nada:
+          si un documento pasa de 10 a 7 chunks, los chunks 7-9 quedan huérfanos
+        - Si el document_id cambió (ej: se editó el CÓDIGO), se borra el anterior
+        - Archivos eliminados del disco → se borran todos sus chunks
+        - Chunks que ahora son duplicados → se borra la fila vieja de su lugar
+        - Todo borrado se limita al path del archivo (metadata.path): mover o
+          renombrar un archivo conserva su document_id, y el GC del path viejo
+          no debe tocar los chunks recién escritos desde el nuevo (ni dos
+          archivos con el mismo código truncarse entre sí)
+
+        Args:
+            processed: Entradas de manifest recién escritas
+            removed: Entradas de manifest de archivos que ya no existen
+
+        Returns:
+            Número de chunks eliminados
+        """
+        deleted = 0
+
+        for entry in processed:
+            deleted += await self.vector_store.delete_document_chunks(
+                entry["document_id"],
+                from_chunk_index=entry["chunk_count"],
+                path=entry["path"]
+            )
+            deleted += await self.vector_store.delete_chunks([
+                (ref["document_id"], ref["chunk_index"])
+                for _, ref in entry.get("duplicates", [])
+            ])
+            previous = entry.get("previous")
+            if previous and previous["document_id"] != entry["document_id"]:
+                deleted += await self.vector_store.delete_document_chunks(
+                    previous["document_id"],
+                    path=entry["path"]
+                )
+
+        for entry in removed:
+            deleted += await self.vector_store.delete_document_chunks(
+                entry["document_id"],
+                path=entry["path"]
+            )
+
+        return deleted
 
     def _extract_pdf_metadata(self, pdf_path: Path) -> Dict[str, Any]:
         """
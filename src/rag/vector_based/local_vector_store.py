@@ -0,0 +1,635 @@
+"""
+Vector store en proceso con NumPy (sin base de datos)
+
+Misma interfaz que VectorStore (connect, upsert_chunks, similarity_search,
+get_statistics, manifest...) pero los vectores viven en un archivo .npy
+memory-mapped y la búsqueda es una multiplicación de matrices.
+
+PEDAGOGÍA:
+- Ideal para laptops, CI y despliegues chicos (< ~1M chunks)
+- Sin round-trip a Postgres en el camino crítico de cada query
+- Búsqueda EXACTA (no aproximada): recall = 100%, útil como referencia
+  para medir el recall de los índices HNSW/IVFFlat
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from src.rag.lexical import BM25Index
+
+logger = logging.getLogger(__name__)
+
+
+class LocalVectorStore:
+    """
+    Almacena vectores normalizados en una matriz float32 (N x 768).
+
+    PEDAGOGÍA:
+    - Vectores normalizados → similitud coseno = producto punto
+    - Top-k = UNA multiplicación matriz-vector + argpartition (O(N), sin ordenar todo)
+    - Archivos en `path`:
+      * vectors.npy   → matriz float32 (se abre con mmap: arranque instantáneo)
+      * chunks.json   → sidecar con content/metadata de cada fila
+      * manifest.json → manifest de ingesta incremental
+    - Los cambios se acumulan en memoria y se persisten con flush()/close()
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    CHUNKS_FILE = "chunks.json"
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, path: str | None = None, dimensions: int = 768):
+        """
+        Args:
+            path: Directorio del índice (usa env var LOCAL_VECTOR_STORE_PATH,
+                  default data/vector_index)
+            dimensions: Dimensiones de los embeddings
+        """
+        self.path = Path(path or os.getenv("LOCAL_VECTOR_STORE_PATH", "data/vector_index"))
+        self.dimensions = dimensions
+
+        # Matriz de vectores: memmap de solo lectura hasta la primera escritura
+        self._matrix: np.ndarray = np.empty((0, dimensions), dtype=np.float32)
+        self._size = 0
+        self._rows: List[Dict[str, Any]] = []
+        self._row_by_key: Dict[Tuple[str, int], int] = {}
+        self._manifest: Dict[str, Dict[str, Any]] = {}
+        self._next_id = 1
+        self._dirty = False
+
+        # Índice BM25 para hybrid_search (se reconstruye tras cambios)
+        self._bm25: BM25Index | None = None
+
+    async def connect(self):
+        """Carga el índice desde disco (si existe)"""
+        await asyncio.to_thread(self._load)
+
+    async def close(self):
+        """Persiste cambios pendientes"""
+        await self.flush()
+
+    async def flush(self):
+        """Escribe vectores, sidecar y manifest en disco (si hubo cambios)"""
+        if self._dirty:
+            await asyncio.to_thread(self._save)
+
+    def _load(self):
+        vectors_path = self.path / self.VECTORS_FILE
+        chunks_path = self.path / self.CHUNKS_FILE
+        manifest_path = self.path / self.MANIFEST_FILE
+
+        if vectors_path.exists() and chunks_path.exists():
+            self._matrix = np.load(vectors_path, mmap_mode="r")
+            self._rows = json.loads(chunks_path.read_text(encoding="utf-8"))
+            self._size = len(self._rows)
+            self._row_by_key = {
+                (row["document_id"], row["chunk_index"]): i
+                for i, row in enumerate(self._rows)
+            }
+            self._next_id = max((row["id"] for row in self._rows), default=0) + 1
+
+        if manifest_path.exists():
+            self._manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+
+        self._normalize_chunk_paths()
+        logger.info(f"LocalVectorStore: {self._size} vectores cargados desde {self.path}")
+
+    def _normalize_chunk_paths(self):
+        """
+        Migra filas antiguas sin metadata["path"] absoluto (misma regla que
+        VectorStore: se atribuyen solo si el document_id tiene UN archivo
+        en el manifest)
+        """
+        paths_by_doc: Dict[str, List[str]] = {}
+        for path, entry in self._manifest.items():
+            paths_by_doc.setdefault(entry["document_id"], []).append(path)
+
+        migrated, orphans = 0, 0
+        for row in self._rows:
+            row_path = row["metadata"].get("path")
+            if row_path and Path(row_path).is_absolute():
+                continue
+            candidates = paths_by_doc.get(row["document_id"], [])
+            if len(candidates) == 1:
+                row["metadata"]["path"] = candidates[0]
+                migrated += 1
+            else:
+                orphans += 1
+
+        if migrated:
+            self._dirty = True
+            logger.info(f"metadata.path normalizado en {migrated} chunks antiguos")
+        if orphans:
+            logger.warning(
+                f"{orphans} chunks sin metadata.path atribuible: el GC incremental no "
+                f"los borra (recrear el índice para eliminarlos)"
+            )
+
+    def _save(self):
+        """
+        Escritura atómica: archivo temporal + os.replace.
+
+        Un proceso que lee el índice nunca ve un archivo a medio escribir.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._write_atomic(
+            self.VECTORS_FILE,
+            lambda f: np.save(f, np.ascontiguousarray(self._matrix[:self._size]))
+        )
+        self._write_atomic(
+            self.CHUNKS_FILE,
+            lambda f: f.write(json.dumps(self._rows, ensure_ascii=False).encode("utf-8"))
+        )
+        self._write_atomic(
+            self.MANIFEST_FILE,
+            lambda f: f.write(json.dumps(self._manifest, ensure_ascii=False).encode("utf-8"))
+        )
+        self._dirty = False
+        logger.info(f"LocalVectorStore: {self._size} vectores guardados en {self.path}")
+
+    def _write_atomic(self, name: str, write):
+        target = self.path / name
+        tmp = target.with_suffix(target.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, target)
+
+    def _ensure_writable(self, extra_rows: int):
+        """
+        Garantiza una matriz en memoria con capacidad para extra_rows filas más.
+
+        PEDAGOGÍA:
+        - La capacidad crece al doble (como list de Python) → append amortizado O(1)
+        - El memmap de solo lectura se copia a memoria en la primera escritura
+        """
+        needed = self._size + extra_rows
+        if isinstance(self._matrix, np.memmap) or needed > len(self._matrix):
+            capacity = max(needed, 2 * len(self._matrix), 1024)
+            matrix = np.empty((capacity, self.dimensions), dtype=np.float32)
+            matrix[:self._size] = self._matrix[:self._size]
+            self._matrix = matrix
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        """Normaliza filas a norma 1 (vectores nulos quedan en cero)"""
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    @staticmethod
+    def document_id_for(metadata: Dict[str, Any]) -> str:
+        """document_id de un chunk: procedure_code si existe, sino source"""
+        return metadata.get("procedure_code") or metadata.get("source", "unknown")
+
+    async def upsert_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        batch_size: int = 5000
+    ) -> Dict[str, Any]:
+        """
+        Inserta o actualiza chunks con sus embeddings.
+
+        Args:
+            chunks: Lista de dicts con content, metadata y embedding
+            batch_size: Ignorado (compatibilidad con VectorStore)
+
+        Returns:
+            Dict con rows, elapsed_s y rows_per_second
+        """
+        start = time.perf_counter()
+
+        # Una sola fila por (document_id, chunk_index), la última gana
+        by_key: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for chunk in chunks:
+            metadata = chunk.get("metadata", {})
+            by_key[(self.document_id_for(metadata), metadata.get("chunk_index", 0))] = chunk
+
+        if by_key:
+            vectors = self._normalize(np.asarray(
+                [chunk["embedding"] for chunk in by_key.values()], dtype=np.float32
+            ))
+            self._ensure_writable(len(by_key))
+
+            for (key, chunk), vector in zip(by_key.items(), vectors):
+                row = self._row_by_key.get(key)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._row_by_key[key] = row
+                    self._rows.append({"id": self._next_id})
+                    self._next_id += 1
+
+                self._matrix[row] = vector
+                self._rows[row].update({
+                    "document_id": key[0],
+                    "chunk_index": key[1],
+                    "content": chunk["content"],
+                    "metadata": chunk.get("metadata", {})
+                })
+
+            self._dirty = True
+            self._bm25 = None
+
+        elapsed = time.perf_counter() - start
+        rows_per_second = len(by_key) / elapsed if elapsed > 0 else 0.0
+        return {
+            "rows": len(by_key),
+            "elapsed_s": elapsed,
+            "rows_per_second": rows_per_second
+        }
+
+    async def delete_document_chunks(
+        self,
+        document_id: str,
+        from_chunk_index: int = 0,
+        path: str | None = None
+    ) -> int:
+        """
+        Elimina chunks de un documento (garbage collection).
+
+        Args:
+            path: Solo chunks escritos desde ese archivo (metadata["path"])
+
+        Returns:
+            Número de chunks eliminados
+        """
+        def from_path(row: int) -> bool:
+            return path is None or self._rows[row]["metadata"].get("path") == path
+
+        doomed = [
+            row for (doc_id, chunk_index), row in self._row_by_key.items()
+            if doc_id == document_id and chunk_index >= from_chunk_index and from_path(row)
+        ]
+        return self._delete_rows(doomed)
+
+    async def delete_chunks(self, keys: List[Tuple[str, int]]) -> int:
+        """Elimina chunks puntuales por (document_id, chunk_index)"""
+        doomed = [self._row_by_key[key] for key in keys if key in self._row_by_key]
+        return self._delete_rows(doomed)
+
+    def _delete_rows(self, doomed: List[int]) -> int:
+        """Compacta matriz y sidecar sin las filas indicadas"""
+        if not doomed:
+            return 0
+
+        keep = np.ones(self._size, dtype=bool)
+        keep[doomed] = False
+
+        self._matrix = np.ascontiguousarray(self._matrix[:self._size][keep])
+        self._rows = [row for row, kept in zip(self._rows, keep) if kept]
+        self._size = len(self._rows)
+        self._row_by_key = {
+            (row["document_id"], row["chunk_index"]): i
+            for i, row in enumerate(self._rows)
+        }
+        self._dirty = True
+        self._bm25 = None
+        return len(doomed)
+
+    async def add_chunk_sources(self, sources: Dict[Tuple[str, int], List[Dict[str, Any]]]):
+        """Agrega fuentes duplicadas a metadata["duplicate_sources"] de chunks canónicos"""
+        for key, refs in sources.items():
+            row = self._row_by_key.get(key)
+            if row is None:
+                continue
+            metadata = self._rows[row]["metadata"]
+            current = metadata.setdefault("duplicate_sources", [])
+            current.extend(ref for ref in refs if ref not in current)
+            self._dirty = True
+
+    async def remove_chunk_sources(self, paths: List[str]):
+        """Quita de los chunks canónicos las referencias a estos archivos"""
+        doomed = set(paths)
+        for row in self._rows:
+            current = row["metadata"].get("duplicate_sources")
+            if current and any(ref.get("path") in doomed for ref in current):
+                row["metadata"]["duplicate_sources"] = [
+                    ref for ref in current if ref.get("path") not in doomed
+                ]
+                self._dirty = True
+
+    async def get_duplicate_source_paths(self, document_ids: List[str]) -> List[str]:
+        """Archivos cuyos duplicados apuntan a chunks de estos documentos"""
+        wanted = set(document_ids)
+        return sorted({
+            ref["path"]
+            for row in self._rows if row["document_id"] in wanted
+            for ref in row["metadata"].get("duplicate_sources", [])
+            if ref.get("path")
+        })
+
+    async def get_chunk_texts(self, exclude_paths: List[str]) -> List[Dict[str, Any]]:
+        """Texto de los chunks almacenados, salvo los de exclude_paths"""
+        excluded = set(exclude_paths)
+        return [
+            {
+                "document_id": row["document_id"],
+                "chunk_index": row["chunk_index"],
+                "content": row["content"]
+            }
+            for row in self._rows
+            if row["metadata"].get("path") not in excluded
+        ]
+
+    async def get_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Manifest de ingesta: {path: {document_id, size_bytes, ...}}"""
+        return {path: dict(entry) for path, entry in self._manifest.items()}
+
+    async def upsert_manifest(self, entries: List[Dict[str, Any]]):
+        """Inserta o actualiza entradas del manifest"""
+        for e in entries:
+            self._manifest[e["path"]] = {
+                "path": e["path"],
+                "document_id": e["document_id"],
+                "size_bytes": e["size_bytes"],
+                "mtime_ns": e["mtime_ns"],
+                "content_hash": e["content_hash"],
+                "chunk_count": e["chunk_count"]
+            }
+        if entries:
+            self._dirty = True
+
+    async def delete_manifest(self, paths: List[str]):
+        """Elimina entradas del manifest (archivos borrados del disco)"""
+        for path in paths:
+            if self._manifest.pop(path, None) is not None:
+                self._dirty = True
+
+    async def get_corpus_version(self) -> str:
+        """Versión del corpus: hash del contenido del manifest (ignora mtime y tamaño)"""
+        content = sorted(
+            (path, e["document_id"], e["content_hash"], e["chunk_count"])
+            for path, e in self._manifest.items()
+        )
+        digest = hashlib.sha256(json.dumps(content).encode("utf-8")).hexdigest()
+        return digest[:16]
+
+    async def rebuild_index(self) -> Dict[str, Any]:
+        """No hay índice ANN que reconstruir: la búsqueda es exacta"""
+        return {"index_type": "exact", "total_rows": self._size, "params": {}}
+
+    async def similarity_search(
+        self,
+        query_embedding: List[float],
+        k: int = 5,
+        filter_metadata: Dict[str, Any] | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca chunks más similares al query embedding (búsqueda exacta).
+
+        Args:
+            query_embedding: Vector de query (768 dims)
+            k: Número de resultados a retornar
+            filter_metadata: Filtros de metadata ({key: valor} o {key: [valores]})
+            ef_search: Ignorado (la búsqueda es exacta)
+            probes: Ignorado (la búsqueda es exacta)
+            include_embeddings: Agregar "embedding" (normalizado) a cada resultado
+
+        Returns:
+            Lista de chunks con content, metadata, score
+        """
+        # numpy libera el GIL en la multiplicación → no bloquea el event loop
+        return await asyncio.to_thread(
+            self._search, query_embedding, k, filter_metadata, include_embeddings
+        )
+
+    async def similarity_search_many(
+        self,
+        query_embeddings: List[List[float]],
+        k: int = 5,
+        filter_metadata: Dict[str, Any] | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k de varias queries con UNA multiplicación de matrices (Q x N).
+
+        Returns:
+            Una lista de resultados por query, en el mismo orden de entrada
+        """
+        return await asyncio.to_thread(self._search_many, query_embeddings, k, filter_metadata)
+
+    def _search_many(
+        self,
+        query_embeddings: List[List[float]],
+        k: int,
+        filter_metadata: Dict[str, Any] | None
+    ) -> List[List[Dict[str, Any]]]:
+        if not query_embeddings:
+            return []
+
+        candidates = self._candidate_rows(filter_metadata)
+        rows = np.arange(self._size) if candidates is None else candidates
+        if len(rows) == 0 or k <= 0:
+            return [[] for _ in query_embeddings]
+
+        queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+        matrix = self._matrix[:self._size] if candidates is None else self._matrix[candidates]
+        scores = queries @ matrix.T
+
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for query_scores, query_top in zip(scores, top):
+            query_top = query_top[np.argsort(-query_scores[query_top])]
+            results.append([
+                self._result(rows[i], float(query_scores[i]))
+                for i in query_top
+            ])
+        return results
+
+    def _candidate_rows(self, filter_metadata: Dict[str, Any] | None) -> np.ndarray | None:
+        """Filas que cumplen los filtros (None = todas)"""
+        if not filter_metadata:
+            return None
+
+        def matches(metadata: Dict[str, Any], key: str, value: Any) -> bool:
+            # Misma semántica que VectorStore: lista = cualquiera de los valores
+            if isinstance(value, (list, tuple, set)):
+                return metadata.get(key) in value
+            return metadata.get(key) == value
+
+        return np.fromiter(
+            (
+                i for i, row in enumerate(self._rows)
+                if all(
+                    matches(row["metadata"], key, value)
+                    for key, value in filter_metadata.items()
+                )
+            ),
+            dtype=np.int64
+        )
+
+    def _top_rows(
+        self,
+        query_embedding: List[float],
+        k: int,
+        filter_metadata: Dict[str, Any] | None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k exacto por similitud coseno.
+
+        Returns:
+            (filas, scores) ordenados por score descendente
+        """
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if self._size == 0 or k <= 0:
+            return empty
+
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        candidates = self._candidate_rows(filter_metadata)
+
+        if candidates is None:
+            scores = self._matrix[:self._size] @ query
+            rows = np.arange(self._size)
+        else:
+            if len(candidates) == 0:
+                return empty
+            scores = self._matrix[candidates] @ query
+            rows = candidates
+
+        # argpartition: top-k en O(N), luego solo se ordenan esos k
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def _search(
+        self,
+        query_embedding: List[float],
+        k: int,
+        filter_metadata: Dict[str, Any] | None,
+        include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        rows, scores = self._top_rows(query_embedding, k, filter_metadata)
+        return [
+            self._result(row, float(score), include_embeddings)
+            for row, score in zip(rows, scores)
+        ]
+
+    def _result(self, row: int, score: float, include_embedding: bool = False) -> Dict[str, Any]:
+        """Fila → resultado de búsqueda"""
+        result = {
+            "id": self._rows[row]["id"],
+            "content": self._rows[row]["content"],
+            "metadata": self._rows[row]["metadata"],
+            "score": score
+        }
+        if include_embedding:
+            result["embedding"] = np.array(self._matrix[row])
+        return result
+
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        k: int = 5,
+        filter_metadata: Dict[str, Any] | None = None,
+        candidates: int | None = None,
+        rrf_k: int = 60,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Búsqueda híbrida BM25 + vectorial fusionada con RRF
+        (mismo contrato que VectorStore.hybrid_search).
+        """
+        return await asyncio.to_thread(
+            self._hybrid, query_text, query_embedding, k,
+            filter_metadata, candidates or max(4 * k, 20), rrf_k, include_embeddings
+        )
+
+    async def hybrid_search_many(
+        self,
+        query_texts: List[str],
+        query_embeddings: List[List[float]],
+        k: int = 5,
+        filter_metadata: Dict[str, Any] | None = None,
+        candidates: int | None = None,
+        rrf_k: int = 60,
+        ef_search: int | None = None,
+        probes: int | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Búsqueda híbrida de varias queries en UN solo hilo
+        (mismo contrato que VectorStore.hybrid_search_many).
+        """
+        if len(query_texts) != len(query_embeddings):
+            raise ValueError("query_texts y query_embeddings deben tener el mismo largo")
+
+        candidates = candidates or max(4 * k, 20)
+        return await asyncio.to_thread(lambda: [
+            self._hybrid(text, embedding, k, filter_metadata, candidates, rrf_k)
+            for text, embedding in zip(query_texts, query_embeddings)
+        ])
+
+    def _hybrid(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        k: int,
+        filter_metadata: Dict[str, Any] | None,
+        candidates: int,
+        rrf_k: int,
+        include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        if self._bm25 is None:
+            self._bm25 = BM25Index([row["content"] for row in self._rows[:self._size]])
+
+        vec_rows, _ = self._top_rows(query_embedding, candidates, filter_metadata)
+
+        allowed = self._candidate_rows(filter_metadata)
+        allowed = None if allowed is None else set(allowed.tolist())
+        lex_rows = [
+            row for row, _ in self._bm25.search(query_text)
+            if allowed is None or row in allowed
+        ][:candidates]
+
+        fused: Dict[int, Dict[str, Any]] = {}
+        for source, ranked in (("vector_rank", vec_rows.tolist()), ("lexical_rank", lex_rows)):
+            for rank, row in enumerate(ranked, start=1):
+                entry = fused.setdefault(row, {"rrf_score": 0.0, "vector_rank": None, "lexical_rank": None})
+                entry["rrf_score"] += 1.0 / (rrf_k + rank)
+                entry[source] = rank
+
+        top = sorted(fused.items(), key=lambda item: item[1]["rrf_score"], reverse=True)[:k]
+        if not top:
+            return []
+
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+        cosine = self._matrix[[row for row, _ in top]] @ query
+
+        return [
+            {**self._result(row, float(score), include_embeddings), **ranks}
+            for (row, ranks), score in zip(top, cosine)
+        ]
+
+    async def get_statistics(self) -> Dict[str, Any]:
+        """Obtiene estadísticas del índice"""
+        categories = Counter(
+            row["metadata"]["category"]
+            for row in self._rows
+            if "category" in row["metadata"]
+        )
+
+        return {
+            "total_chunks": self._size,
+            "chunks_by_category": [
+                {"category": category, "count": count}
+                for category, count in categories.items()
+            ]
+        }
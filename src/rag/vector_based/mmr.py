@@ -0,0 +1,60 @@
+"""
+Maximal Marginal Relevance (MMR) para diversificar resultados
+
+Los chunks consecutivos de un documento comparten overlap: el top-5 por
+similitud suele ser cinco variantes del mismo párrafo. MMR elige, en cada
+paso, el candidato más relevante que MENOS se parece a los ya elegidos.
+
+PEDAGOGÍA:
+- score(d) = λ · sim(query, d) - (1 - λ) · max sim(d, elegido)
+- λ = 1 → ranking por relevancia pura; λ = 0 → diversidad pura
+- Con vectores normalizados, todas las similitudes son productos punto:
+  una matriz candidatos x candidatos (ej: 20 x 20) en NumPy
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query_embedding: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Selecciona k candidatos balanceando relevancia y diversidad.
+
+    Args:
+        query_embedding: Vector de la query
+        embeddings: Vectores de los candidatos (over-fetch de la búsqueda)
+        k: Número de candidatos a elegir
+        lambda_mult: Peso de la relevancia frente a la diversidad (0 a 1)
+
+    Returns:
+        Índices de los candidatos elegidos, en orden de selección
+    """
+    if len(embeddings) == 0 or k <= 0:
+        return []
+
+    docs = np.asarray(embeddings, dtype=np.float32)
+    docs = docs / np.maximum(np.linalg.norm(docs, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = docs @ query
+    similarity = docs @ docs.T
+
+    selected = [int(np.argmax(relevance))]
+    # Similitud de cada candidato con el más parecido de los elegidos
+    redundancy = similarity[selected[0]].copy()
+
+    while len(selected) < min(k, len(docs)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, similarity[best])
+
+    return selected
@@ -4,10 +4,13 @@ Retrieval orquestado para Vector RAG
 Integra ingestion, embeddings y vector store para búsqueda completa.
 """
 
+import os
 from typing import List, Dict, Any
 from .ingestion import DocumentIngestion
 from .embeddings import EmbeddingGenerator
 from .vector_store import VectorStore
+from .embedding_batcher import EmbeddingBatcher
+from .mmr import maximal_marginal_relevance
 
 
 class VectorRetrieval:
@@ -18,21 +21,52 @@ class VectorRetrieval:
     - RAG = Retrieval Augmented Generation
     - Flujo: query → embedding → búsqueda vectorial → contexto para LLM
     - Citas = anti-alucinación (el LLM cita fuentes reales)
+    - Modos de búsqueda:
+      * "vector" = solo similitud coseno
+      * "hybrid" = léxica + vectorial con RRF (códigos, RUTs, términos legales)
+    - MMR (opcional): over-fetch + re-ranking por diversidad, para que el
+      top-k no sean k chunks solapados del mismo documento
     """
 
+    SEARCH_MODES = ("vector", "hybrid")
+
     def __init__(
         self,
         embedding_generator: EmbeddingGenerator,
-        vector_store: VectorStore
+        vector_store: VectorStore,
+        query_batcher: EmbeddingBatcher | None = None,
+        search_mode: str | None = None,
+        mmr_lambda: float | None = None,
+        mmr_fetch_factor: int | None = None
     ):
         """
         Args:
             embedding_generator: Generador de embeddings
             vector_store: Almacenamiento vectorial
+            query_batcher: Agrupador de embeddings de queries (opcional).
+                           Recomendado en la API para alto QPS.
+            search_mode: "vector" o "hybrid" (usa env var VECTOR_SEARCH_MODE, default "vector")
+            mmr_lambda: Peso de la relevancia en MMR, 0 a 1 (usa env var
+                        VECTOR_MMR_LAMBDA; None = sin MMR)
+            mmr_fetch_factor: Candidatos por resultado para MMR
+                              (usa env var VECTOR_MMR_FETCH_FACTOR, default 4)
         """
         self.embedding_generator = embedding_generator
         self.vector_store = vector_store
-        self.ingestion = DocumentIngestion()
+        self.query_batcher = query_batcher
+        self.search_mode = self._validate_mode(
+            search_mode or os.getenv("VECTOR_SEARCH_MODE", "vector")
+        )
+
+        env_lambda = os.getenv("VECTOR_MMR_LAMBDA")
+        self.mmr_lambda = self._validate_mmr_lambda(
+            mmr_lambda if mmr_lambda is not None else (float(env_lambda) if env_lambda else None)
+        )
+        self.mmr_fetch_factor = mmr_fetch_factor or int(os.getenv("VECTOR_MMR_FETCH_FACTOR", "4"))
+        self.ingestion = DocumentIngestion(
+            embedding_generator=embedding_generator,
+            vector_store=vector_store
+        )
 
     async def ingest_and_index(
         self,
@@ -48,55 +82,39 @@ class VectorRetrieval:
         - Se ejecuta UNA VEZ para cada conjunto de documentos
         - Después, las búsquedas son instantáneas
 
-        Flujo:
-        1. Cargar documentos .md
+        Flujo (delegado a DocumentIngestion, en streaming):
+        1. Cargar documentos .md y .pdf nuevos o modificados
         2. Dividir en chunks
         3. Generar embeddings
         4. Guardar en vector store
 
         Args:
             documents_path: Ruta a documentos
-            chunk_size: Tamaño de chunks
-            overlap: Overlap entre chunks
+            chunk_size: Tamaño de chunks (tokens)
+            overlap: Overlap entre chunks (tokens)
         """
-        # 1. Cargar documentos
-        documents = await self.ingestion.load_documents(documents_path)
-        print(f"📄 Cargados {len(documents)} documentos")
-
-        # 2. Chunk documentos
-        all_chunks = []
-        for doc in documents:
-            chunks = self.ingestion.chunk_document(doc, chunk_size, overlap)
-            all_chunks.extend(chunks)
-
-        print(f"📦 Creados {len(all_chunks)} chunks")
-
-        # 3. Generar embeddings
-        texts = [chunk["content"] for chunk in all_chunks]
-        embeddings = await self.embedding_generator.generate_embeddings(texts)
-
-        print(f"🔢 Generados {len(embeddings)} embeddings")
-
-        # 4. Combinar chunks con embeddings
-        chunks_with_embeddings = [
-            {
-                "content": chunk["content"],
-                "metadata": chunk["metadata"],
-                "embedding": embedding
-            }
-            for chunk, embedding in zip(all_chunks, embeddings)
-        ]
+        stats = await self.ingestion.ingest_and_embed(
+            documents_path,
+            chunk_size=chunk_size,
+            overlap=overlap
+        )
 
-        # 5. Guardar en vector store
-        await self.vector_store.upsert_chunks(chunks_with_embeddings)
+        print(f"📄 Procesados {stats['total_documents']} documentos "
+              f"({stats['unchanged_documents']} sin cambios)")
+        print(f"📦 Creados {stats['total_chunks']} chunks")
+        print(f"🔢 Generados {stats['total_embeddings']} embeddings")
+        print(f"✅ Indexados {stats['total_chunks']} chunks en vector store")
 
-        print(f"✅ Indexados {len(chunks_with_embeddings)} chunks en vector store")
+        return stats
 
     async def retrieve(
         self,
         query: str,
         k: int = 5,
-        filter_metadata: Dict[str, Any] | None = None
+        filter_metadata: Dict[str, Any] | None = None,
+        mode: str | None = None,
+        mmr_lambda: float | None = None,
+        query_embedding: List[float] | None = None
     ) -> Dict[str, Any]:
         """
         Recupera chunks relevantes para una query.
@@ -108,28 +126,116 @@ class VectorRetrieval:
 
         Flujo:
         1. Generar embedding del query
-        2. Buscar chunks similares en vector store
-        3. Formatear con citas
+        2. Buscar chunks similares en vector store (vectorial o híbrida)
+        3. (Opcional) Diversificar con MMR: se traen k * mmr_fetch_factor
+           candidatos con sus embeddings y se eligen k poco redundantes
+        4. Formatear con citas
 
         Args:
             query: Consulta del usuario
             k: Número de chunks a retornar
             filter_metadata: Filtros opcionales
+            mode: "vector" o "hybrid" (None = self.search_mode)
+            mmr_lambda: Peso de la relevancia en MMR (None = self.mmr_lambda;
+                        si ambos son None no se aplica MMR)
+            query_embedding: Embedding de la query ya calculado por el caller
+                             (ej: el caché semántico de la API); evita otra
+                             llamada a la API de embeddings
 
         Returns:
             Dict con chunks y citas formateadas
         """
-        # 1. Generar embedding del query
-        query_embedding = await self.embedding_generator.generate_embedding(query)
-
-        # 2. Buscar chunks similares
-        chunks = await self.vector_store.similarity_search(
-            query_embedding=query_embedding,
-            k=k,
-            filter_metadata=filter_metadata
+        # 1. Generar embedding del query (agrupado con otras queries si hay batcher)
+        if query_embedding is None and self.query_batcher:
+            query_embedding = await self.query_batcher.embed(query)
+        elif query_embedding is None:
+            query_embedding = await self.embedding_generator.generate_embedding(query)
+
+        # 2. Buscar chunks similares (over-fetch con embeddings si hay MMR)
+        mode = self._validate_mode(mode or self.search_mode)
+        mmr_lambda = self._validate_mmr_lambda(
+            mmr_lambda if mmr_lambda is not None else self.mmr_lambda
         )
+        fetch_k = k * self.mmr_fetch_factor if mmr_lambda is not None else k
+        search_options = {"include_embeddings": True} if mmr_lambda is not None else {}
 
-        # 3. Formatear con citas
+        if mode == "hybrid":
+            chunks = await self.vector_store.hybrid_search(
+                query_text=query,
+                query_embedding=query_embedding,
+                k=fetch_k,
+                filter_metadata=filter_metadata,
+                **search_options
+            )
+        else:
+            chunks = await self.vector_store.similarity_search(
+                query_embedding=query_embedding,
+                k=fetch_k,
+                filter_metadata=filter_metadata,
+                **search_options
+            )
+
+        # 3. Diversificar
+        if mmr_lambda is not None and len(chunks) > k:
+            selected = maximal_marginal_relevance(
+                query_embedding,
+                [chunk["embedding"] for chunk in chunks],
+                k=k,
+                lambda_mult=mmr_lambda
+            )
+            chunks = [chunks[i] for i in selected]
+
+        # 4. Formatear con citas
+        return self._format_results(chunks, mode)
+
+    async def retrieve_many(
+        self,
+        queries: List[str],
+        k: int = 5,
+        filter_metadata: Dict[str, Any] | None = None,
+        mode: str | None = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Recupera chunks para varias queries a la vez (query expansion, multi-agente).
+
+        PEDAGOGÍA:
+        - Embeddings: UNA llamada a la API para todas las queries
+        - Búsqueda vectorial: UNA sentencia SQL (similarity_search_many)
+        - Modo híbrido: también UNA sentencia (hybrid_search_many)
+
+        Args:
+            queries: Consultas
+            k: Número de chunks por query
+            filter_metadata: Filtros comunes a todas las queries
+            mode: "vector" o "hybrid" (None = self.search_mode)
+
+        Returns:
+            Un resultado (mismo formato que retrieve) por query, en orden
+        """
+        if not queries:
+            return []
+
+        query_embeddings = await self.embedding_generator.generate_embeddings(queries)
+
+        mode = self._validate_mode(mode or self.search_mode)
+        if mode == "hybrid":
+            results = await self.vector_store.hybrid_search_many(
+                query_texts=queries,
+                query_embeddings=query_embeddings,
+                k=k,
+                filter_metadata=filter_metadata
+            )
+        else:
+            results = await self.vector_store.similarity_search_many(
+                query_embeddings=query_embeddings,
+                k=k,
+                filter_metadata=filter_metadata
+            )
+
+        return [self._format_results(chunks, mode) for chunks in results]
+
+    def _format_results(self, chunks: List[Dict[str, Any]], mode: str) -> Dict[str, Any]:
+        """Agrega citas a los chunks de una búsqueda"""
         formatted_chunks = []
         for chunk in chunks:
             metadata = chunk["metadata"]
@@ -147,19 +253,48 @@ class VectorRetrieval:
 
         return {
             "chunks": formatted_chunks,
-            "method": "vector_rag"
+            "method": "vector_rag",
+            "search_mode": mode
         }
 
+    @staticmethod
+    def _validate_mmr_lambda(mmr_lambda: float | None) -> float | None:
+        """Valida que λ de MMR esté entre 0 y 1 (None = sin MMR)"""
+        if mmr_lambda is not None and not 0.0 <= mmr_lambda <= 1.0:
+            raise ValueError(f"mmr_lambda debe estar entre 0 y 1: {mmr_lambda}")
+        return mmr_lambda
+
+    def _validate_mode(self, mode: str) -> str:
+        """Normaliza y valida el modo de búsqueda"""
+        mode = mode.lower()
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Modo de búsqueda inválido: {mode} (opciones: {self.SEARCH_MODES})")
+        return mode
+
     def _format_citation(self, metadata: Dict[str, Any], score: float) -> str:
         """
         Formatea una cita a partir de metadata.
 
         PEDAGOGÍA:
         - Las citas DEBEN ser específicas y verificables
-        - Incluir nombre del archivo fuente y score de relevancia
-        - Ejemplo: [Doc: proc-jubilacion-001.pdf, relevancia: 85%]
+        - Incluir nombre del archivo fuente, páginas y score de relevancia
+        - Ejemplo: [Doc: proc-jubilacion-001.pdf, págs. 3-4, relevancia: 85%]
+        - Si el mismo texto aparece en otros documentos (duplicados eliminados
+          en la ingesta), se listan: [..., también en: proc-jubilacion-002.pdf]
         """
         source = metadata.get("source", "documento-desconocido")
         score_pct = int(score * 100)
 
-        return f"[Doc: {source}, relevancia: {score_pct}%]"
+        also_in = sorted({
+            ref["source"] for ref in metadata.get("duplicate_sources", [])
+            if ref.get("source") and ref["source"] != source
+        })
+        suffix = f", también en: {', '.join(also_in)}" if also_in else ""
+
+        page_start = metadata.get("page_start")
+        page_end = metadata.get("page_end")
+        if page_start is None:
+            return f"[Doc: {source}, relevancia: {score_pct}%{suffix}]"
+
+        pages = f"pág. {page_start}" if page_end in (None, page_start) else f"págs. {page_start}-{page_end}"
+        return f"[Doc: {source}, {pages}, relevancia: {score_pct}%{suffix}]"
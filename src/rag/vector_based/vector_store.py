@@ -6,10 +6,16 @@ Este módulo maneja la persistencia de embeddings y búsqueda por similitud.
 
 import os
 import json
-from typing import List, Dict, Any
+import math
+import hashlib
+import time
+import logging
+from typing import List, Dict, Any, Tuple
 import asyncpg
 from pgvector.asyncpg import register_vector
 
+logger = logging.getLogger(__name__)
+
 
 class VectorStore:
     """
@@ -19,18 +25,127 @@ class VectorStore:
     - pgvector = extensión de PostgreSQL para vectores
     - Similitud coseno = medida de cercanía semántica
     - Operador <=> = distancia coseno en pgvector
-    - IVFFlat = índice para búsqueda rápida en millones de vectores
+    - Índices ANN (búsqueda aproximada):
+      * HNSW = grafo navegable, buen recall sin entrenamiento (default)
+      * IVFFlat = particiones (listas); debe construirse con datos cargados
+    - Full-text search (tsvector + GIN) para búsqueda híbrida léxica + vectorial
+    - Almacenamiento compacto del índice (storage):
+      * "full" = vector float32 (4 bytes/dim)
+      * "halfvec" = float16 (2 bytes/dim, recall prácticamente igual)
+      * "binary" = 1 bit/dim (32x más chico) + re-ranking exacto
+    - Matryoshka (prefix_dim): el índice usa solo las primeras N dimensiones
+      del embedding y el re-ranking usa las 768
     """
 
-    def __init__(self, database_url: str | None = None):
+    # Columnas de la tabla temporal usada por la carga masiva (COPY)
+    _STAGING_COLUMNS = ["document_id", "chunk_index", "content", "metadata", "embedding"]
+
+    # Tipos de índice ANN soportados
+    INDEX_TYPES = ("hnsw", "ivfflat")
+    EMBEDDING_INDEX_NAME = "embedding_idx"
+
+    # Dimensiones de text-embedding-004
+    DIMENSIONS = 768
+
+    # Representación indexada del embedding: storage → (expresión, operator class)
+    # {column} = embedding o embedding_p{N} (prefijo Matryoshka), {dims} = sus dimensiones
+    STORAGE_TYPES = {
+        "full": ("{column}", "vector_cosine_ops"),
+        "halfvec": ("({column}::halfvec({dims}))", "halfvec_cosine_ops"),
+        "binary": ("(binary_quantize({column})::bit({dims}))", "bit_hamming_ops")
+    }
+
+    # halfvec, binary_quantize, subvector y l2_normalize existen desde pgvector 0.7
+    MIN_PGVECTOR_COMPACT = (0, 7)
+
+    # Over-fetch por defecto antes del re-ranking exacto
+    _DEFAULT_RERANK_FACTOR = {"full": 1, "halfvec": 2, "binary": 10}
+
+    # Default de pgvector para hnsw.ef_search (máximo de resultados por scan)
+    _DEFAULT_EF_SEARCH = 40
+
+    # Configuración de text search de PostgreSQL (stemming en español)
+    TEXT_SEARCH_CONFIG = "spanish"
+
+    # Constante k de Reciprocal Rank Fusion (valor estándar del paper original)
+    RRF_K = 60
+
+    # Keys de metadata "calientes" promovidas a columnas generadas (key → columna)
+    PROMOTED_COLUMNS = {
+        "category": "category",
+        "procedure_code": "procedure_code",
+        "type": "doc_type"
+    }
+
+    # Modos de iterative scan de pgvector >= 0.8 (None/"off" = desactivado)
+    ITERATIVE_SCAN_MODES = ("off", "relaxed_order", "strict_order")
+
+    def __init__(
+        self,
+        database_url: str | None = None,
+        index_type: str | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        iterative_scan: str | None = None,
+        storage: str | None = None,
+        rerank_factor: int | None = None,
+        prefix_dim: int | None = None
+    ):
         """
         Args:
             database_url: URL de conexión PostgreSQL (usa env var si es None)
+            index_type: "hnsw" o "ivfflat" (usa env var VECTOR_INDEX_TYPE, default "hnsw")
+            ef_search: hnsw.ef_search por defecto para las búsquedas (None = default pgvector)
+            probes: ivfflat.probes por defecto (None = sqrt(lists) del índice existente)
+            iterative_scan: Modo de iterative scan para búsquedas filtradas
+                            (usa env var VECTOR_ITERATIVE_SCAN, default "relaxed_order";
+                            se desactiva solo si pgvector < 0.8)
+            storage: "full", "halfvec" o "binary" (usa env var VECTOR_STORAGE, default "full")
+            rerank_factor: Candidatos del índice por resultado final, re-rankeados
+                           con el vector completo (default: 1 full, 2 halfvec, 10 binary;
+                           mínimo 4 con prefix_dim)
+            prefix_dim: Dimensiones del prefijo Matryoshka para la primera etapa
+                        (usa env var VECTOR_PREFIX_DIM, ej: 256; None/0 = desactivado)
         """
         self.database_url = database_url or os.getenv("DATABASE_URL")
         if not self.database_url:
             raise ValueError("DATABASE_URL env var requerida")
 
+        self.index_type = (index_type or os.getenv("VECTOR_INDEX_TYPE", "hnsw")).lower()
+        if self.index_type not in self.INDEX_TYPES:
+            raise ValueError(
+                f"index_type inválido: {self.index_type} (opciones: {self.INDEX_TYPES})"
+            )
+
+        self.ef_search = ef_search
+        self.probes = probes
+
+        self.iterative_scan = (
+            iterative_scan or os.getenv("VECTOR_ITERATIVE_SCAN", "relaxed_order")
+        ).lower()
+        if self.iterative_scan not in self.ITERATIVE_SCAN_MODES:
+            raise ValueError(
+                f"iterative_scan inválido: {self.iterative_scan} "
+                f"(opciones: {self.ITERATIVE_SCAN_MODES})"
+            )
+
+        self.storage = (storage or os.getenv("VECTOR_STORAGE", "full")).lower()
+        if self.storage not in self.STORAGE_TYPES:
+            raise ValueError(
+                f"storage inválido: {self.storage} (opciones: {list(self.STORAGE_TYPES)})"
+            )
+        self.prefix_dim = prefix_dim or int(os.getenv("VECTOR_PREFIX_DIM", "0")) or None
+        if self.prefix_dim is not None and not 0 < self.prefix_dim < self.DIMENSIONS:
+            raise ValueError(f"prefix_dim debe estar entre 1 y {self.DIMENSIONS - 1}")
+
+        self.rerank_factor = rerank_factor or max(
+            self._DEFAULT_RERANK_FACTOR[self.storage],
+            4 if self.prefix_dim else 1
+        )
+
+        # Índices ANN parciales existentes: {(columna, valor): nombre_índice}
+        self.partial_indexes: Dict[Tuple[str, str], str] = {}
+
         self.pool: asyncpg.Pool | None = None
 
     async def connect(self):
@@ -48,6 +163,8 @@ class VectorStore:
 
         # Crear tabla y extensión si no existen
         await self._initialize_schema()
+        await self._load_index_settings()
+        await self._load_filter_settings()
 
     async def close(self):
         """Cierra connection pool"""
@@ -61,13 +178,22 @@ class VectorStore:
         PEDAGOGÍA:
         - vector(768) = columna para embeddings de 768 dimensiones
         - JSONB = formato binario JSON eficiente
-        - IVFFlat = índice para búsqueda vectorial rápida
-          - lists=100 = particiones del espacio vectorial
-          - Más lists = más rápido pero menos preciso
+        - content_tsv = tsvector GENERADO desde content (Postgres lo mantiene
+          solo en cada INSERT/UPDATE) + índice GIN para búsqueda léxica
+        - category / procedure_code / doc_type = keys de metadata promovidas a
+          columnas generadas con índice B-tree (filtros frecuentes)
+        - embedding_p{N} (si prefix_dim) = prefijo Matryoshka generado desde embedding
+        - storage compacto y prefix_dim requieren pgvector >= 0.7: se valida
+          ANTES de tocar el schema (ver _check_pgvector_version)
+        - HNSW se puede crear con la tabla vacía (no necesita entrenamiento)
+        - IVFFlat NO: sus centroides se calculan con los datos existentes.
+          Con la tabla vacía serían inútiles → se crea con rebuild_index()
+          después de la carga
         """
         async with self.pool.acquire() as conn:
             # Habilitar extensión pgvector
             await conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            await self._check_pgvector_version(conn)
 
             # Crear tabla
             await conn.execute("""
@@ -83,66 +209,835 @@ class VectorStore:
                 )
             """)
 
-            # Crear índice IVFFlat para búsqueda rápida
-            # NOTA: Solo crear índice si hay >1000 registros en producción
+            # Columna léxica (ADD COLUMN también migra tablas ya existentes)
+            await conn.execute(f"""
+                ALTER TABLE document_chunks
+                ADD COLUMN IF NOT EXISTS content_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('{self.TEXT_SEARCH_CONFIG}', content)) STORED
+            """)
             await conn.execute("""
-                CREATE INDEX IF NOT EXISTS embedding_idx
+                CREATE INDEX IF NOT EXISTS idx_chunks_content_tsv
                 ON document_chunks
-                USING ivfflat (embedding vector_cosine_ops)
-                WITH (lists = 100)
+                USING gin (content_tsv)
             """)
 
-    async def upsert_chunks(self, chunks: List[Dict[str, Any]]):
+            # Prefijo Matryoshka: primeras N dimensiones normalizadas (Postgres lo
+            # calcula en cada INSERT/UPDATE, la ingesta no cambia)
+            if self.prefix_dim:
+                column, dims = self._ann_column()
+                await conn.execute(f"""
+                    ALTER TABLE document_chunks
+                    ADD COLUMN IF NOT EXISTS {column} vector({dims})
+                    GENERATED ALWAYS AS (
+                        l2_normalize(subvector(embedding, 1, {dims}))::vector({dims})
+                    ) STORED
+                """)
+
+            # Filtros: GIN sobre metadata (sirve @>) + columnas promovidas
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_chunks_metadata
+                ON document_chunks
+                USING gin (metadata)
+            """)
+            for key, column in self.PROMOTED_COLUMNS.items():
+                await conn.execute(f"""
+                    ALTER TABLE document_chunks
+                    ADD COLUMN IF NOT EXISTS {column} TEXT
+                    GENERATED ALWAYS AS (metadata->>'{key}') STORED
+                """)
+                await conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_chunks_{column} "
+                    f"ON document_chunks ({column})"
+                )
+
+            # Manifest de ingesta: qué archivo produjo qué documento y con qué contenido
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_manifest (
+                    path TEXT PRIMARY KEY,
+                    document_id VARCHAR(255) NOT NULL,
+                    size_bytes BIGINT NOT NULL,
+                    mtime_ns BIGINT NOT NULL,
+                    content_hash CHAR(64) NOT NULL,
+                    chunk_count INTEGER NOT NULL,
+                    ingested_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+
+            await self._normalize_chunk_paths(conn)
+
+            if self.index_type == "hnsw":
+                params = self.index_params("hnsw", 0)
+                await conn.execute(f"""
+                    CREATE INDEX IF NOT EXISTS {self.EMBEDDING_INDEX_NAME}
+                    ON document_chunks
+                    USING hnsw {self._index_column()}
+                    WITH ({self._format_index_options(params)})
+                """)
+
+    async def _check_pgvector_version(self, conn):
+        """
+        Falla con un error claro si la config pide funciones que pgvector no tiene.
+
+        PEDAGOGÍA:
+        - embedding_p{N} se genera con subvector()/l2_normalize() y el storage
+          compacto usa halfvec / binary_quantize(): todo llegó en pgvector 0.7
+        - Con una versión anterior el ALTER TABLE / CREATE INDEX fallaría a
+          mitad de camino con un "function does not exist" poco explicativo
+        """
+        if self.storage == "full" and not self.prefix_dim:
+            return
+
+        version = await conn.fetchval(
+            "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+        )
+        if self._version_tuple(version) < self.MIN_PGVECTOR_COMPACT:
+            required = ".".join(str(part) for part in self.MIN_PGVECTOR_COMPACT)
+            raise RuntimeError(
+                f"pgvector {version} no soporta storage={self.storage}, "
+                f"prefix_dim={self.prefix_dim} (requiere >= {required}): "
+                f"actualizar la extensión (ALTER EXTENSION vector UPDATE) o usar "
+                f"VECTOR_STORAGE=full sin VECTOR_PREFIX_DIM"
+            )
+
+    async def _normalize_chunk_paths(self, conn):
         """
-        Inserta o actualiza chunks con sus embeddings.
+        Migra filas antiguas sin metadata.path absoluto (una sola vez).
+
+        PEDAGOGÍA:
+        - El GC borra por archivo (metadata.path = path del manifest): filas
+          escritas antes del manifest tienen path relativo o NULL y ningún
+          borrado las alcanzaría
+        - Si el document_id tiene UN solo archivo en el manifest, ese es su
+          path. Si no, la fila no se puede atribuir → aviso (ingesta --full)
+        - Idempotente: tras migrar, la consulta no encuentra filas
+        """
+        result = await conn.execute("""
+            UPDATE document_chunks c
+            SET metadata = jsonb_set(COALESCE(c.metadata, '{}'::jsonb), '{path}', to_jsonb(m.path))
+            FROM (
+                SELECT document_id, MIN(path) AS path
+                FROM document_manifest
+                GROUP BY document_id
+                HAVING COUNT(*) = 1
+            ) m
+            WHERE c.document_id = m.document_id
+              AND (c.metadata->>'path' IS NULL OR c.metadata->>'path' NOT LIKE '/%')
+        """)
+        migrated = int(result.split()[-1])
+        if migrated:
+            logger.info(f"metadata.path normalizado en {migrated} chunks antiguos")
+
+        orphans = await conn.fetchval("""
+            SELECT COUNT(*) FROM document_chunks
+            WHERE metadata->>'path' IS NULL OR metadata->>'path' NOT LIKE '/%'
+        """)
+        if orphans:
+            logger.warning(
+                f"{orphans} chunks sin metadata.path atribuible: el GC incremental no "
+                f"los borra (recrear el índice para eliminarlos)"
+            )
+
+    async def _load_index_settings(self):
+        """
+        Lee la configuración del índice existente para fijar defaults de búsqueda.
+
+        PEDAGOGÍA:
+        - IVFFlat solo revisa `probes` listas por query (default pgvector = 1)
+        - Regla práctica: probes ≈ sqrt(lists) → buen balance recall/velocidad
+        - Si el índice existente no coincide con `storage`, las búsquedas no lo
+          usarán → avisar que hay que ejecutar rebuild_index()
+        """
+        async with self.pool.acquire() as conn:
+            indexdef = await conn.fetchval(
+                "SELECT indexdef FROM pg_indexes WHERE indexname = $1",
+                self.EMBEDDING_INDEX_NAME
+            )
+            reloptions = await conn.fetchval(
+                "SELECT reloptions FROM pg_class WHERE relname = $1",
+                self.EMBEDDING_INDEX_NAME
+            )
+
+        column, _ = self._ann_column()
+        _, opclass = self.STORAGE_TYPES[self.storage]
+        uses_prefix = indexdef is not None and "embedding_p" in indexdef
+        if indexdef and (
+            opclass not in indexdef
+            or column not in indexdef
+            or uses_prefix != bool(self.prefix_dim)
+        ):
+            logger.warning(
+                f"{self.EMBEDDING_INDEX_NAME} no coincide con storage={self.storage}, "
+                f"prefix_dim={self.prefix_dim}: ejecutar rebuild_index()"
+            )
+
+        if self.index_type != "ivfflat" or self.probes is not None:
+            return
+
+        for option in reloptions or []:
+            name, _, value = option.partition("=")
+            if name == "lists" and value.isdigit():
+                self.probes = max(1, round(math.sqrt(int(value))))
+
+    async def _load_filter_settings(self):
+        """
+        Detecta soporte de iterative scan y los índices parciales existentes.
+
+        PEDAGOGÍA:
+        - Iterative scan (pgvector >= 0.8): si el filtro descarta candidatos
+          del índice ANN, el scan sigue buscando hasta juntar k resultados
+        - En pgvector < 0.8 el parámetro no existe → se desactiva
+        """
+        async with self.pool.acquire() as conn:
+            version = await conn.fetchval(
+                "SELECT extversion FROM pg_extension WHERE extname = 'vector'"
+            )
+            rows = await conn.fetch("""
+                SELECT relname, obj_description(oid, 'pg_class') AS description
+                FROM pg_class
+                WHERE relkind = 'i' AND relname LIKE $1
+            """, f"{self.EMBEDDING_INDEX_NAME}_%")
+
+        if self.iterative_scan != "off" and self._version_tuple(version) < (0, 8):
+            logger.warning(f"pgvector {version} no soporta iterative scan, se desactiva")
+            self.iterative_scan = "off"
+
+        for row in rows:
+            try:
+                predicate = json.loads(row["description"] or "")
+                self.partial_indexes[(predicate["column"], predicate["value"])] = row["relname"]
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    @staticmethod
+    def _version_tuple(version: str | None) -> Tuple[int, ...]:
+        """"0.8.0" → (0, 8, 0)"""
+        return tuple(int(part) for part in (version or "0").split(".") if part.isdigit())
+
+    @staticmethod
+    def index_params(index_type: str, total_rows: int) -> Dict[str, int]:
+        """
+        Elige parámetros de construcción del índice según el tamaño del corpus.
+
+        PEDAGOGÍA (recomendaciones de pgvector):
+        - IVFFlat: lists = filas / 1000 hasta 1M filas, sqrt(filas) por encima
+        - HNSW: m = conexiones por nodo, ef_construction = calidad del grafo.
+          Corpus más grandes → más conexiones para mantener el recall
+
+        Args:
+            index_type: "hnsw" o "ivfflat"
+            total_rows: Número de vectores en la tabla
+
+        Returns:
+            Dict con los parámetros WITH (...) del índice
+        """
+        if index_type == "ivfflat":
+            if total_rows <= 1_000_000:
+                lists = total_rows // 1000
+            else:
+                lists = int(math.sqrt(total_rows))
+            return {"lists": max(1, lists)}
+
+        if total_rows < 100_000:
+            return {"m": 16, "ef_construction": 64}
+        if total_rows < 1_000_000:
+            return {"m": 16, "ef_construction": 128}
+        return {"m": 24, "ef_construction": 200}
+
+    @staticmethod
+    def _format_index_options(params: Dict[str, int]) -> str:
+        """Formatea parámetros para la cláusula WITH (...) del índice"""
+        return ", ".join(f"{name} = {int(value)}" for name, value in params.items())
+
+    async def rebuild_index(self) -> Dict[str, Any]:
+        """
+        Reconstruye el índice ANN con parámetros acordes al corpus actual.
+
+        PEDAGOGÍA:
+        - Ejecutar después de cargas masivas (ej: scripts/ingest_documents.py --rebuild-index)
+        - IVFFlat recalcula sus centroides con los datos reales
+        - ANALYZE actualiza estadísticas para el planner
+
+        Returns:
+            Dict con index_type, total_rows y parámetros usados
+        """
+        async with self.pool.acquire() as conn:
+            total = await conn.fetchval(
+                "SELECT COUNT(*) FROM document_chunks WHERE embedding IS NOT NULL"
+            )
+            params = self.index_params(self.index_type, total)
+
+            if self.index_type == "ivfflat" and total == 0:
+                logger.warning("rebuild_index: tabla vacía, se omite índice IVFFlat")
+                return {"index_type": self.index_type, "total_rows": 0, "params": {}}
+
+            async with conn.transaction():
+                await conn.execute(f"DROP INDEX IF EXISTS {self.EMBEDDING_INDEX_NAME}")
+                # Índice legacy creado por data/bases_datos/schema.sql
+                await conn.execute("DROP INDEX IF EXISTS idx_chunks_embedding")
+                await conn.execute(f"""
+                    CREATE INDEX {self.EMBEDDING_INDEX_NAME}
+                    ON document_chunks
+                    USING {self.index_type} {self._index_column()}
+                    WITH ({self._format_index_options(params)})
+                """)
+
+            await conn.execute("ANALYZE document_chunks")
+
+        if self.index_type == "ivfflat":
+            self.probes = max(1, round(math.sqrt(params["lists"])))
+
+        logger.info(
+            f"rebuild_index: {self.index_type} ({self.storage}, prefix_dim={self.prefix_dim}) "
+            f"sobre {total} vectores con {params}"
+        )
+        return {
+            "index_type": self.index_type,
+            "storage": self.storage,
+            "prefix_dim": self.prefix_dim,
+            "total_rows": total,
+            "params": params
+        }
+
+    async def create_partial_index(self, key: str, value: str) -> str:
+        """
+        Crea un índice ANN parcial para un valor frecuente de una key promovida.
+
+        PEDAGOGÍA:
+        - Índice parcial = HNSW/IVFFlat que solo contiene filas con category = 'X'
+        - Una búsqueda filtrada por ese valor recorre un grafo SOLO de esa
+          categoría → siempre encuentra k resultados, sin post-filtrado
+        - Útil para pocas categorías muy consultadas (un índice por valor)
+        - El valor va como literal en la query (ver _build_filter_clause):
+          el planner solo usa un índice parcial si puede probar el predicado
+
+        Args:
+            key: Key de metadata promovida (category, procedure_code, type)
+            value: Valor del filtro (ej: "jubilacion")
+
+        Returns:
+            Nombre del índice creado
+        """
+        if key not in self.PROMOTED_COLUMNS:
+            raise ValueError(
+                f"Solo keys promovidas admiten índice parcial: {list(self.PROMOTED_COLUMNS)}"
+            )
+
+        column = self.PROMOTED_COLUMNS[key]
+        suffix = hashlib.sha256(value.encode("utf-8")).hexdigest()[:8]
+        index_name = f"{self.EMBEDDING_INDEX_NAME}_{column}_{suffix}"
+
+        async with self.pool.acquire() as conn:
+            total = await conn.fetchval(
+                f"SELECT COUNT(*) FROM document_chunks WHERE {column} = $1", value
+            )
+            params = self.index_params(self.index_type, total)
+
+            async with conn.transaction():
+                await conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+                await conn.execute(f"""
+                    CREATE INDEX {index_name}
+                    ON document_chunks
+                    USING {self.index_type} {self._index_column()}
+                    WITH ({self._format_index_options(params)})
+                    WHERE {column} = {self._quote_literal(value)}
+                """)
+                # El predicado se guarda como comentario para recargarlo en connect()
+                description = json.dumps({"column": column, "value": value})
+                await conn.execute(
+                    f"COMMENT ON INDEX {index_name} IS {self._quote_literal(description)}"
+                )
+
+        self.partial_indexes[(column, value)] = index_name
+        logger.info(f"create_partial_index: {index_name} ({column} = {value!r}, {total} filas)")
+        return index_name
+
+    @staticmethod
+    def _quote_literal(value: str) -> str:
+        """Literal SQL con comillas escapadas (standard_conforming_strings)"""
+        return "'" + value.replace("'", "''") + "'"
+
+    def _ann_column(self) -> Tuple[str, int]:
+        """Columna que indexa el ANN y sus dimensiones (prefijo Matryoshka o completa)"""
+        if self.prefix_dim:
+            return f"embedding_p{self.prefix_dim}", self.prefix_dim
+        return "embedding", self.DIMENSIONS
+
+    def _index_column(self) -> str:
+        """Columna/expresión + operator class del índice ANN según storage"""
+        column, dims = self._ann_column()
+        expression, opclass = self.STORAGE_TYPES[self.storage]
+        return f"({expression.format(column=column, dims=dims)} {opclass})"
+
+    def _ann_distance(self, query_vector: str) -> str:
+        """
+        Distancia que usa el índice ANN (debe coincidir con su expresión).
+
+        - full: coseno sobre vector
+        - halfvec: coseno sobre float16
+        - binary: distancia de Hamming (<~>) entre los bits de signo
+        - con prefix_dim: la query también se recorta y normaliza
+        """
+        column, dims = self._ann_column()
+        if self.prefix_dim:
+            query_vector = f"l2_normalize(subvector({query_vector}, 1, {dims}))"
+
+        if self.storage == "halfvec":
+            return f"{column}::halfvec({dims}) <=> ({query_vector})::halfvec({dims})"
+        if self.storage == "binary":
+            return f"binary_quantize({column})::bit({dims}) <~> binary_quantize({query_vector})"
+        return f"{column} <=> {query_vector}"
+
+    def _ranked_candidates_sql(
+        self,
+        query_vector: str,
+        where: str,
+        limit: str,
+        rerank_factor: int | None = None,
+        include_embeddings: bool = False
+    ) -> str:
+        """
+        SELECT id, content, metadata, score de los top-k, ordenados por coseno exacto.
+
+        PEDAGOGÍA (re-ranking):
+        - Etapa 1: el índice compacto (halfvec/binario y/o prefijo Matryoshka)
+          trae limit * rerank_factor candidatos → barato pero aproximado
+        - Etapa 2: se re-ordenan con el vector completo (vector(768)) y se
+          devuelven los mejores `limit` → el score final es exacto
+
+        Args:
+            query_vector: Expresión SQL de tipo vector (ej: "$1::vector")
+            where: Cláusula WHERE (o "")
+            limit: Expresión SQL del número de resultados
+            rerank_factor: Override del over-fetch (None = self.rerank_factor)
+            include_embeddings: Agregar la columna embedding al SELECT
+        """
+        factor = rerank_factor or self.rerank_factor
+        extra = ", embedding" if include_embeddings else ""
+
+        if self.storage == "full" and not self.prefix_dim and factor <= 1:
+            return f"""
+                SELECT id, content, metadata, 1 - (embedding <=> {query_vector}) AS score{extra}
+                FROM document_chunks
+                {where}
+                ORDER BY embedding <=> {query_vector}
+                LIMIT {limit}
+            """
+
+        return f"""
+            SELECT id, content, metadata, 1 - (embedding <=> {query_vector}) AS score{extra}
+            FROM (
+                SELECT id, content, metadata, embedding
+                FROM document_chunks
+                {where}
+                ORDER BY {self._ann_distance(query_vector)}
+                LIMIT ({limit}) * {int(factor)}
+            ) candidates
+            ORDER BY embedding <=> {query_vector}
+            LIMIT {limit}
+        """
+
+    def _search_settings(
+        self,
+        k: int,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        filtered: bool = False
+    ) -> List[str]:
+        """
+        Sentencias SET LOCAL para ajustar recall/velocidad de una búsqueda.
+
+        PEDAGOGÍA:
+        - hnsw.ef_search = tamaño de la lista de candidatos (≥ k, sino faltan resultados)
+        - ivfflat.probes = listas revisadas (más probes = más recall, más lento)
+        - *.iterative_scan (solo con filtros) = si el filtro descarta candidatos,
+          el índice sigue escaneando en vez de devolver menos de k filas
+        - SET LOCAL solo afecta a la transacción actual (no contamina el pool)
+        """
+        settings = []
+
+        if self.index_type == "hnsw":
+            ef = ef_search or self.ef_search
+            if ef is not None or k > self._DEFAULT_EF_SEARCH:
+                ef = max(ef or self._DEFAULT_EF_SEARCH, k)
+                settings.append(f"SET LOCAL hnsw.ef_search = {int(ef)}")
+        else:
+            n_probes = probes or self.probes
+            if n_probes is not None:
+                settings.append(f"SET LOCAL ivfflat.probes = {int(n_probes)}")
+
+        if filtered and self.iterative_scan != "off":
+            # IVFFlat solo soporta relaxed_order
+            mode = self.iterative_scan if self.index_type == "hnsw" else "relaxed_order"
+            settings.append(f"SET LOCAL {self.index_type}.iterative_scan = {mode}")
+
+        return settings
+
+    async def _fetch_with_settings(self, settings: List[str], query: str, *params):
+        """Ejecuta un SELECT aplicando SET LOCAL en la misma transacción"""
+        async with self.pool.acquire() as conn:
+            if not settings:
+                return await conn.fetch(query, *params)
+
+            async with conn.transaction():
+                await conn.execute("; ".join(settings))
+                return await conn.fetch(query, *params)
+
+    async def upsert_chunks(
+        self,
+        chunks: List[Dict[str, Any]],
+        batch_size: int = 5000
+    ) -> Dict[str, Any]:
+        """
+        Inserta o actualiza chunks con sus embeddings (carga masiva).
 
         Args:
             chunks: Lista de dicts con keys:
                 - content: Texto del chunk
                 - metadata: Dict con metadata (categoría, source, chunk_index, etc.)
                 - embedding: Vector de 768 dimensiones
+            batch_size: Filas por COPY a la tabla staging
+
+        Returns:
+            Dict con rows, elapsed_s y rows_per_second
 
         PEDAGOGÍA:
-        - PostgreSQL JSONB requiere string, no dict de Python
-        - json.dumps() convierte dict → JSON string
+        - COPY binario a una tabla temporal (staging) = mucho más rápido
+          que un INSERT por chunk
+        - Un solo INSERT ... SELECT ... ON CONFLICT mezcla staging → document_chunks
+        - Todo dentro de UNA transacción: si algo falla, no queda estado parcial
         - document_id y chunk_index son requeridos por el schema
-        - ON CONFLICT permite actualizar chunks existentes
-        """
-        async with self.pool.acquire() as conn:
-            for chunk in chunks:
-                metadata = chunk.get("metadata", {})
-
-                # Extraer document_id (usamos procedure_code si existe, sino source)
-                document_id = metadata.get("procedure_code") or metadata.get("source", "unknown")
-
-                # Extraer chunk_index
-                chunk_index = metadata.get("chunk_index", 0)
-
-                # Convertir metadata dict a JSON string
-                metadata_json = json.dumps(metadata)
-
-                await conn.execute("""
-                    INSERT INTO document_chunks (document_id, chunk_index, content, metadata, embedding)
-                    VALUES ($1, $2, $3, $4, $5)
-                    ON CONFLICT (document_id, chunk_index)
-                    DO UPDATE SET
-                        content = EXCLUDED.content,
-                        metadata = EXCLUDED.metadata,
-                        embedding = EXCLUDED.embedding,
-                        created_at = CURRENT_TIMESTAMP
-                """,
-                document_id,
-                chunk_index,
-                chunk["content"],
-                metadata_json,
-                chunk["embedding"]
+        """
+        start = time.perf_counter()
+        records = self._dedupe_records([self._chunk_to_record(c) for c in chunks])
+
+        if records:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute("""
+                        CREATE TEMP TABLE IF NOT EXISTS document_chunks_staging (
+                            document_id VARCHAR(255),
+                            chunk_index INTEGER,
+                            content TEXT,
+                            metadata JSONB,
+                            embedding vector(768)
+                        ) ON COMMIT DROP
+                    """)
+
+                    for i in range(0, len(records), batch_size):
+                        await conn.copy_records_to_table(
+                            "document_chunks_staging",
+                            records=records[i:i + batch_size],
+                            columns=self._STAGING_COLUMNS
+                        )
+                        await conn.execute("""
+                            INSERT INTO document_chunks (document_id, chunk_index, content, metadata, embedding)
+                            SELECT document_id, chunk_index, content, metadata, embedding
+                            FROM document_chunks_staging
+                            ON CONFLICT (document_id, chunk_index)
+                            DO UPDATE SET
+                                content = EXCLUDED.content,
+                                metadata = EXCLUDED.metadata,
+                                embedding = EXCLUDED.embedding,
+                                created_at = CURRENT_TIMESTAMP
+                        """)
+                        await conn.execute("TRUNCATE document_chunks_staging")
+
+        elapsed = time.perf_counter() - start
+        rows_per_second = len(records) / elapsed if elapsed > 0 else 0.0
+        logger.info(
+            f"upsert_chunks: {len(records)} filas en {elapsed:.2f}s "
+            f"({rows_per_second:.0f} filas/s)"
+        )
+
+        return {
+            "rows": len(records),
+            "elapsed_s": elapsed,
+            "rows_per_second": rows_per_second
+        }
+
+    @staticmethod
+    def document_id_for(metadata: Dict[str, Any]) -> str:
+        """document_id de un chunk: procedure_code si existe, sino source"""
+        return metadata.get("procedure_code") or metadata.get("source", "unknown")
+
+    def _chunk_to_record(self, chunk: Dict[str, Any]) -> Tuple:
+        """
+        Convierte un chunk en una fila para COPY.
+
+        PEDAGOGÍA:
+        - PostgreSQL JSONB requiere string, no dict de Python
+        """
+        metadata = chunk.get("metadata", {})
+
+        document_id = self.document_id_for(metadata)
+
+        # Extraer chunk_index
+        chunk_index = metadata.get("chunk_index", 0)
+
+        return (
+            document_id,
+            chunk_index,
+            chunk["content"],
+            json.dumps(metadata),
+            chunk["embedding"]
+        )
+
+    @staticmethod
+    def _dedupe_records(records: List[Tuple]) -> List[Tuple]:
+        """
+        Deja una sola fila por (document_id, chunk_index), la última gana.
+
+        ON CONFLICT no puede actualizar la misma fila dos veces en un mismo INSERT.
+        """
+        by_key = {}
+        for record in records:
+            by_key[(record[0], record[1])] = record
+        return list(by_key.values())
+
+    async def delete_document_chunks(
+        self,
+        document_id: str,
+        from_chunk_index: int = 0,
+        path: str | None = None
+    ) -> int:
+        """
+        Elimina chunks de un documento (garbage collection).
+
+        PEDAGOGÍA:
+        - from_chunk_index=0 → elimina el documento completo
+        - from_chunk_index=N → elimina chunks huérfanos cuando el documento
+          se achicó (antes tenía más de N chunks)
+        - path → solo chunks escritos desde ese archivo (metadata.path): un
+          archivo movido con el mismo document_id no pierde sus chunks.
+          Filas antiguas se migran al conectar (_normalize_chunk_paths)
+
+        Returns:
+            Número de chunks eliminados
+        """
+        async with self.pool.acquire() as conn:
+            if path is None:
+                result = await conn.execute(
+                    "DELETE FROM document_chunks WHERE document_id = $1 AND chunk_index >= $2",
+                    document_id,
+                    from_chunk_index
+                )
+            else:
+                result = await conn.execute("""
+                    DELETE FROM document_chunks
+                    WHERE document_id = $1 AND chunk_index >= $2
+                      AND metadata->>'path' = $3
+                """, document_id, from_chunk_index, path)
+        return int(result.split()[-1])
+
+    async def delete_chunks(self, keys: List[Tuple[str, int]]) -> int:
+        """
+        Elimina chunks puntuales por (document_id, chunk_index).
+
+        PEDAGOGÍA:
+        - Un chunk duplicado no se almacena: si antes ocupaba ese lugar,
+          la fila vieja debe borrarse
+
+        Returns:
+            Número de chunks eliminados
+        """
+        if not keys:
+            return 0
+
+        async with self.pool.acquire() as conn:
+            result = await conn.execute("""
+                DELETE FROM document_chunks
+                WHERE (document_id, chunk_index) IN (
+                    SELECT * FROM unnest($1::text[], $2::int[])
+                )
+            """, [k[0] for k in keys], [k[1] for k in keys])
+        return int(result.split()[-1])
+
+    async def add_chunk_sources(self, sources: Dict[Tuple[str, int], List[Dict[str, Any]]]):
+        """
+        Agrega fuentes duplicadas a la metadata de chunks canónicos.
+
+        PEDAGOGÍA:
+        - metadata->'duplicate_sources' = lista de {document_id, chunk_index,
+          source, path, page_start, page_end} con el mismo texto
+        - Unión de conjuntos en JSONB (jsonb_agg DISTINCT): re-ejecutar no
+          duplica referencias
+
+        Args:
+            sources: {(document_id, chunk_index) canónico: [referencias]}
+        """
+        if not sources:
+            return
+
+        async with self.pool.acquire() as conn:
+            await conn.executemany("""
+                UPDATE document_chunks
+                SET metadata = jsonb_set(
+                    metadata,
+                    '{duplicate_sources}',
+                    (
+                        SELECT jsonb_agg(DISTINCT source)
+                        FROM jsonb_array_elements(
+                            COALESCE(metadata->'duplicate_sources', '[]'::jsonb) || $3::jsonb
+                        ) AS source
+                    )
+                )
+                WHERE document_id = $1 AND chunk_index = $2
+            """, [
+                (document_id, chunk_index, json.dumps(refs))
+                for (document_id, chunk_index), refs in sources.items()
+            ])
+
+    async def remove_chunk_sources(self, paths: List[str]):
+        """Quita de los chunks canónicos las referencias a estos archivos"""
+        if not paths:
+            return
+
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                UPDATE document_chunks
+                SET metadata = jsonb_set(
+                    metadata,
+                    '{duplicate_sources}',
+                    COALESCE((
+                        SELECT jsonb_agg(source)
+                        FROM jsonb_array_elements(metadata->'duplicate_sources') AS source
+                        WHERE NOT (source->>'path' = ANY($1::text[]))
+                    ), '[]'::jsonb)
+                )
+                WHERE metadata ? 'duplicate_sources'
+                  AND EXISTS (
+                      SELECT 1
+                      FROM jsonb_array_elements(metadata->'duplicate_sources') AS source
+                      WHERE source->>'path' = ANY($1::text[])
+                  )
+            """, paths)
+
+    async def get_duplicate_source_paths(self, document_ids: List[str]) -> List[str]:
+        """
+        Archivos cuyos duplicados apuntan a chunks de estos documentos.
+
+        Si un documento canónico se re-ingesta o se elimina, esos archivos
+        deben re-procesarse para no perder su contenido.
+        """
+        if not document_ids:
+            return []
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT DISTINCT source->>'path' AS path
+                FROM document_chunks,
+                     jsonb_array_elements(metadata->'duplicate_sources') AS source
+                WHERE document_id = ANY($1::text[])
+                  AND metadata ? 'duplicate_sources'
+            """, document_ids)
+        return [row["path"] for row in rows if row["path"]]
+
+    async def get_chunk_texts(self, exclude_paths: List[str]) -> List[Dict[str, Any]]:
+        """
+        Texto de los chunks almacenados (para sembrar la deduplicación).
+
+        Args:
+            exclude_paths: Archivos que se van a re-escribir o borrar en esta
+                           ingesta (sus chunks actuales no sirven de canónico)
+
+        Returns:
+            Lista de {document_id, chunk_index, content}
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT document_id, chunk_index, content
+                FROM document_chunks
+                WHERE COALESCE(metadata->>'path', '') <> ALL($1::text[])
+                ORDER BY id
+            """, exclude_paths)
+        return [dict(row) for row in rows]
+
+    async def get_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Obtiene el manifest de ingesta.
+
+        Returns:
+            Dict {path: {document_id, size_bytes, mtime_ns, content_hash, chunk_count}}
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch("""
+                SELECT path, document_id, size_bytes, mtime_ns, content_hash, chunk_count
+                FROM document_manifest
+            """)
+        return {row["path"]: dict(row) for row in rows}
+
+    async def upsert_manifest(self, entries: List[Dict[str, Any]]):
+        """
+        Inserta o actualiza entradas del manifest.
+
+        Args:
+            entries: Dicts con path, document_id, size_bytes, mtime_ns,
+                     content_hash y chunk_count
+        """
+        if not entries:
+            return
+
+        async with self.pool.acquire() as conn:
+            await conn.executemany("""
+                INSERT INTO document_manifest
+                    (path, document_id, size_bytes, mtime_ns, content_hash, chunk_count)
+                VALUES ($1, $2, $3, $4, $5, $6)
+                ON CONFLICT (path) DO UPDATE SET
+                    document_id = EXCLUDED.document_id,
+                    size_bytes = EXCLUDED.size_bytes,
+                    mtime_ns = EXCLUDED.mtime_ns,
+                    content_hash = EXCLUDED.content_hash,
+                    chunk_count = EXCLUDED.chunk_count,
+                    ingested_at = NOW()
+            """, [
+                (
+                    e["path"], e["document_id"], e["size_bytes"],
+                    e["mtime_ns"], e["content_hash"], e["chunk_count"]
                 )
+                for e in entries
+            ])
+
+    async def delete_manifest(self, paths: List[str]):
+        """Elimina entradas del manifest (archivos borrados del disco)"""
+        if not paths:
+            return
+
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "DELETE FROM document_manifest WHERE path = ANY($1::text[])",
+                paths
+            )
+
+    async def get_corpus_version(self) -> str:
+        """
+        Versión del corpus indexado (cambia solo si cambia el contenido).
+
+        PEDAGOGÍA:
+        - Cachés de respuestas deben invalidarse si cambian los documentos
+        - Hash de (path, document_id, content_hash, chunk_count) del manifest:
+          un archivo solo "tocado" (mtime nuevo, mismo contenido) refresca
+          ingested_at pero NO cambia la versión
+        - Una query sobre el manifest (una fila por archivo, no por chunk)
+        """
+        async with self.pool.acquire() as conn:
+            version = await conn.fetchval("""
+                SELECT md5(COALESCE(string_agg(
+                    path || ':' || document_id || ':' || content_hash || ':' || chunk_count,
+                    ',' ORDER BY path
+                ), ''))
+                FROM document_manifest
+            """)
+        return version[:16]
 
     async def similarity_search(
         self,
         query_embedding: List[float],
         k: int = 5,
-        filter_metadata: Dict[str, Any] | None = None
+        filter_metadata: Dict[str, Any] | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        rerank_factor: int | None = None,
+        include_embeddings: bool = False
     ) -> List[Dict[str, Any]]:
         """
         Busca chunks más similares al query embedding.
@@ -152,60 +1047,360 @@ class VectorStore:
         - Menor distancia = mayor similitud
         - Score = 1 - distancia (para tener valor entre 0-1)
         - ORDER BY ... LIMIT k = top-k resultados
+        - Con storage halfvec/binary: over-fetch en el índice compacto y
+          re-ranking exacto (ver _ranked_candidates_sql)
 
         Args:
             query_embedding: Vector de query (768 dims)
             k: Número de resultados a retornar
-            filter_metadata: Filtros JSONB opcionales
+            filter_metadata: Filtros de metadata ({key: valor} o {key: [valores]})
+            ef_search: hnsw.ef_search para esta query (más alto = más recall)
+            probes: ivfflat.probes para esta query (más alto = más recall)
+            rerank_factor: Over-fetch para esta query (None = self.rerank_factor)
+            include_embeddings: Agregar "embedding" a cada resultado (ej: para MMR)
 
         Returns:
             Lista de chunks con content, metadata, score
         """
-        query = """
-            SELECT
-                id,
-                content,
-                metadata,
-                1 - (embedding <=> $1) AS score
-            FROM document_chunks
+        params = [query_embedding, k]
+
+        # Agregar filtros si existen
+        conditions = self._build_filter_clause(filter_metadata, params)
+        where = f"WHERE {conditions}" if conditions else ""
+
+        query = self._ranked_candidates_sql(
+            "$1::vector", where, "$2", rerank_factor, include_embeddings
+        )
+
+        fetched = k * (rerank_factor or self.rerank_factor)
+        settings = self._search_settings(fetched, ef_search, probes, filtered=bool(conditions))
+        rows = await self._fetch_with_settings(settings, query, *params)
+
+        results = [self._row_to_result(row, include_embeddings) for row in rows]
+
+        # relaxed_order puede devolver filas levemente desordenadas
+        if conditions and self.iterative_scan == "relaxed_order":
+            results.sort(key=lambda r: r["score"], reverse=True)
+
+        return results
+
+    async def similarity_search_many(
+        self,
+        query_embeddings: List[List[float]],
+        k: int = 5,
+        filter_metadata: Dict[str, Any] | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None
+    ) -> List[List[Dict[str, Any]]]:
         """
+        Busca los top-k de VARIAS queries en una sola sentencia.
 
-        params = [query_embedding]
+        PEDAGOGÍA:
+        - Query expansion / multi-agente = varias búsquedas por request
+        - N llamadas a similarity_search = N acquires del pool + N round-trips
+        - Acá: unnest(array de vectores) WITH ORDINALITY + CROSS JOIN LATERAL
+          → Postgres ejecuta un scan ANN por vector dentro de UNA query
+        - Los vectores viajan como text[] y se castean a vector[] en el server
 
-        # Agregar filtros si existen
-        if filter_metadata:
-            conditions = []
-            for key, value in filter_metadata.items():
-                params.append(value)
-                conditions.append(f"metadata->>'{key}' = ${len(params)}")
+        Args:
+            query_embeddings: Vectores de query (768 dims cada uno)
+            k: Resultados por query
+            filter_metadata: Filtros comunes a todas las queries
+            ef_search: hnsw.ef_search para estas queries
+            probes: ivfflat.probes para estas queries
 
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
+        Returns:
+            Una lista de resultados por query, en el mismo orden de entrada
+        """
+        if not query_embeddings:
+            return []
 
-        query += " ORDER BY embedding <=> $1 LIMIT $2"
-        params.append(k)
+        params: List[Any] = [
+            ["[" + ",".join(repr(float(x)) for x in embedding) + "]" for embedding in query_embeddings],
+            k
+        ]
+        conditions = self._build_filter_clause(filter_metadata, params)
+        where = f"WHERE {conditions}" if conditions else ""
 
-        async with self.pool.acquire() as conn:
-            rows = await conn.fetch(query, *params)
+        query = f"""
+            SELECT q.ord AS query_index, c.id, c.content, c.metadata, c.score
+            FROM unnest($1::text[]::vector[]) WITH ORDINALITY AS q(query_vector, ord)
+            CROSS JOIN LATERAL (
+                {self._ranked_candidates_sql("q.query_vector", where, "$2")}
+            ) c
+            ORDER BY q.ord, c.score DESC
+        """
+
+        settings = self._search_settings(k * self.rerank_factor, ef_search, probes, filtered=bool(conditions))
+        rows = await self._fetch_with_settings(settings, query, *params)
 
-        return [
-            {
-                "id": row["id"],
-                "content": row["content"],
-                "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
-                "score": float(row["score"])
-            }
-            for row in rows
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        for row in rows:
+            results[row["query_index"] - 1].append(self._row_to_result(row))
+        return results
+
+    @staticmethod
+    def _row_to_result(row, include_embedding: bool = False) -> Dict[str, Any]:
+        """Fila de Postgres → resultado de búsqueda"""
+        result = {
+            "id": row["id"],
+            "content": row["content"],
+            "metadata": json.loads(row["metadata"]) if isinstance(row["metadata"], str) else row["metadata"],
+            "score": float(row["score"])
+        }
+        if include_embedding:
+            result["embedding"] = row["embedding"]
+        return result
+
+    def _build_filter_clause(
+        self,
+        filter_metadata: Dict[str, Any] | None,
+        params: List[Any]
+    ) -> str:
+        """
+        Compila filtros de metadata a condiciones SQL que usan índices.
+
+        PEDAGOGÍA:
+        - metadata->>'key' = $n NO puede usar el índice GIN de metadata
+        - Keys promovidas (category, procedure_code, type) → columna con B-tree
+          * Lista de valores → columna = ANY($n)
+          * Valor con índice parcial → literal (para que el planner lo use)
+        - Resto de keys → metadata @> '{"key": valor}' (usa el índice GIN)
+
+        Agrega los valores a `params` (los placeholders continúan la numeración).
+
+        Returns:
+            Condiciones unidas con AND ("" si no hay filtros)
+        """
+        conditions = []
+        containment: Dict[str, Any] = {}
+
+        for key, value in (filter_metadata or {}).items():
+            column = self.PROMOTED_COLUMNS.get(key)
+
+            if column is None:
+                if isinstance(value, (list, tuple, set)):
+                    alternatives = []
+                    for option in value:
+                        params.append(json.dumps({key: option}))
+                        alternatives.append(f"metadata @> ${len(params)}::jsonb")
+                    conditions.append("(" + " OR ".join(alternatives or ["FALSE"]) + ")")
+                else:
+                    containment[key] = value
+            elif isinstance(value, (list, tuple, set)):
+                params.append([str(option) for option in value])
+                conditions.append(f"{column} = ANY(${len(params)}::text[])")
+            elif (column, str(value)) in self.partial_indexes:
+                conditions.append(f"{column} = {self._quote_literal(str(value))}")
+            else:
+                params.append(str(value))
+                conditions.append(f"{column} = ${len(params)}")
+
+        if containment:
+            params.append(json.dumps(containment))
+            conditions.append(f"metadata @> ${len(params)}::jsonb")
+
+        return " AND ".join(conditions)
+
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        k: int = 5,
+        filter_metadata: Dict[str, Any] | None = None,
+        candidates: int | None = None,
+        rrf_k: int | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        include_embeddings: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Búsqueda híbrida: léxica (full-text) + vectorial, fusionadas con RRF.
+
+        PEDAGOGÍA:
+        - Vectorial: entiende sinónimos y paráfrasis ("jubilarme" ≈ "pensión de vejez")
+        - Léxica: encuentra términos exactos (PROC-JUB-002, RUTs, "artículo 68")
+        - Reciprocal Rank Fusion: score = Σ 1 / (rrf_k + rank) en cada lista
+          * Solo usa posiciones, no scores → no hay que calibrar escalas distintas
+          * Un chunk que aparece en ambas listas sube al tope
+        - Ambas búsquedas + la fusión van en UNA sola query (un round-trip)
+        - La query léxica usa OR entre términos: con AND, una pregunta larga
+          casi nunca matchearía completa; ts_rank_cd premia los que matchean más
+
+        Args:
+            query_text: Texto de la consulta (para la búsqueda léxica)
+            query_embedding: Vector de query (768 dims)
+            k: Número de resultados a retornar
+            filter_metadata: Filtros JSONB opcionales
+            candidates: Resultados por lista antes de fusionar (default: max(4k, 20))
+            rrf_k: Constante de RRF (default: 60)
+            ef_search: hnsw.ef_search para la parte vectorial
+            probes: ivfflat.probes para la parte vectorial
+            include_embeddings: Agregar "embedding" a cada resultado (ej: para MMR)
+
+        Returns:
+            Lista de chunks con content, metadata, score (coseno),
+            rrf_score, vector_rank y lexical_rank (None si no apareció en esa lista)
+        """
+        candidates = candidates or max(4 * k, 20)
+        params: List[Any] = [query_embedding, query_text, candidates, rrf_k or self.RRF_K, k]
+
+        conditions = self._build_filter_clause(filter_metadata, params)
+        query = self._hybrid_sql("$1::vector", "$2", conditions, include_embeddings)
+
+        settings = self._search_settings(
+            candidates * self.rerank_factor, ef_search, probes, filtered=bool(conditions)
+        )
+        rows = await self._fetch_with_settings(settings, query, *params)
+
+        return [self._hybrid_row_to_result(row, include_embeddings) for row in rows]
+
+    async def hybrid_search_many(
+        self,
+        query_texts: List[str],
+        query_embeddings: List[List[float]],
+        k: int = 5,
+        filter_metadata: Dict[str, Any] | None = None,
+        candidates: int | None = None,
+        rrf_k: int | None = None,
+        ef_search: int | None = None,
+        probes: int | None = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Búsqueda híbrida de VARIAS queries en una sola sentencia.
+
+        PEDAGOGÍA:
+        - Mismo patrón que similarity_search_many: unnest de los vectores Y
+          de los textos WITH ORDINALITY + CROSS JOIN LATERAL
+        - Cada fila de q ejecuta la búsqueda híbrida completa (ANN + léxica
+          + RRF) de su query → un round-trip para N queries
+
+        Args:
+            query_texts: Textos de las consultas (búsqueda léxica)
+            query_embeddings: Vectores de las consultas, en el mismo orden
+            k: Resultados por query
+            filter_metadata: Filtros comunes a todas las queries
+            candidates: Resultados por lista antes de fusionar (default: max(4k, 20))
+            rrf_k: Constante de RRF (default: 60)
+            ef_search: hnsw.ef_search para la parte vectorial
+            probes: ivfflat.probes para la parte vectorial
+
+        Returns:
+            Una lista de resultados (formato de hybrid_search) por query, en orden
+        """
+        if len(query_texts) != len(query_embeddings):
+            raise ValueError("query_texts y query_embeddings deben tener el mismo largo")
+        if not query_texts:
+            return []
+
+        candidates = candidates or max(4 * k, 20)
+        params: List[Any] = [
+            ["[" + ",".join(repr(float(x)) for x in embedding) + "]" for embedding in query_embeddings],
+            list(query_texts),
+            candidates,
+            rrf_k or self.RRF_K,
+            k
         ]
+        conditions = self._build_filter_clause(filter_metadata, params)
+
+        query = f"""
+            SELECT q.ord AS query_index, h.*
+            FROM unnest($1::text[]::vector[], $2::text[]) WITH ORDINALITY AS q(query_vector, query_text, ord)
+            CROSS JOIN LATERAL (
+                {self._hybrid_sql("q.query_vector", "q.query_text", conditions)}
+            ) h
+            ORDER BY q.ord, h.rrf_score DESC
+        """
+
+        settings = self._search_settings(
+            candidates * self.rerank_factor, ef_search, probes, filtered=bool(conditions)
+        )
+        rows = await self._fetch_with_settings(settings, query, *params)
+
+        results: List[List[Dict[str, Any]]] = [[] for _ in query_texts]
+        for row in rows:
+            results[row["query_index"] - 1].append(self._hybrid_row_to_result(row))
+        return results
+
+    def _hybrid_sql(
+        self,
+        query_vector: str,
+        query_text: str,
+        conditions: str,
+        include_embeddings: bool = False
+    ) -> str:
+        """
+        SELECT de la búsqueda híbrida para UNA query (ANN + léxica + RRF).
+
+        Sin CTEs (solo subconsultas) para poder usarse dentro de un LATERAL
+        que referencia la query de afuera. Placeholders fijos: $3 = candidates,
+        $4 = rrf_k, $5 = k.
+
+        Args:
+            query_vector: Expresión SQL de tipo vector (ej: "$1::vector")
+            query_text: Expresión SQL del texto de la query (ej: "$2")
+            conditions: Filtros de _build_filter_clause ("" si no hay)
+            include_embeddings: Agregar la columna embedding al SELECT
+        """
+        vec_where = f"WHERE {conditions}" if conditions else ""
+        lex_filter = f"AND {conditions}" if conditions else ""
+
+        return f"""
+            SELECT
+                c.id,
+                c.content,
+                c.metadata,
+                1 - (c.embedding <=> {query_vector}) AS score,
+                f.rrf_score,
+                f.vector_rank,
+                f.lexical_rank{", c.embedding" if include_embeddings else ""}
+            FROM (
+                SELECT
+                    id,
+                    SUM(1.0 / ($4 + rank)) AS rrf_score,
+                    MIN(rank) FILTER (WHERE source = 'vector') AS vector_rank,
+                    MIN(rank) FILTER (WHERE source = 'lexical') AS lexical_rank
+                FROM (
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY score DESC) AS rank, 'vector' AS source
+                    FROM ({self._ranked_candidates_sql(query_vector, vec_where, "$3")}) ann
+                    UNION ALL
+                    SELECT id, ROW_NUMBER() OVER (ORDER BY lex_score DESC) AS rank, 'lexical' AS source
+                    FROM (
+                        SELECT id, ts_rank_cd(content_tsv, lq.q) AS lex_score
+                        FROM document_chunks, (
+                            SELECT replace(
+                                plainto_tsquery('{self.TEXT_SEARCH_CONFIG}', {query_text})::text, '&', '|'
+                            )::tsquery AS q
+                        ) lq
+                        WHERE content_tsv @@ lq.q {lex_filter}
+                        ORDER BY lex_score DESC
+                        LIMIT $3
+                    ) lexical
+                ) ranked
+                GROUP BY id
+            ) f
+            JOIN document_chunks c ON c.id = f.id
+            ORDER BY f.rrf_score DESC
+            LIMIT $5
+        """
+
+    def _hybrid_row_to_result(self, row, include_embedding: bool = False) -> Dict[str, Any]:
+        """Fila de búsqueda híbrida → resultado con los rankings de RRF"""
+        return {
+            **self._row_to_result(row, include_embedding),
+            "rrf_score": float(row["rrf_score"]),
+            "vector_rank": row["vector_rank"],
+            "lexical_rank": row["lexical_rank"]
+        }
 
     async def get_statistics(self) -> Dict[str, Any]:
         """Obtiene estadísticas de la base de datos"""
         async with self.pool.acquire() as conn:
             total = await conn.fetchval("SELECT COUNT(*) FROM document_chunks")
             categories = await conn.fetch("""
-                SELECT metadata->>'category' as category, COUNT(*) as count
+                SELECT category, COUNT(*) as count
                 FROM document_chunks
-                WHERE metadata ? 'category'
+                WHERE category IS NOT NULL
                 GROUP BY category
             """)
 
@@ -4,7 +4,7 @@ Retrieval Tool usando Vector RAG
 Wrapper que expone el sistema Vector RAG como una tool para agentes.
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 from src.tools.checklist_tool import Tool, ToolDefinition
 from src.rag.vector_based.retrieval import VectorRetrieval
 
@@ -65,7 +65,8 @@ class RetrievalVectorTool(Tool):
         self,
         query: str,
         top_k: int = 5,
-        category: str | None = None
+        category: str | None = None,
+        query_embedding: List[float] | None = None
     ) -> Dict[str, Any]:
         """
         Ejecuta búsqueda vectorial en la base de conocimiento.
@@ -79,6 +80,7 @@ class RetrievalVectorTool(Tool):
             query: Consulta de búsqueda
             top_k: Número de resultados
             category: Filtro de categoría opcional
+            query_embedding: Embedding de la query si ya se calculó (opcional)
 
         Returns:
             Dict con:
@@ -95,7 +97,8 @@ class RetrievalVectorTool(Tool):
         result = await self.vector_retrieval.retrieve(
             query=query,
             k=top_k,
-            filter_metadata=filter_metadata
+            filter_metadata=filter_metadata,
+            query_embedding=query_embedding
         )
 
         # Agregar query original al resultado (útil para logging)
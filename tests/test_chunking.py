@@ -0,0 +1,89 @@
+"""
+Tests de StructuredChunker: límites de tamaño y de overlap
+"""
+
+import pytest
+
+pytest.importorskip("tiktoken")
+
+from src.rag.vector_based.chunking import StructuredChunker
+
+
+def _paragraphs(n: int, words: int) -> list[str]:
+    return [
+        f"Párrafo {i}. " + " ".join(f"palabra{i}x{j}" for j in range(words)) + "."
+        for i in range(n)
+    ]
+
+
+def _overlap_tokens(chunker: StructuredChunker, previous: str, current: str) -> int:
+    """Tokens de los párrafos de `current` que también estaban en `previous`"""
+    shared = set(previous.split("\n\n")) & set(current.split("\n\n"))
+    return sum(chunker.count_tokens(p) for p in shared)
+
+
+@pytest.mark.parametrize("words", [5, 20, 45])
+def test_chunks_never_exceed_max_tokens(words):
+    chunker = StructuredChunker(max_tokens=120, overlap_tokens=50)
+    content = "\n\n".join(_paragraphs(30, words))
+
+    chunks = chunker.chunk(content)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["token_count"] <= chunker.max_tokens
+        assert chunker.count_tokens(chunk["content"]) <= chunker.max_tokens + 5
+
+
+def test_overlap_is_bounded_and_made_of_whole_paragraphs():
+    chunker = StructuredChunker(max_tokens=120, overlap_tokens=40)
+    paragraphs = _paragraphs(30, 8)
+    chunks = chunker.chunk("\n\n".join(paragraphs))
+
+    shared_any = False
+    for previous, current in zip(chunks, chunks[1:]):
+        overlap = _overlap_tokens(chunker, previous["content"], current["content"])
+        assert overlap <= chunker.overlap_tokens
+        shared_any = shared_any or overlap > 0
+        # Nunca media palabra: cada parte del chunk es un párrafo completo
+        assert all(part in paragraphs for part in current["content"].split("\n\n"))
+
+    assert shared_any
+
+
+def test_overlap_shrinks_to_fit_a_large_incoming_block():
+    chunker = StructuredChunker(max_tokens=100, overlap_tokens=60)
+    small = _paragraphs(6, 4)
+    # Bloque que entra en un chunk pero deja menos espacio que overlap_tokens
+    big = "Bloque grande."
+    while chunker.count_tokens(big + " termino.") <= chunker.max_tokens - 10:
+        big += " termino."
+    chunks = chunker.chunk("\n\n".join(small + [big]))
+
+    assert chunks[-1]["content"].endswith(big)
+    assert chunks[-1]["token_count"] <= chunker.max_tokens
+
+
+def test_heading_starts_new_chunk_without_overlap():
+    chunker = StructuredChunker(max_tokens=200, overlap_tokens=50)
+    content = "\n\n".join([
+        "## Requisitos",
+        "Tener cédula de identidad vigente.",
+        "## Plazos",
+        "La solicitud se resuelve en 10 días hábiles."
+    ])
+
+    chunks = chunker.chunk(content)
+
+    assert [c["section_title"] for c in chunks] == ["Requisitos", "Plazos"]
+    assert "cédula" not in chunks[1]["content"]
+
+
+def test_page_markers_give_page_range():
+    chunker = StructuredChunker(max_tokens=500, overlap_tokens=0)
+    content = "--- Página 1 ---\nPrimer párrafo.\n\n--- Página 2 ---\nSegundo párrafo."
+
+    chunks = chunker.chunk(content)
+
+    assert len(chunks) == 1
+    assert (chunks[0]["page_start"], chunks[0]["page_end"]) == (1, 2)
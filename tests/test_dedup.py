@@ -0,0 +1,71 @@
+"""
+Tests de ChunkDeduplicator (hash exacto + MinHash/LSH)
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.rag.vector_based.dedup import ChunkDeduplicator
+
+
+def _text(n: int = 200, last: str = "final") -> str:
+    return " ".join(f"palabra{i}" for i in range(n)) + f" {last}"
+
+
+def test_new_chunk_is_canonical():
+    dedup = ChunkDeduplicator()
+
+    assert dedup.find_duplicate(_text(), ("DOC-A", 0)) is None
+    assert dedup.find_duplicate("Texto completamente distinto sobre bonos", ("DOC-A", 1)) is None
+    assert dedup.embeddings_saved == 0
+
+
+def test_exact_duplicate_ignores_case_and_accents():
+    dedup = ChunkDeduplicator()
+    dedup.find_duplicate("Requisitos de la Pensión de Vejez", ("DOC-A", 0))
+
+    result = dedup.find_duplicate("requisitos de la pension de vejez", ("DOC-B", 3))
+
+    assert result == (("DOC-A", 0), True)
+    assert dedup.exact_duplicates == 1
+    assert dedup.embeddings_saved == 1
+
+
+def test_near_duplicate_is_grouped_but_not_counted_as_saved():
+    dedup = ChunkDeduplicator(threshold=0.9)
+    dedup.find_duplicate(_text(last="final"), ("DOC-A", 0))
+
+    result = dedup.find_duplicate(_text(last="distinto"), ("DOC-B", 0))
+
+    assert result == (("DOC-A", 0), False)
+    assert dedup.near_duplicates == 1
+    assert dedup.embeddings_saved == 0
+
+
+def test_literal_copy_of_near_duplicate_is_exact():
+    dedup = ChunkDeduplicator()
+    dedup.find_duplicate(_text(last="final"), ("DOC-A", 0))
+    dedup.find_duplicate(_text(last="distinto"), ("DOC-B", 0))
+
+    assert dedup.find_duplicate(_text(last="distinto"), ("DOC-C", 0)) == (("DOC-B", 0), True)
+
+
+def test_add_canonical_seeds_without_counting():
+    dedup = ChunkDeduplicator()
+    dedup.add_canonical(_text(), ("STORED", 7))
+    dedup.add_canonical(_text(), ("STORED", 8))
+
+    assert dedup.exact_duplicates == 0
+    assert dedup.find_duplicate(_text(), ("DOC-NEW", 0)) == (("STORED", 7), True)
+
+
+@pytest.mark.parametrize("threshold", [0.0, 1.5])
+def test_invalid_threshold(threshold):
+    with pytest.raises(ValueError):
+        ChunkDeduplicator(threshold=threshold)
+
+
+def test_num_perm_must_be_multiple_of_bands():
+    with pytest.raises(ValueError):
+        ChunkDeduplicator(num_perm=60, bands=16)
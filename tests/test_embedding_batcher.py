@@ -0,0 +1,77 @@
+"""
+Tests de EmbeddingBatcher: cada future se resuelve (o falla), nunca queda colgado
+"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("tenacity")
+pytest.importorskip("vertexai")
+
+from src.rag.vector_based.embedding_batcher import EmbeddingBatcher
+
+
+class FakeGenerator:
+    """Devuelve [índice del texto] y registra cada llamada"""
+
+    def __init__(self, drop_last: bool = False, error: Exception | None = None):
+        self.calls = []
+        self.drop_last = drop_last
+        self.error = error
+
+    async def generate_embeddings(self, texts, batch_size=32):
+        self.calls.append(list(texts))
+        if self.error:
+            raise self.error
+        vectors = [[float(text)] for text in texts]
+        return vectors[:-1] if self.drop_last else vectors
+
+
+def _run(coro):
+    # wait_for: un future sin resolver hace fallar el test en vez de colgarlo
+    return asyncio.run(asyncio.wait_for(coro, timeout=2))
+
+
+def test_concurrent_queries_share_one_call():
+    generator = FakeGenerator()
+    batcher = EmbeddingBatcher(generator, max_wait_ms=5)
+
+    async def main():
+        return await asyncio.gather(*[batcher.embed(str(i)) for i in range(4)])
+
+    assert _run(main()) == [[0.0], [1.0], [2.0], [3.0]]
+    assert generator.calls == [["0", "1", "2", "3"]]
+    assert (batcher.requests, batcher.batches_sent) == (4, 1)
+
+
+def test_full_batch_flushes_without_waiting():
+    generator = FakeGenerator()
+    batcher = EmbeddingBatcher(generator, max_batch_size=2, max_wait_ms=10_000)
+
+    async def main():
+        return await asyncio.gather(*[batcher.embed(str(i)) for i in range(4)])
+
+    assert _run(main()) == [[0.0], [1.0], [2.0], [3.0]]
+    assert generator.calls == [["0", "1"], ["2", "3"]]
+
+
+def test_api_error_reaches_every_caller():
+    batcher = EmbeddingBatcher(FakeGenerator(error=RuntimeError("quota")), max_wait_ms=1)
+
+    async def main():
+        return await asyncio.gather(*[batcher.embed(str(i)) for i in range(3)], return_exceptions=True)
+
+    results = _run(main())
+    assert all(isinstance(r, RuntimeError) and str(r) == "quota" for r in results)
+
+
+def test_short_response_fails_missing_futures():
+    batcher = EmbeddingBatcher(FakeGenerator(drop_last=True), max_wait_ms=1)
+
+    async def main():
+        return await asyncio.gather(*[batcher.embed(str(i)) for i in range(3)], return_exceptions=True)
+
+    first, second, third = _run(main())
+    assert (first, second) == ([0.0], [1.0])
+    assert isinstance(third, RuntimeError)
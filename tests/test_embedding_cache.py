@@ -0,0 +1,63 @@
+"""
+Tests de EmbeddingCache: round-trip, conteo de filas y eviction LRU
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.rag.vector_based import embedding_cache
+from src.rag.vector_based.embedding_cache import EmbeddingCache
+
+MODEL = "text-embedding-004"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Reloj controlado: last_access distinto en cada operación"""
+    state = SimpleNamespace(now=1000.0)
+
+    def tick():
+        state.now += 1
+        return state.now
+
+    monkeypatch.setattr(embedding_cache, "time", SimpleNamespace(time=tick))
+    return state
+
+
+def test_round_trip_is_exact(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    vector = [0.1, -2.5e-7, 3.141592653589793]
+
+    cache.put_many(MODEL, {"h1": vector})
+
+    assert cache.get_many(MODEL, ["h1", "missing"]) == {"h1": vector}
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.get_many("otro-modelo", ["h1"]) == {}
+    cache.close()
+
+
+def test_count_ignores_rewrites_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = EmbeddingCache(path)
+    cache.put_many(MODEL, {"h1": [1.0], "h2": [2.0]})
+    cache.put_many(MODEL, {"h2": [2.5], "h3": [3.0]})
+
+    assert cache._count == 3
+    assert cache.get_many(MODEL, ["h2"]) == {"h2": [2.5]}
+    cache.close()
+
+    assert EmbeddingCache(path)._count == 3
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put_many(MODEL, {"a": [1.0]})
+    cache.put_many(MODEL, {"b": [2.0]})
+    cache.get_many(MODEL, ["a"])  # "a" pasa a ser la más reciente
+
+    cache.put_many(MODEL, {"c": [3.0]})
+
+    assert set(cache.get_many(MODEL, ["a", "b", "c"])) == {"a", "c"}
+    assert cache._count == 2
+    cache.close()
@@ -0,0 +1,115 @@
+"""
+Tests de re-indexación incremental: BatchCheckpoint y reutilización por source_hash
+"""
+
+import asyncio
+
+import pytest
+
+from src.rag.agent_based.indexer import AgentRAGIndexer, BatchCheckpoint
+from src.rag.agent_based.page_store import PageTextStore
+
+
+class FakeProvider:
+    """LLM falso: cuenta las llamadas y numera los resúmenes"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt, temperature=0.3, max_tokens=4000):
+        self.calls += 1
+        return f"resumen {self.calls} sobre pensiones y requisitos"
+
+
+class FakeExtractor:
+    """Extractor falso: las páginas se fijan desde el test"""
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    async def extract_pages_with_total(self, pdf_path):
+        pages = [{"page_num": i, "text": text} for i, text in enumerate(self.texts, 1)]
+        return len(pages), pages
+
+
+@pytest.fixture
+def setup(tmp_path):
+    pdf = tmp_path / "jubilacion" / "proc-jub-001.pdf"
+    pdf.parent.mkdir()
+    pdf.write_bytes(b"%PDF v1")
+
+    provider = FakeProvider()
+    extractor = FakeExtractor([f"CÓDIGO: PROC-JUB-001\nPágina {i}" for i in range(1, 7)])
+    store = PageTextStore(str(tmp_path / "pages.sqlite"))
+    indexer = AgentRAGIndexer(
+        provider,
+        pdf_extractor=extractor,
+        page_store=store,
+        checkpoint_dir=str(tmp_path / "checkpoints")
+    )
+    yield indexer, provider, extractor, pdf, str(tmp_path / "indices")
+    store.close()
+
+
+def _index(indexer, pdf, output_dir):
+    return asyncio.run(indexer.index_document(str(pdf), output_dir=output_dir, batch_size=2))
+
+
+def test_checkpoint_round_trip(tmp_path):
+    path = tmp_path / "ckpt" / "abc.json"
+    checkpoint = BatchCheckpoint(path, "abc", batch_size=5)
+    checkpoint.put("1-5", "resumen")
+
+    assert BatchCheckpoint(path, "abc", 5).get("1-5") == "resumen"
+    # Otro contenido u otro batch_size → el checkpoint no aplica
+    assert BatchCheckpoint(path, "xyz", 5).summaries == {}
+    assert BatchCheckpoint(path, "abc", 3).summaries == {}
+
+    checkpoint.discard()
+    assert not path.exists()
+
+
+def test_unreadable_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / "abc.json"
+    path.write_text("{no es json", encoding="utf-8")
+
+    assert BatchCheckpoint(path, "abc", 5).summaries == {}
+
+
+def test_first_index_summarizes_every_batch(setup):
+    indexer, provider, _, pdf, output_dir = setup
+
+    index, status = _index(indexer, pdf, output_dir)
+
+    assert status == "generated"
+    assert provider.calls == 3 + 1  # 3 batches + resumen global
+    assert all(section["source_hash"] for section in index["sections"])
+    assert not any((indexer.checkpoint_dir).glob("*.json"))
+
+
+def test_reindex_without_changes_calls_no_llm(setup):
+    indexer, provider, _, pdf, output_dir = setup
+    first, _ = _index(indexer, pdf, output_dir)
+    provider.calls = 0
+
+    index, status = _index(indexer, pdf, output_dir)
+
+    assert status == "unchanged"
+    assert provider.calls == 0
+    assert index["sections"] == first["sections"]
+
+
+def test_reindex_only_summarizes_changed_sections(setup):
+    indexer, provider, extractor, pdf, output_dir = setup
+    first, _ = _index(indexer, pdf, output_dir)
+    provider.calls = 0
+
+    extractor.texts[3] = "Página 4 con un plazo nuevo"
+    pdf.write_bytes(b"%PDF v2")
+    index, status = _index(indexer, pdf, output_dir)
+
+    assert status == "generated"
+    assert provider.calls == 1 + 1  # solo la sección 2 + resumen global
+    old, new = first["sections"], index["sections"]
+    assert [s["summary"] for s in new][::2] == [s["summary"] for s in old][::2]
+    assert new[1]["source_hash"] != old[1]["source_hash"]
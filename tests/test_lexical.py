@@ -0,0 +1,45 @@
+"""
+Tests de la búsqueda léxica BM25 y la normalización de texto
+"""
+
+from src.rag.lexical import BM25Index, strip_accents, tokenize
+
+
+def test_strip_accents():
+    assert strip_accents("Jubilación Pensión ñandú") == "Jubilacion Pension nandu"
+
+
+def test_tokenize_drops_stopwords_and_splits_codes():
+    assert tokenize("El trámite PROC-JUB-002 de la AFP") == [
+        "tramite", "proc-jub-002", "proc", "jub", "002", "afp"
+    ]
+
+
+def test_rare_exact_term_ranks_first():
+    index = BM25Index([
+        "Requisitos para la pensión de vejez",
+        "Procedimiento PROC-JUB-002 de jubilación anticipada",
+        "Pensión de invalidez y pensión de sobrevivencia",
+    ])
+
+    assert index.search("proc-jub-002")[0][0] == 1
+
+
+def test_query_without_accents_matches_accented_text():
+    index = BM25Index(["Solicitud de jubilación", "Cambio de fondo"])
+
+    assert [doc_id for doc_id, _ in index.search("jubilacion")] == [0]
+
+
+def test_top_n_and_no_match():
+    index = BM25Index(["bono uno", "bono dos", "bono tres"])
+
+    assert len(index.search("bono", top_n=2)) == 2
+    assert index.search("herencia") == []
+
+
+def test_empty_index():
+    index = BM25Index([])
+
+    assert len(index) == 0
+    assert index.search("pensión") == []
@@ -0,0 +1,35 @@
+"""
+Tests de Maximal Marginal Relevance
+"""
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from src.rag.vector_based.mmr import maximal_marginal_relevance
+
+QUERY = [1.0, 0.0, 0.0]
+CANDIDATES = [
+    [1.0, 0.05, 0.0],   # 0: el más relevante
+    [1.0, 0.06, 0.0],   # 1: casi idéntico al 0
+    [0.7, 0.0, 0.7],    # 2: menos relevante pero distinto
+]
+
+
+def test_lambda_one_is_pure_relevance():
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, k=3, lambda_mult=1.0) == [0, 1, 2]
+
+
+def test_diversity_skips_near_duplicate():
+    assert maximal_marginal_relevance(QUERY, CANDIDATES, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_k_larger_than_candidates_returns_all_once():
+    selected = maximal_marginal_relevance(QUERY, CANDIDATES, k=10)
+
+    assert sorted(selected) == [0, 1, 2]
+
+
+@pytest.mark.parametrize("embeddings, k", [([], 3), (CANDIDATES, 0)])
+def test_empty_selection(embeddings, k):
+    assert maximal_marginal_relevance(QUERY, embeddings, k=k) == []
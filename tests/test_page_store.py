@@ -0,0 +1,64 @@
+"""
+Tests de PageTextStore: rangos de páginas y secciones por hash de contenido
+"""
+
+import pytest
+
+from src.rag.agent_based.page_store import PageTextStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PageTextStore(str(tmp_path / "pages.sqlite"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def pdf(tmp_path, store):
+    """PDF "de 5 páginas" con la página 3 vacía (no se guarda)"""
+    path = tmp_path / "proc-jub-001.pdf"
+    path.write_bytes(b"%PDF contenido v1")
+    pages = [{"page_num": n, "text": f"texto {n}"} for n in (1, 2, 4, 5)]
+    store.put_pages(path, pages, total_pages=5)
+    return path
+
+
+def test_range_skips_empty_pages(store, pdf):
+    assert store.get_pages(pdf, 2, 4) == [
+        {"page_num": 2, "text": "texto 2"},
+        {"page_num": 4, "text": "texto 4"},
+    ]
+    assert store.get_pages(pdf, 3, 3) == []
+
+
+@pytest.mark.parametrize("start, end", [(0, 2), (4, 6), (6, 6)])
+def test_out_of_range_raises(store, pdf, start, end):
+    with pytest.raises(ValueError, match="5 páginas"):
+        store.get_pages(pdf, start, end)
+
+
+def test_unknown_file_is_a_miss(store, tmp_path):
+    other = tmp_path / "otro.pdf"
+    other.write_bytes(b"%PDF otro")
+
+    assert store.get_pages(other, 1, 1) is None
+    assert store.misses == 1
+
+
+def test_changed_file_is_not_served_stale_text(store, pdf):
+    pdf.write_bytes(b"%PDF contenido v2 distinto")
+
+    assert store.get_pages(pdf, 1, 2) is None
+
+
+def test_sections_are_keyed_by_id_and_title(store, tmp_path):
+    doc = tmp_path / "proc.md"
+    doc.write_text("# Doc\n## Requisitos\n...", encoding="utf-8")
+    key = PageTextStore.section_key({"section_id": "1", "title": "Requisitos"})
+
+    store.put_section(doc, key, "texto de requisitos")
+
+    assert store.get_section(doc, key) == "texto de requisitos"
+    renamed = PageTextStore.section_key({"section_id": "1", "title": "Plazos"})
+    assert store.get_section(doc, renamed) is None